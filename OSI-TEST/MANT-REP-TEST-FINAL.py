@@ -16,42 +16,35 @@
 # - Validación: NO permite mantenimiento/reparación si no existe en inventario
 # =============================================================================
 
-import os
+from __future__ import annotations
+
 import re
 import hashlib
-import pandas as pd
+import functools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import tkinter as tk
 from tkinter import messagebox, filedialog
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 
-# ------------------------------- Rutas globales --------------------------------
-
-APP_NAME = "OSI_Arecibo"
-
-PROGRAM_DATA = os.getenv("PROGRAMDATA")  # C:\ProgramData
-DATA_DIR = os.path.join(PROGRAM_DATA, APP_NAME)
+# ------------------------------- Datos ----------------------------------------
+# Rutas, encabezados exactos y el almacén compartido viven en osi_datos.py.
+# `pd` es el pandas diferido de osi_datos: se importa en el hilo de E/S con la primera
+# lectura, así la ventana aparece sin esperar a pandas/openpyxl.
 
-os.makedirs(DATA_DIR, exist_ok=True)
+import osi_datos
+import osi_perf
+import osi_reportes
+from osi_datos import (
+    INV_COLS, MANT_COLS, DEC_COLS, IMPORT_COLS, ALMACEN, _read_xlsx,
+    validar_lote, fechas_columna, texto_fecha_columna, columna_registro, diferencias,
+    _find_pending_flag_col, pd
+)
 
-PATH_INV   = os.path.join(DATA_DIR, "Registro Laptops.xlsx")
-PATH_MANT  = os.path.join(DATA_DIR, "Registro_Mantenimiento_Reparacion_Laptop.xlsx")
-PATH_PREST = os.path.join(DATA_DIR, "Registro_Prestamos_Laptop.xlsx")
-PATH_DEC   = os.path.join(DATA_DIR, "Registro_Decomisados.xlsx")
-
-# Encabezados exactos (NO cambiar)
-INV_COLS  = [
-    "Num_Propiedad","ID_Laptop","Service_Tag","Modelo","Disponible","Garantía","Fecha_Compra"
-]
-MANT_COLS = [
-    "Num_Propiedad","Dia","tecnico","Tipo","Desc_Reparacion","Nombre","Descripcion","Dominio",
-    "Check Update","Dell Command Updates","Bios Update","Upgrade Windows 10 - 11",
-    "Office 2019 Installed","PatchMyPC Installed","Dell Support Assist Installed"
-]
-PREST_COLS= ["Num_Propiedad","Nombre","Identificador","Num_Tele","Dia_Pres","Dia_Entr"]
-DEC_COLS  = ["Num_Propiedad","ID_Laptop","Service_Tag","Modelo",
-             "Num_Mantenimiento","Num_Reparaciones","Num_Prestamos","Fecha_Dec"]
+osi_datos.mostrar_error = messagebox.showerror
 
 # ------------------------ Autenticación (SHA-256) ----------------------
 
@@ -59,6 +52,13 @@ DEC_COLS  = ["Num_Propiedad","ID_Laptop","Service_Tag","Modelo",
 AUTH_HASH = "1c0bcfd0a5eccdb952a74d0570e759d079a54940953470a3d42aa390ed476ff4"
 AUTH_WINDOW_SECS = 15 * 60  # 5 minutos
 
+# Autocompletado del buscador
+AUTOCOMPLETAR_MS = 120  # espera tras la última tecla antes de actualizar la lista
+AUTOCOMPLETAR_N  = 15   # máximo de sugerencias
+
+# Cambios hechos desde otra estación: cada cuántos segundos se miran las firmas de los archivos
+VIGILAR_CADA_S = 3
+
 def sha256_file(path: str) -> str:
     h = hashlib.sha256()
     with open(path, "rb") as f:
@@ -67,119 +67,291 @@ def sha256_file(path: str) -> str:
     return h.hexdigest()
 
 # ------------------------------ Utils ---------------------------------
-# ------------------------------ Utils ---------------------------------
-# (pega esto aquí, a nivel de módulo, NO dentro de ninguna clase)
-
-def _to_iso_date(value) -> str:
-    import datetime as _dt
-    import numpy as _np
-    import pandas as pd
-    if value is None:
-        raise ValueError("Fecha vacía")
-    # Timestamp / date
-    if isinstance(value, (_dt.date, _dt.datetime, pd.Timestamp)):
-        return pd.to_datetime(value).strftime("%Y-%m-%d")
-    # Serial Excel (número)
-    if isinstance(value, (int, float, _np.integer, _np.floating)):
-        dt = pd.to_datetime(value, unit="D", origin="1899-12-30", errors="coerce")
-        if not pd.isna(dt):
-            return dt.strftime("%Y-%m-%d")
-    # Cadenas
-    s = str(value).strip()
-    if not s:
-        raise ValueError("Fecha vacía")
-    dt = pd.to_datetime(s, errors="coerce")
-    if not pd.isna(dt):
-        return dt.strftime("%Y-%m-%d")
-    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%d/%m/%Y"):
-        try:
-            return pd.to_datetime(s, format=fmt, errors="raise").strftime("%Y-%m-%d")
-        except Exception:
-            pass
-    raise ValueError(f"No se pudo parsear fecha: {value!r}")
-
-def _read_xlsx(path, expected_cols=None, sheet_name=0):
-    try:
-        df = pd.read_excel(path, sheet_name=sheet_name, engine="openpyxl")
-        if expected_cols:
-            for c in expected_cols:
-                if c not in df.columns:
-                    df[c] = ""
-            df = df[expected_cols]
-        return df
-    except FileNotFoundError:
-        return pd.DataFrame(columns=expected_cols or [])
-    except Exception as e:
-        messagebox.showerror("Error", f"No se pudo leer:\n{path}\n\n{e}")
-        return pd.DataFrame(columns=expected_cols or [])
-
-def _write_xlsx_exact(df, path, header_order):
-    out = df.copy()
-    for c in header_order:
-        if c not in out.columns:
-            out[c] = ""
-    out = out[header_order]
-    try:
-        with pd.ExcelWriter(path, engine="openpyxl") as w:
-            out.to_excel(w, index=False)
-    except Exception as e:
-        messagebox.showerror("Error", f"No se pudo guardar:\n{path}\n\n{e}")
 
 def _fmt_date_only(v) -> str:
-    try:
-        dt = pd.to_datetime(v, errors="coerce")
-        if pd.isna(dt):
-            return "" if (v is None or (isinstance(v,str) and not v.strip())) else str(v)
-        return dt.strftime("%Y-%m-%d")
-    except Exception:
-        return str(v) if v is not None else ""
+    return texto_fecha_columna(pd.Series([v], dtype=object))[0]
+
+FECHA_COLS = {"Garantía": "inv", "Fecha_Compra": "inv", "Fecha_Dec": "dec"}  # columna -> registro
+
+def _valores_tabla(df: pd.DataFrame, cols) -> list:
+    """Valores de pantalla de todas las filas (tuplas de str), calculados por columna."""
+    if df.empty:
+        return []
+    out = []
+    for c in cols:
+        if c in FECHA_COLS:
+            out.append(texto_fecha_columna(df[c], f"{FECHA_COLS[c]}.{c}").tolist())
+        else:
+            col = columna_registro(df[c])  # casillas bool -> "X"/vacío, como en el registro
+            out.append(col.astype(object).where(col.notna(), "").astype(str).tolist())
+    return list(zip(*out))
 
 def _now_full():
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 def _exists_decomisada(num: str) -> bool:
-    dec = _read_xlsx(PATH_DEC, DEC_COLS)
-    if dec.empty: return False
-    return (dec["Num_Propiedad"].astype(str).str.upper()==num.upper()).any()
+    return ALMACEN.existe_decomisada(num)
 
 def _inv_has(num: str) -> bool:
-    inv = _read_xlsx(PATH_INV, INV_COLS)
-    if inv.empty: return False
-    return (inv["Num_Propiedad"].astype(str).str.upper()==num.upper()).any()
-
-def _normkey(s: str) -> str:
-    import unicodedata as _ud
-    s = "" if s is None else str(s)
-    s = _ud.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not _ud.combining(ch))
-    s = s.lower()
-    for ch in (" ", "_", "-", ".", "/"):
-        s = s.replace(ch, "")
-    return s
-
-def _find_pending_flag_col(df: pd.DataFrame) -> str | None:
+    return ALMACEN.inv_tiene(num)
+
+# --------------------------- Tabla virtual ---------------------------
+
+class TablaVirtual(ttk.Frame):
     """
-    Detecta (si existe) una columna de 'reparación pendiente por pieza' sin renombrarla ni crearla.
-    Acepta variantes comunes: 'Esperando_Pieza', 'Pendiente', 'En_Espera', etc.
-    Devuelve el nombre EXACTO de la columna si la encuentra; si no, None.
+    Treeview que solo materializa las filas VISIBLES: un grupo fijo de ítems se reutiliza
+    y al desplazarse solo se cambian sus valores. La barra vertical es propia y refleja
+    la posición dentro de TODAS las filas, así 100k filas cuestan lo mismo que 30.
     """
-    candidates = {
-        "esperandopieza",
-        "pendientepieza",
-        "pendiente",
-        "enespera",
-        "enesperapieza",
-        "pieza_pendiente",
-        "piezaespera"
-    }
-    for col in df.columns:
-        if _normkey(col) in candidates:
-            return col
-    return None
+    PASO_RUEDA = 3
+
+    def __init__(self, master, height=22):
+        super().__init__(master)
+        self.tree = ttk.Treeview(self, show="headings", height=height, selectmode="browse")
+        self.vsb = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._yview)
+        hsb = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=hsb.set)
+        self.tree.grid(row=0, column=0, sticky=NSEW)
+        self.vsb.grid(row=0, column=1, sticky=NS)
+        hsb.grid(row=1, column=0, sticky=EW)
+        self.rowconfigure(0, weight=1); self.columnconfigure(0, weight=1)
+
+        self.filas = []      # tuplas ya formateadas
+        self.offset = 0      # primera fila visible
+        self.sel = None      # fila seleccionada (índice absoluto)
+        self._items = []     # ítems reutilizables del Treeview
+        self._mostrados = {} # ítem -> valores que muestra (para no tocar los que no cambian)
+        self._n_vis = height
+
+        self.tree.bind("<Configure>", lambda e: self._render())
+        self.tree.bind("<MouseWheel>", self._rueda)
+        self.tree.bind("<Button-4>", lambda e: self._mover(-self.PASO_RUEDA))
+        self.tree.bind("<Button-5>", lambda e: self._mover(self.PASO_RUEDA))
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        for tecla, delta in (("<Up>", -1), ("<Down>", 1), ("<Prior>", "-p"), ("<Next>", "p"),
+                             ("<Home>", "ini"), ("<End>", "fin")):
+            self.tree.bind(tecla, lambda e, d=delta: self._tecla(d))
+
+    # ---------- API ----------
+    def set_columnas(self, cols):
+        if list(self.tree["columns"]) == list(cols):
+            return
+        self.tree["columns"] = cols
+        self._mostrados = {}
+        for c in cols:
+            self.tree.heading(c, text=c)
+            w = 150 if c in ("Service_Tag","ID_Laptop") else 120
+            if c in ("Modelo","Garantía","Fecha_Compra","Fecha_Dec"): w=140
+            self.tree.column(c, width=w, anchor=W, stretch=True)
+
+    def set_filas(self, filas):
+        self.filas = filas
+        self.offset = 0
+        self.sel = None
+        self._render()
+
+    def actualizar_filas(self, filas):
+        """
+        Reemplaza las filas SIN mover la vista: la primera fila visible y la seleccionada se
+        buscan por su primera columna (Num_Propiedad). Solo se tocan los ítems que cambian.
+        """
+        def clave(i):
+            return self.filas[i][0] if i is not None and 0 <= i < len(self.filas) else None
+        primera, elegida = clave(self.offset), clave(self.sel)
+        pos = {f[0]: i for i, f in enumerate(filas)} if (primera or elegida) else {}
+        self.filas = filas
+        if primera in pos:
+            self.offset = pos[primera]
+        self.sel = pos.get(elegida)
+        self._render()
+
+    # ---------- render ----------
+    def _filas_visibles(self) -> int:
+        if self._items:
+            bbox = self.tree.bbox(self._items[0])
+            if bbox and bbox[3] > 0:
+                return max(1, (self.tree.winfo_height() - bbox[1]) // bbox[3])
+        return self._n_vis
+
+    def _render(self):
+        total = len(self.filas)
+        self._n_vis = self._filas_visibles()
+        self.offset = max(0, min(self.offset, total - self._n_vis))
+        ventana = self.filas[self.offset:self.offset + self._n_vis]
+        while len(self._items) < len(ventana):
+            self._items.append(self.tree.insert("", tk.END, values=()))
+        while len(self._items) > len(ventana):
+            iid = self._items.pop()
+            self.tree.delete(iid)
+            self._mostrados.pop(iid, None)
+        for iid, vals in zip(self._items, ventana):
+            if self._mostrados.get(iid) != vals:
+                self.tree.item(iid, values=vals)
+                self._mostrados[iid] = vals
+        visible_sel = self.sel is not None and self.offset <= self.sel < self.offset + len(ventana)
+        self.tree.selection_set([self._items[self.sel - self.offset]] if visible_sel else [])
+        if total:
+            self.vsb.set(self.offset / total, min(1.0, (self.offset + len(ventana)) / total))
+        else:
+            self.vsb.set(0.0, 1.0)
+
+    # ---------- desplazamiento ----------
+    def _mover(self, delta):
+        self.offset += delta
+        self._render()
+
+    def _yview(self, *args):
+        total = len(self.filas)
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            n = int(args[1])
+            self.offset += n * (self._n_vis if args[2] == "pages" else 1)
+        self._render()
+
+    def _rueda(self, event):
+        self._mover(-self.PASO_RUEDA if event.delta > 0 else self.PASO_RUEDA)
+        return "break"
+
+    def _on_select(self, _e=None):
+        sel = self.tree.selection()
+        if sel and sel[0] in self._items:
+            self.sel = self.offset + self._items.index(sel[0])
+
+    def _tecla(self, d):
+        if not self.filas:
+            return "break"
+        actual = self.sel if self.sel is not None else self.offset
+        if d == "ini": nuevo = 0
+        elif d == "fin": nuevo = len(self.filas) - 1
+        elif d == "p": nuevo = actual + self._n_vis
+        elif d == "-p": nuevo = actual - self._n_vis
+        else: nuevo = actual + d
+        self.sel = max(0, min(nuevo, len(self.filas) - 1))
+        if self.sel < self.offset:
+            self.offset = self.sel
+        elif self.sel >= self.offset + self._n_vis:
+            self.offset = self.sel - self._n_vis + 1
+        self._render()
+        return "break"
+
+# --------------------------- Hilo de E/S ---------------------------
+
+class TrabajadorIO:
+    """
+    Lecturas y escrituras de los registros fuera del bucle de Tk.
+    - UN solo hilo: las tareas se ejecutan en el orden en que se encolan (nunca dos escrituras a la vez).
+    - El resultado vuelve al hilo de la GUI por una cola que se revisa con after() solo mientras hay trabajo.
+    - Los botones pasados en `widgets` quedan deshabilitados hasta que la tarea termina.
+    """
+    SONDEO_MS = 50
+
+    def __init__(self, root, al_cambiar_ocupado=None):
+        self.root = root
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="osi-io")
+        self._cola = queue.Queue()      # callables a ejecutar en el hilo de la GUI
+        self._pendientes = 0
+        self._cuando_libre = []
+        self._sondeo = None
+        self._al_cambiar_ocupado = al_cambiar_ocupado
+        self._hilo_gui = threading.get_ident()
+        self.avisos = 0  # errores ya mostrados por mostrar_error (para no repetir el aviso)
+
+    def ocupado(self) -> bool:
+        return self._pendientes > 0
+
+    def ejecutar(self, func, al_terminar=None, al_fallar=None, widgets=()):
+        """Encola `func()`; al terminar llama a `al_terminar(resultado)` (o `al_fallar(exc)`) en la GUI."""
+        self._pendientes += 1
+        if self._pendientes == 1 and self._al_cambiar_ocupado:
+            self._al_cambiar_ocupado(True)
+        for w in widgets:
+            _estado_widget(w, "disabled")
+        fut = self._pool.submit(func)
+        fut.add_done_callback(lambda f: self._cola.put(lambda: self._terminar(f, al_terminar, al_fallar, widgets)))
+        self._programar_sondeo()
+
+    def cuando_libre(self, func):
+        """Ejecuta `func` en la GUI en cuanto no quede ninguna tarea pendiente."""
+        if not self.ocupado():
+            func()
+        else:
+            self._cuando_libre.append(func)
+
+    def mostrar_error(self, titulo: str, msg: str):
+        """Reemplazo de osi_datos.mostrar_error: desde el hilo de E/S, el aviso se muestra en la GUI."""
+        self.avisos += 1
+        if threading.get_ident() == self._hilo_gui:
+            messagebox.showerror(titulo, msg)
+        else:
+            self._cola.put(lambda: messagebox.showerror(titulo, msg))
+
+    def _terminar(self, fut, al_terminar, al_fallar, widgets):
+        self._pendientes -= 1
+        for w in widgets:
+            _estado_widget(w, "normal")
+        exc = fut.exception()
+        if exc is not None:
+            if al_fallar:
+                al_fallar(exc)
+            else:
+                messagebox.showerror("Error", f"No se pudo completar la operación.\n{exc}")
+        elif al_terminar:
+            al_terminar(fut.result())
+        if not self.ocupado():
+            if self._al_cambiar_ocupado:
+                self._al_cambiar_ocupado(False)
+            esperando, self._cuando_libre = self._cuando_libre, []
+            for func in esperando:
+                func()
+
+    def _programar_sondeo(self):
+        if self._sondeo is None:
+            self._sondeo = self.root.after(self.SONDEO_MS, self._sondear)
+
+    def _sondear(self):
+        self._sondeo = None
+        if self.ocupado() or not self._cola.empty():
+            self._programar_sondeo()  # antes de procesar: un error en un callback no detiene el sondeo
+        while True:
+            try:
+                func = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            func()
+
+def _estado_widget(w, estado):
+    try:
+        if w is not None and w.winfo_exists():
+            w.configure(state=estado)
+    except tk.TclError:
+        pass  # la ventana se cerró mientras la tarea corría
+
+class _Rechazado(Exception):
+    """Sale de un `with ALMACEN.lote()` sin guardar nada: alguna de sus modificaciones no procede."""
+
+def _tras_io(metodo):
+    """Acciones que consultan el almacén: se ejecutan con el hilo de E/S libre y los registros al día (ver App._con_registros)."""
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        self._con_registros(lambda: metodo(self, *args, **kwargs))
+    return envoltura
+
+def _cerrar_con_aviso(win, msg, error="No se pudo guardar. Intenta de nuevo."):
+    """Callback de fin de guardado para las ventanas auxiliares: si la tarea devolvió False, avisa y no cierra."""
+    def fin(resultado=None):
+        if resultado is False:
+            messagebox.showerror("Error", error)
+            return
+        messagebox.showinfo("Éxito", msg)
+        if win.winfo_exists():
+            win.destroy()
+    return fin
 
 # ------------------------- Ventanas auxiliares ------------------------
 
 class VentanaPrestamo(ttk.Toplevel):
+    @osi_perf.cronometrado("ventana:prestamo")
     def __init__(self, master, num_prop):
         super().__init__(master)
         self.title(f"Préstamos — {num_prop}")
@@ -192,9 +364,7 @@ class VentanaPrestamo(ttk.Toplevel):
         if not _inv_has(num_prop):
             ttk.Label(self, text="Esta máquina NO existe en el inventario.", foreground="red").grid(row=0, column=0, columnspan=2, **pad); return
 
-        inv = _read_xlsx(PATH_INV, INV_COLS)
-        row = inv[inv["Num_Propiedad"].astype(str).str.upper()==num_prop.upper()]
-        disponible = str(row.iloc[0]["Disponible"]).strip().upper()=="X"
+        disponible = ALMACEN.disponible(num_prop)
         ttk.Label(self, text=f"Estado actual: {'DISPONIBLE' if disponible else 'PRESTADA'}").grid(row=0, column=0, columnspan=2, **pad)
 
         if disponible:
@@ -204,65 +374,56 @@ class VentanaPrestamo(ttk.Toplevel):
             self.e_nombre = ttk.Entry(self, width=28); self.e_nombre.grid(row=2, column=1, sticky=EW, **pad)
             ttk.Label(self, text="Teléfono:").grid(row=3, column=0, sticky=E, **pad)
             self.e_tel = ttk.Entry(self, width=28); self.e_tel.grid(row=3, column=1, sticky=EW, **pad)
-            ttk.Button(self, text="Registrar préstamo", bootstyle="success",
-                       command=self._prestar).grid(row=4, column=0, columnspan=2, pady=(6,12))
+            self.btn = ttk.Button(self, text="Registrar préstamo", bootstyle="success",
+                                  command=self._prestar)
+            self.btn.grid(row=4, column=0, columnspan=2, pady=(6,12))
         else:
             ttk.Label(self, text="¿Deseas registrar devolución ahora?").grid(row=1, column=0, columnspan=2, **pad)
-            ttk.Button(self, text="Registrar devolución", bootstyle="warning",
-                       command=self._devolver).grid(row=2, column=0, columnspan=2, pady=(6,12))
+            self.btn = ttk.Button(self, text="Registrar devolución", bootstyle="warning",
+                                  command=self._devolver)
+            self.btn.grid(row=2, column=0, columnspan=2, pady=(6,12))
 
     def _prestar(self):
         ident = self.e_ident.get().strip(); nombre = self.e_nombre.get().strip(); tel = self.e_tel.get().strip()
         if not all([ident, nombre, tel]):
             messagebox.showwarning("Atención","Debes completar Identificador, Nombre y Teléfono."); return
-        prest = _read_xlsx(PATH_PREST, PREST_COLS)
-        nueva = pd.DataFrame([{
+        fila = {
             "Num_Propiedad": self.num_prop, "Nombre": nombre, "Identificador": ident,
             "Num_Tele": tel, "Dia_Pres": _now_full(), "Dia_Entr": ""
-        }])
-        prest = pd.concat([prest, nueva], ignore_index=True)
-        _write_xlsx_exact(prest, PATH_PREST, PREST_COLS)
-        inv = _read_xlsx(PATH_INV, INV_COLS)
-        m = inv["Num_Propiedad"].astype(str).str.upper()==self.num_prop.upper()
-        if m.any():
-            inv.loc[m, "Disponible"] = ""
-            _write_xlsx_exact(inv, PATH_INV, INV_COLS)
-        messagebox.showinfo("Éxito","Préstamo registrado."); self.destroy()
+        }
+        def tarea():
+            # Registro nuevo (se anexa al historial) + inventario: ambos archivos se confirman juntos
+            try:
+                with ALMACEN.lote():
+                    if not (ALMACEN.agregar("prest", fila) and ALMACEN.marcar_disponible(self.num_prop, False)):
+                        raise _Rechazado  # p. ej. otra estación la prestó mientras tanto: no se guarda nada
+            except _Rechazado:
+                return False
+            return ALMACEN.ok_lote
+        self.master.io.ejecutar(tarea, _cerrar_con_aviso(self, "Préstamo registrado.",
+                                                         "No se registró el préstamo: la máquina ya está prestada "
+                                                         "o no se pudo guardar."), widgets=(self.btn,))
 
     def _devolver(self):
-        prest = _read_xlsx(PATH_PREST, PREST_COLS)
-        m = prest["Num_Propiedad"].astype(str).str.upper() == self.num_prop.upper()
-
-        # --- FIX: detectar préstamos sin fecha de devolución ---
-        dia_entr = prest["Dia_Entr"]
-
-        is_empty = (
-            dia_entr.isna() |
-            dia_entr.astype(str).str.strip().isin(["", "NaT", "nan"])
-        )
-
-        abiertos = prest[m & is_empty]
-
-        if abiertos.empty:
-            messagebox.showwarning("Atención", "No se encontró préstamo pendiente para esta máquina.")
-            return
-
-        # --- FIX: actualizar correctamente la fecha ---
-        idx = abiertos.tail(1).index[0]
-        prest.at[idx, "Dia_Entr"] = _now_full()
-
-        # Asegurar que se escriba correctamente en el Excel
-        _write_xlsx_exact(prest, PATH_PREST, PREST_COLS)
-
-        # Marcar máquina como disponible en inventario
-        inv = _read_xlsx(PATH_INV, INV_COLS)
-        m2 = inv["Num_Propiedad"].astype(str).str.upper() == self.num_prop.upper()
-        if m2.any():
-            inv.loc[m2, "Disponible"] = "X"
-            _write_xlsx_exact(inv, PATH_INV, INV_COLS)
-
-        messagebox.showinfo("Éxito", "Devolución registrada y máquina marcada DISPONIBLE.")
-        self.destroy()
+        def fin(ok):
+            if ok is None:
+                messagebox.showwarning("Atención", "No se encontró préstamo pendiente para esta máquina.")
+                return
+            _cerrar_con_aviso(self, "Devolución registrada y máquina marcada DISPONIBLE.")(ok)
+        self.master.io.ejecutar(self._registrar_devolucion, fin, widgets=(self.btn,))
+
+    def _registrar_devolucion(self):
+        """Hilo de E/S: cierra el préstamo abierto. None si no había ninguno, False si no se pudo guardar."""
+        # Préstamos + inventario (máquina DISPONIBLE) se escriben juntos: nunca uno sin el otro
+        try:
+            with ALMACEN.lote():
+                if not ALMACEN.cerrar_prestamo(self.num_prop, _now_full()):
+                    raise _Rechazado
+                if not ALMACEN.marcar_disponible(self.num_prop, True):
+                    raise _Rechazado  # sin la marca de disponible tampoco se cierra el préstamo
+        except _Rechazado:
+            return None
+        return ALMACEN.ok_lote
 
 class VentanaMantenimiento(ttk.Toplevel):
     """
@@ -272,6 +433,7 @@ class VentanaMantenimiento(ttk.Toplevel):
     - Si no se marca: registra la reparación con fecha ahora (Dia = now).
     - Finalización: si hay pendiente (Dia vacío o flag 'X'), permite cerrar el MISMO registro.
     """
+    @osi_perf.cronometrado("ventana:mantenimiento")
     def __init__(self, master, num_prop):
         super().__init__(master)
         self.title(f"Mantenimientos — {num_prop}")
@@ -285,11 +447,11 @@ class VentanaMantenimiento(ttk.Toplevel):
             return
 
         # Cargar mantenimientos y detectar columna de flag si existe
-        self.df_mant = _read_xlsx(PATH_MANT, MANT_COLS)
+        self.df_mant = ALMACEN.tabla("mant")
         self.pending_flag_col = _find_pending_flag_col(self.df_mant)
 
         # ¿Hay reparación pendiente?
-        self.pending_idx = self._buscar_reparacion_pendiente(self.df_mant, self.num_prop, self.pending_flag_col)
+        self.pending_idx = ALMACEN.reparacion_abierta(self.num_prop)
 
         ttk.Label(self, text=f"Máquina: {num_prop}", font=("Segoe UI",10,"bold")).grid(row=0, column=0, columnspan=3, **pad)
 
@@ -302,12 +464,13 @@ class VentanaMantenimiento(ttk.Toplevel):
 
             ttk.Label(self, text="Descripción final (qué se hizo):").grid(row=3, column=0, columnspan=3, sticky=W, **pad)
             self.t_rep_final = tk.Text(self, width=48, height=5)
-            desc_prev = str(self.df_mant.loc[self.pending_idx, "Desc_Reparacion"]) if "Desc_Reparacion" in self.df_mant.columns else ""
+            desc_prev = str(self.df_mant.iloc[self.pending_idx]["Desc_Reparacion"]) if "Desc_Reparacion" in self.df_mant.columns else ""
             self.t_rep_final.insert("1.0", desc_prev)
             self.t_rep_final.grid(row=4, column=0, columnspan=3, sticky=EW, **pad)
 
-            ttk.Button(self, text="Finalizar reparación", bootstyle="success",
-                       command=self._finalizar_reparacion).grid(row=99, column=0, columnspan=3, pady=(6,12))
+            self.btn = ttk.Button(self, text="Finalizar reparación", bootstyle="success",
+                                  command=self._finalizar_reparacion)
+            self.btn.grid(row=99, column=0, columnspan=3, pady=(6,12))
             return
 
         # --- Registrar NUEVO (Mantenimiento / Reparación) ---
@@ -353,8 +516,9 @@ class VentanaMantenimiento(ttk.Toplevel):
         self.t_rep = tk.Text(self.box_r, width=48, height=4)
         self.t_rep.pack(fill=BOTH, expand=True, padx=8, pady=6)
 
-        ttk.Button(self, text="Registrar", bootstyle="success",
-                   command=self._registrar).grid(row=99, column=0, columnspan=3, pady=(6,12))
+        self.btn = ttk.Button(self, text="Registrar", bootstyle="success",
+                              command=self._registrar)
+        self.btn.grid(row=99, column=0, columnspan=3, pady=(6,12))
 
     # ---------- helpers ---------
     # --- Utils de fecha (pegar junto a los otros helpers) ---
@@ -371,27 +535,6 @@ class VentanaMantenimiento(ttk.Toplevel):
             self.e_pieza.delete(0, tk.END)
             self.e_pieza.configure(state="disabled")
 
-    @staticmethod
-    def _is_blank(x) -> bool:
-        return (x is None) or (str(x).strip() == "") or (pd.isna(x))
-
-    def _buscar_reparacion_pendiente(self, df: pd.DataFrame, num_prop: str, pending_flag_col: str | None):
-        if df is None or df.empty:
-            return None
-        mask_np = df["Num_Propiedad"].astype(str).str.upper() == str(num_prop).upper()
-        if "Tipo" not in df.columns:
-            return None
-        mask_tipo = df["Tipo"].astype(str).str.strip().str.lower() == "reparación".lower()
-        mask_dia = df["Dia"].apply(self._is_blank) if "Dia" in df.columns else pd.Series([False]*len(df))
-        if pending_flag_col and pending_flag_col in df.columns:
-            mask_flag = df[pending_flag_col].astype(str).str.strip().str.upper() == "X"
-        else:
-            mask_flag = pd.Series([False]*len(df))
-        pend = df[mask_np & mask_tipo & (mask_dia | mask_flag)]
-        if pend.empty:
-            return None
-        return pend.tail(1).index[0]
-
     # ---------- registrar nuevo ----------
     def _registrar(self):
         tec = self.e_tec.get().strip()
@@ -422,17 +565,14 @@ class VentanaMantenimiento(ttk.Toplevel):
                 fila["Dia"] = _now_full()
             fila["Desc_Reparacion"] = desc
 
-        df = self.df_mant.copy()
-        df = pd.concat([df, pd.DataFrame([fila])], ignore_index=True)
-
         # Si existe columna de flag y se marcó pendiente, poner 'X' en esa columna (sin crear columnas nuevas)
         if self.pending_flag_col and tipo == "Reparación" and fila["Dia"] == "":
-            if self.pending_flag_col in df.columns:
-                df.iloc[-1, df.columns.get_loc(self.pending_flag_col)] = "X"
+            if self.pending_flag_col in self.df_mant.columns:
+                fila[self.pending_flag_col] = "X"
 
-        _write_xlsx_exact(df, PATH_MANT, MANT_COLS)
-        messagebox.showinfo("Éxito", f"{fila['Tipo']} registrada.")
-        self.destroy()
+        # Registro nuevo: se anexa al historial sin reescribirlo
+        self.master.io.ejecutar(lambda: ALMACEN.agregar("mant", fila),
+                                _cerrar_con_aviso(self, f"{fila['Tipo']} registrada."), widgets=(self.btn,))
 
     # ---------- finalizar pendiente ----------
     def _finalizar_reparacion(self):
@@ -443,22 +583,29 @@ class VentanaMantenimiento(ttk.Toplevel):
             messagebox.showwarning("Atención","No se encontró reparación pendiente."); return
 
         desc_final = self.t_rep_final.get("1.0","end").strip()
-        if "Desc_Reparacion" in self.df_mant.columns:
-            self.df_mant.at[self.pending_idx, "Desc_Reparacion"] = desc_final
-        if "tecnico" in self.df_mant.columns:
-            self.df_mant.at[self.pending_idx, "tecnico"] = tec
-        if "Dia" in self.df_mant.columns:
-            self.df_mant.at[self.pending_idx, "Dia"] = _now_full()
-        if self.pending_flag_col and self.pending_flag_col in self.df_mant.columns:
-            self.df_mant.at[self.pending_idx, self.pending_flag_col] = ""
-
-        _write_xlsx_exact(self.df_mant, PATH_MANT, MANT_COLS)
-        messagebox.showinfo("Éxito", "Reparación finalizada.")
-        self.destroy()
+        dia = _now_full()
+        io = self.master.io
+        def tarea():
+            """None si ya no hay reparación pendiente; si no, (guardada, ya se avisó el error)."""
+            if ALMACEN.reparacion_abierta(self.num_prop) is None:
+                return None  # p. ej. otra estación la finalizó mientras tanto
+            avisos = io.avisos
+            ok = ALMACEN.finalizar_reparacion(self.num_prop, tec, desc_final, dia)
+            return ok, io.avisos != avisos
+        def fin(res):
+            if res is None:
+                messagebox.showwarning("Atención","No se encontró reparación pendiente."); return
+            ok, avisado = res
+            if ok:
+                _cerrar_con_aviso(self, "Reparación finalizada.")()
+            elif not avisado:  # el almacén ya mostró por qué no se guardó: un solo aviso
+                messagebox.showerror("Error", "No se pudo guardar la reparación. Intenta de nuevo.")
+        io.ejecutar(tarea, fin, widgets=(self.btn,))
 
 # ------------------------------- App ---------------------------------
 
 class App(ttk.Window):
+    @osi_perf.cronometrado("ventana:principal")
     def __init__(self):
         super().__init__(title="OSI Arecibo — Inventario, Préstamos y Mantenimientos",
                          themename="superhero", size=(1120, 820))
@@ -467,6 +614,7 @@ class App(ttk.Window):
         # --- Autenticación ---
         self.auth_until = None  # datetime o None
         self.timer_job = None
+        self._segundos = 0      # ticks del temporizador (también vigila cambios en disco)
 
         self.header = ttk.Frame(self, bootstyle="dark")
         self.header.pack(fill=X, padx=12, pady=(12,0))
@@ -477,14 +625,24 @@ class App(ttk.Window):
         self.auth_label = ttk.Label(self.header, text="No autenticado", font=("Segoe UI", 10))
         self.auth_label.pack(side=RIGHT, padx=8, pady=6)
 
+        # Indicador de trabajo en segundo plano (lectura/escritura de los registros)
+        self.pb_io = ttk.Progressbar(self.header, mode="indeterminate", length=120, bootstyle="info-striped")
+        self.io = TrabajadorIO(self, al_cambiar_ocupado=self._set_ocupado)
+        osi_datos.mostrar_error = self.io.mostrar_error
+
+        self.inv_df, self.inv_vals = None, []  # se llenan en _load_inventory
+
         self._build_toolbar()
         self._build_table()
 
-        self._load_inventory()
-        self._refresh_counts()
+        self._load_inventory()  # en segundo plano: la ventana aparece ya
         self._setup_shortcuts()
         self._update_auth_timer()
 
+        # Latido del bucle de Tk: anota en el log cuándo y dónde se congela la ventana
+        self.vigia = osi_perf.VigiaBucle()
+        self.vigia.iniciar(self.after)
+
     # ---------- UI ----------
     def _build_toolbar(self):
         # LabelFrame con padding interno para respirar
@@ -517,11 +675,35 @@ class App(ttk.Window):
                 command=lambda: self._require_auth(self._add_machine)
         ).pack(side=LEFT, padx=3, pady=1)
 
-        ttk.Button(left, text="Importar…",
+        self.btn_importar = ttk.Button(left, text="Importar…",
                 bootstyle=("secondary", "toolbutton"),
                 style="Small.TButton", width=9,
                 command=lambda: self._require_auth(self._importar_lote)
-        ).pack(side=LEFT, padx=3, pady=1)
+        )
+        self.btn_importar.pack(side=LEFT, padx=3, pady=1)
+
+        self.btn_reportes = ttk.Button(left, text="Reportes…",
+                bootstyle=("secondary", "toolbutton"),
+                style="Small.TButton", width=9,
+                command=self._reportes
+        )
+        self.btn_reportes.pack(side=LEFT, padx=3, pady=1)
+
+        self.btn_texto = ttk.Button(left, text="Historial…",
+                bootstyle=("secondary", "toolbutton"),
+                style="Small.TButton", width=9,
+                command=self._buscar_texto
+        )
+        self.btn_texto.pack(side=LEFT, padx=3, pady=1)
+
+        self.btn_exportar = None
+        if ALMACEN.backend.nombre == "sqlite":
+            self.btn_exportar = ttk.Button(left, text="Exportar…",
+                    bootstyle=("secondary", "toolbutton"),
+                    style="Small.TButton", width=9,
+                    command=lambda: self._require_auth(self._exportar_excel)
+            )
+            self.btn_exportar.pack(side=LEFT, padx=3, pady=1)
 
         ttk.Button(left, text="Autenticar…",
                 bootstyle=("light", "toolbutton"),
@@ -529,11 +711,12 @@ class App(ttk.Window):
                 command=self._autenticar
         ).pack(side=LEFT, padx=(6, 3), pady=1)
 
-        ttk.Button(left, text="Refrescar",
+        self.btn_refrescar = ttk.Button(left, text="Refrescar",
                 bootstyle=("secondary", "toolbutton"),
                 style="Small.TButton", width=9,
                 command=self._refresh_view
-        ).pack(side=LEFT, padx=3, pady=1)
+        )
+        self.btn_refrescar.pack(side=LEFT, padx=3, pady=1)
 
         # Separador vertical para dividir acciones vs. búsqueda
         ttk.Separator(box, orient="vertical").pack(side=LEFT, fill=Y, padx=10, pady=6)
@@ -548,6 +731,11 @@ class App(ttk.Window):
         self.entry_q = ttk.Combobox(center, width=26, textvariable=self.q_var, values=[], state="normal")
         # ipady para hacer la caja un poquito más alta (si el tema lo soporta)
         self.entry_q.pack(side=LEFT, padx=(0, 8), pady=6, ipady=2)
+        # Autocompletado por prefijo (Num_Propiedad, ID_Laptop o Service_Tag) con debounce
+        self._ac_job = None
+        self._sugerencias = []
+        self.entry_q.bind("<KeyRelease>", self._on_tecla_busqueda)
+        self.entry_q.bind("<<ComboboxSelected>>", self._on_sugerencia)
 
         ttk.Button(center, text="Buscar", bootstyle="primary", width=10,
                 command=self._buscar_info).pack(side=LEFT, padx=6, pady=6)
@@ -579,15 +767,12 @@ class App(ttk.Window):
         self.btn_decos.grid(row=0, column=3, padx=(10, 6), pady=6)
 
     def _build_table(self):
-        cont = ttk.Frame(self); cont.pack(fill=BOTH, expand=True, padx=12, pady=(0,12))
-        self.tree = ttk.Treeview(cont, show="headings", height=22)
-        vsb = ttk.Scrollbar(cont, orient=tk.VERTICAL, command=self.tree.yview)
-        hsb = ttk.Scrollbar(cont, orient=tk.HORIZONTAL, command=self.tree.xview)
-        self.tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
-        self.tree.grid(row=0, column=0, sticky=NSEW)
-        vsb.grid(row=0, column=1, sticky=NS)
-        hsb.grid(row=1, column=0, sticky=EW)
-        cont.rowconfigure(0, weight=1); cont.columnconfigure(0, weight=1)
+        self.tabla = TablaVirtual(self, height=22)
+        self.tabla.pack(fill=BOTH, expand=True, padx=12, pady=(0,12))
+        self.tree = self.tabla.tree
+        self._vistas = {}  # nombre de tabla -> (versión, df ordenado, valores de pantalla)
+        self._filtros = {}  # (filtro, versión inv) -> valores de pantalla
+        self.filtro = None  # filtro mostrado en la vista de inventario ('disponibles'/'prestadas')
 
     # ---------- Shortcuts ----------
     def _setup_shortcuts(self):
@@ -603,6 +788,9 @@ class App(ttk.Window):
         self.bind("<Control-D>", lambda e: self._require_auth(self._decomisar))
         self.bind("<Control-l>", lambda e: self._autenticar())
         self.bind("<Control-L>", lambda e: self._autenticar())
+        self.bind("<Control-f>", lambda e: self._buscar_texto())
+        self.bind("<Control-F>", lambda e: self._buscar_texto())
+        self.bind("<F12>", lambda e: self._diagnostico())
 
     # ---------- Data loading / view ----------
     def _refresh_view(self):
@@ -611,72 +799,208 @@ class App(ttk.Window):
         else:
             self._load_inventory()
 
-    def _load_inventory(self):
-        self.view_mode = "inv"
-        self.inv_df = _read_xlsx(PATH_INV, INV_COLS)
-
-        # ✅ Ordenar por Num_Propiedad de mayor a menor (sin afectar el archivo original)
-        self.inv_df = self.inv_df.sort_values(
-            by="Num_Propiedad",
-            ascending=False,
-            key=lambda s: s.astype(str)
-        )
-
-        # actualizar lista para autocompletar
-        self.entry_q["values"] = self.inv_df["Num_Propiedad"].astype(str).tolist() if not self.inv_df.empty else []
-
-        # mostrar en la tabla y actualizar los contadores
-        self._fill_table(self.inv_df, INV_COLS)
-        self._refresh_counts()
+    def _con_registros(self, accion):
+        """
+        Ejecuta `accion()` en la GUI con el hilo de E/S libre y los registros en memoria al día.
+        Si otra estación cambió alguno, se relee ANTES en el hilo de E/S (nunca en el de Tk).
+        """
+        if self.io.ocupado():
+            self.io.cuando_libre(lambda: self._con_registros(accion))
+        elif not ALMACEN.al_dia():
+            self.io.ejecutar(ALMACEN.poner_al_dia, lambda _: self._con_registros(accion))
+        else:
+            accion()
+
+    def _vista(self, nombre: str, orden: bool = False):
+        """(df, valores de pantalla) de una tabla, recalculados solo si cambió su versión."""
+        ver = ALMACEN.version(nombre)
+        cache = self._vistas.get(nombre)
+        if cache is None or cache[0] != ver:
+            df = ALMACEN.tabla(nombre)
+            if orden:
+                # ✅ Ordenar por Num_Propiedad de mayor a menor (sin afectar el archivo original)
+                df = df.sort_values(by="Num_Propiedad", ascending=False, key=lambda s: s.astype(str))
+            cache = (ver, df, _valores_tabla(df, ALMACEN.cols(nombre)))
+            self._vistas[nombre] = cache
+        return cache[1], cache[2]
+
+    def _set_ocupado(self, ocupado: bool):
+        if ocupado:
+            self.pb_io.pack(side=RIGHT, padx=8, pady=6); self.pb_io.start(12)
+        else:
+            self.pb_io.stop(); self.pb_io.pack_forget()
+        self.configure(cursor="watch" if ocupado else "")
 
-    def _load_decomisadas(self):
+    def _load_inventory(self, despues=None, filtro=None):
+        """Lee/prepara el inventario (y el `filtro`) en el hilo de E/S y lo muestra al terminar (`despues` se llama luego)."""
+        self.view_mode = "inv"
+        def tarea():
+            vista = self._vista("inv", orden=True)
+            if filtro:
+                self._filas_filtradas(filtro)
+            ALMACEN.contadores()         # deja calientes los contadores
+            ALMACEN.sugerencias("R", 1)  # ...el índice del autocompletado
+            ALMACEN.estadisticas("")     # ...y el resumen por máquina (lee mant/prest)
+            return vista
+        def aplicar(vista):
+            self.inv_df, self.inv_vals = vista
+            self.filtro = None
+
+            # actualizar sugerencias del autocompletado (solo las del texto actual)
+            self._actualizar_sugerencias()
+
+            # mostrar en la tabla (si el usuario no cambió de vista mientras tanto) y actualizar los contadores
+            if self.view_mode == "inv":
+                self._fill_table(self.inv_df, INV_COLS, self.inv_vals)
+            self._refresh_counts()
+            if despues:
+                despues()
+        self.io.ejecutar(tarea, aplicar, widgets=(self.btn_refrescar,))
+
+    def _load_decomisadas(self, despues=None):
         self.view_mode = "dec"
-        self.dec_df = _read_xlsx(PATH_DEC, DEC_COLS)
-        self._fill_table(self.dec_df, DEC_COLS)
-        self._refresh_counts()
-
-    def _fill_table(self, df, cols):
-        self.tree.delete(*self.tree.get_children())
-        self.tree["columns"] = cols
-        for c in cols:
-            self.tree.heading(c, text=c)
-            w = 150 if c in ("Service_Tag","ID_Laptop") else 120
-            if c in ("Modelo","Garantía","Fecha_Compra","Fecha_Dec"): w=140
-            self.tree.column(c, width=w, anchor=W, stretch=True)
-        for _, r in df.iterrows():
-            vals = []
-            for c in cols:
-                v = r[c]
-                if c in ("Garantía","Fecha_Compra","Fecha_Dec"):
-                    vals.append(_fmt_date_only(v))
-                else:
-                    vals.append("" if pd.isna(v) else str(v))
-            self.tree.insert("", tk.END, values=vals)
+        def tarea():
+            vista = self._vista("dec")
+            ALMACEN.contadores()
+            return vista
+        def aplicar(vista):
+            self.dec_df, dec_vals = vista
+            if self.view_mode == "dec":
+                self._fill_table(self.dec_df, DEC_COLS, dec_vals)
+            self._refresh_counts()
+            if despues:
+                despues()
+        self.io.ejecutar(tarea, aplicar, widgets=(self.btn_refrescar,))
+
+    def _fill_table(self, df, cols, valores=None):
+        with osi_perf.medir("llenar_tabla") as m:
+            if valores is None:
+                valores = _valores_tabla(df, cols)
+            self.tabla.set_columnas(cols)
+            self.tabla.set_filas(valores)
+            m.filas = len(valores)
 
     def _apply_filter(self, kind):
-        if self.view_mode != "inv":
-            self._load_inventory()
-            return
-        if kind is None:
-            self._fill_table(self.inv_df, INV_COLS)
-        else:
-            disp = self.inv_df["Disponible"].astype(str).str.strip().str.upper()
-            if kind=="disponibles":
-                df = self.inv_df[disp=="X"]
+        # la vista y los filtros están cacheados por versión: si no cambió nada, no se relee
+        def mostrar():
+            self.filtro = kind
+            if kind is None:
+                self._fill_table(self.inv_df, INV_COLS, self.inv_vals)
             else:
-                df = self.inv_df[disp!="X"]
-            self._fill_table(df, INV_COLS)
+                self._fill_table(None, INV_COLS, self._filas_filtradas(kind))
+        self._load_inventory(despues=mostrar, filtro=kind)
+
+    def _filas_filtradas(self, kind):
+        """
+        Filas de pantalla de 'disponibles'/'prestadas', calculadas una vez por versión de la vista
+        del inventario. Se calculan en el hilo de E/S (tarea de _load_inventory/_vigilar_disco);
+        en la GUI solo se toman de la caché.
+        """
+        ver = self._vistas["inv"][0]
+        clave = (kind, ver)
+        if clave not in self._filtros:
+            conj = ALMACEN.disponibles() if kind=="disponibles" else ALMACEN.prestadas()
+            # la primera columna de pantalla es Num_Propiedad, ya normalizado por el almacén
+            self._filtros = {k: v for k, v in self._filtros.items() if k[1] == ver}
+            self._filtros[clave] = [v for v in self._vistas["inv"][2] if v[0] in conj]
+        return self._filtros[clave]
+
+    # ---------- Cambios desde otra estación ----------
+    def _vigilar_disco(self):
+        """
+        Con el temporizador de cada segundo: si otra estación cambió algún registro, se
+        relee SOLO esa tabla y la pantalla se corrige fila a fila (misma posición y selección).
+        """
+        if self.io.ocupado():
+            return  # el hilo de E/S tiene el almacén: se mira en la próxima vuelta
+        cambiadas = ALMACEN.cambiadas_en_disco()
+        if not cambiadas:
+            return
+        def tarea():
+            for n in cambiadas:
+                if n in ("inv", "dec"):
+                    self._parchear_vista(n)
+                else:
+                    ALMACEN.tabla(n)
+            if "inv" in cambiadas and "inv" in self._vistas and self.filtro:
+                self._filas_filtradas(self.filtro)
+            ALMACEN.contadores()
+        def aplicar(_):
+            if "inv" in cambiadas and "inv" in self._vistas:
+                self.inv_df, self.inv_vals = self._vistas["inv"][1:]
+                if self.view_mode == "inv":
+                    self.tabla.actualizar_filas(self.inv_vals if self.filtro is None else self._filas_filtradas(self.filtro))
+            if "dec" in cambiadas and "dec" in self._vistas:
+                self.dec_df, dec_vals = self._vistas["dec"][1:]
+                if self.view_mode == "dec":
+                    self.tabla.actualizar_filas(dec_vals)
+            self._refresh_counts()
+        self.io.ejecutar(tarea, aplicar)
+
+    def _parchear_vista(self, nombre: str):
+        """(Hilo de E/S) Relee `nombre` y corrige su vista cacheada solo en las filas que cambiaron."""
+        previa = self._vistas.get(nombre)
+        df = ALMACEN.tabla(nombre)
+        if previa is None:
+            return  # nunca se mostró: se arma completa cuando haga falta
+        dif = diferencias(previa[1], df)
+        if dif is None:
+            del self._vistas[nombre]
+            self._vista(nombre, orden=nombre == "inv")
+            return
+        altas, bajas, cambiadas = dif
+        cols = ALMACEN.cols(nombre)
+        tocadas = set(altas) | set(cambiadas)
+        nuevas = {v[0]: v for v in _valores_tabla(df[df["Num_Propiedad"].isin(tocadas)], cols)}
+        fuera = set(bajas)
+        vals = [nuevas.get(v[0], v) for v in previa[2] if v[0] not in fuera]
+        vals += [nuevas[k] for k in altas]
+        if altas and nombre == "inv":
+            vals.sort(key=lambda v: v[0], reverse=True)  # mismo orden que _vista (casi ordenada: barato)
+        self._vistas[nombre] = (ALMACEN.version(nombre), df, vals)
 
     def _refresh_counts(self):
-        inv = getattr(self, "inv_df", pd.DataFrame(columns=INV_COLS))
-        total = len(inv)
-        disp = inv["Disponible"].astype(str).str.strip().str.upper()=="X" if not inv.empty else []
-        n_disp = int(disp.sum()) if len(disp)>0 else 0
-        n_prest = total - n_disp
+        total, n_prest, n_disp = ALMACEN.contadores()
         self.lbl_total.configure(text=f"Total: {total}")
         self.lbl_prest.configure(text=f"Prestadas: {n_prest}")
         self.lbl_disp.configure(text=f"Disponibles: {n_disp}")
 
+    # ---------- Autocompletado ----------
+    def _on_tecla_busqueda(self, event):
+        if event.keysym in ("Return", "KP_Enter", "Up", "Down", "Left", "Right", "Escape", "Tab"):
+            return
+        if self._ac_job:
+            self.after_cancel(self._ac_job)
+        self._ac_job = self.after(AUTOCOMPLETAR_MS, self._actualizar_sugerencias)
+
+    @_tras_io
+    def _actualizar_sugerencias(self):
+        self._ac_job = None
+        txt = self.q_var.get().strip()
+        self._sugerencias = ALMACEN.sugerencias(txt, AUTOCOMPLETAR_N) if txt else []
+        self.entry_q["values"] = [texto for texto, _ in self._sugerencias]
+
+    def _on_sugerencia(self, _e=None):
+        # "R40022104  (UIPRA-EST-L045)" -> "R40022104"
+        elegido = self.q_var.get()
+        for texto, num in self._sugerencias:
+            if texto == elegido:
+                self.q_var.set(num)
+                break
+
+    def _num_actual(self) -> str:
+        """Num_Propiedad del buscador; también acepta un ID_Laptop o Service_Tag exacto."""
+        txt = self.q_var.get().strip()
+        if "  (" in txt:
+            txt = txt.split("  (")[0].strip()
+        if not txt or ALMACEN.inv_tiene(txt) or ALMACEN.existe_decomisada(txt):
+            return txt
+        for col in ("ID_Laptop", "Service_Tag"):
+            filas = ALMACEN.filas("inv", txt, col)
+            if len(filas) == 1:
+                return str(filas.iloc[0]["Num_Propiedad"]).strip()
+        return txt
+
     # ---------- Autenticación ----------
     def _autenticar(self):
         path = filedialog.askopenfilename(title="Seleccionar archivo de autenticación")
@@ -714,6 +1038,9 @@ class App(ttk.Window):
             self.auth_label.configure(text=f"Autenticado: {mins:02d}:{secs:02d} restantes")
         else:
             self.auth_label.configure(text="No autenticado")
+        self._segundos += 1
+        if self._segundos % VIGILAR_CADA_S == 0:
+            self._vigilar_disco()
         # reprogramar
         if self.timer_job:
             self.after_cancel(self.timer_job)
@@ -723,51 +1050,50 @@ class App(ttk.Window):
     def _show_decomisadas(self):
         self._load_decomisadas()
 
+    @_tras_io
     def _buscar_info(self):
-        num = self.q_var.get().strip()
+        num = self._num_actual()
         if not num:
             messagebox.showwarning("Atención","Ingresa un Num_Propiedad."); return
 
         if _exists_decomisada(num):
             messagebox.showinfo("Resultado", f"Num_Propiedad {num} está **DECOMISADA**.")
+            sel = ALMACEN.filas("dec", num)
+            mostrar = (lambda: self._fill_table(sel, DEC_COLS)) if not sel.empty else None
             if self.view_mode != "dec":
-                self._load_decomisadas()
-            dec = getattr(self, "dec_df", pd.DataFrame(columns=DEC_COLS))
-            if not dec.empty:
-                sel = dec[dec["Num_Propiedad"].astype(str).str.upper()==num.upper()]
-                if not sel.empty: self._fill_table(sel, DEC_COLS)
+                self._load_decomisadas(despues=mostrar)
+            elif mostrar:
+                mostrar()
             return
 
         if self.view_mode != "inv":
             self._load_inventory()
-        row = self.inv_df[self.inv_df["Num_Propiedad"].astype(str).str.upper()==num.upper()]
+        # se mide solo la consulta: el tiempo con el mensaje abierto es del usuario, no del programa
+        with osi_perf.medir("buscar_info") as m:
+            row = ALMACEN.filas("inv", num)
+            m.filas = len(row)
+            if not row.empty:
+                r = row.iloc[0]
+                estado = "DISPONIBLE" if ALMACEN.disponible(num) else "PRESTADA"
+                modelo = str(r["Modelo"]); st = str(r["Service_Tag"]); idl = str(r["ID_Laptop"])
+                gar = _fmt_date_only(r["Garantía"]); fcomp = _fmt_date_only(r["Fecha_Compra"])
+
+                est = ALMACEN.estadisticas(num)
+                cnt_m, cnt_r, cnt_p = est["mantenimientos"], est["reparaciones"], est["prestamos"]
+                ult = _fmt_date_only(est["ultimo_servicio"]) or "(sin registro)"
         if row.empty:
             messagebox.showinfo("Resultado","No se encontró en inventario.")
             return
 
-        r = row.iloc[0]
-        estado = "DISPONIBLE" if str(r["Disponible"]).strip().upper()=="X" else "PRESTADA"
-        modelo = str(r["Modelo"]); st = str(r["Service_Tag"]); idl = str(r["ID_Laptop"])
-        gar = _fmt_date_only(r["Garantía"]); fcomp = _fmt_date_only(r["Fecha_Compra"])
-
-        m = _read_xlsx(PATH_MANT, MANT_COLS)
-        mm = m[m["Num_Propiedad"].astype(str).str.upper()==num.upper()]
-        cnt_m = int((mm["Tipo"].astype(str)=="Mantenimiento").sum())
-        cnt_r = int((mm["Tipo"].astype(str)=="Reparación").sum())
-        ult = _fmt_date_only(mm["Dia"].max()) if not mm.empty else "(sin registro)"
-
-        p = _read_xlsx(PATH_PREST, PREST_COLS)
-        pp = p[p["Num_Propiedad"].astype(str).str.upper()==num.upper()]
-        cnt_p = len(pp)
-
         msg = (f"Num_Propiedad: {num}\nID_Laptop: {idl}\nService_Tag: {st}\nModelo: {modelo}\n"
                f"Estado: {estado}\n\nMantenimientos: {cnt_m}\nReparaciones: {cnt_r}\n"
                f"Último mant./rep.: {ult}\nPréstamos totales: {cnt_p}\n\n"
                f"Garantía: {gar}\nFecha de compra: {fcomp}")
         messagebox.showinfo("Resumen de la máquina", msg)
 
+    @_tras_io
     def _open_prestamo(self):
-        num = self.q_var.get().strip()
+        num = self._num_actual()
         if not num:
             messagebox.showwarning("Atención","Ingresa un Num_Propiedad primero."); return
         if _exists_decomisada(num):
@@ -778,8 +1104,9 @@ class App(ttk.Window):
             return
         VentanaPrestamo(self, num)
 
+    @_tras_io
     def _open_mant(self):
-        num = self.q_var.get().strip()
+        num = self._num_actual()
         if not num:
             messagebox.showwarning("Atención","Ingresa un Num_Propiedad primero."); return
         if _exists_decomisada(num):
@@ -790,6 +1117,8 @@ class App(ttk.Window):
             return
         VentanaMantenimiento(self, num)
 
+    @_tras_io
+    @osi_perf.cronometrado("ventana:añadir")
     def _add_machine(self):
         win = ttk.Toplevel(self); win.title("Añadir máquina"); win.resizable(False, False); win.grab_set()
         pad={"padx":10,"pady":6}
@@ -813,38 +1142,38 @@ class App(ttk.Window):
             if not re.fullmatch(r"R\d{8}", npv): errs.append("Número de Propiedad inválido (R + 8 dígitos).")
             if not re.fullmatch(r"UIPRA-(EST|FAC)-L\d{3}", idv): errs.append("ID_Laptop inválido (UIPRA-(EST|FAC)-L###).")
             if not re.fullmatch(r"[A-Z0-9]{7}", stv): errs.append("Service_Tag inválido (7 alfanuméricos en MAYÚSCULA).")
-            try:
-                dtg = pd.to_datetime(gav, format="%Y-%m-%d", errors="raise")
-                if dtg.date() <= datetime.now().date(): errs.append("Garantía debe ser FUTURA (YYYY-MM-DD).")
-            except Exception: errs.append("Garantía inválida (YYYY-MM-DD).")
-            try:
-                _ = pd.to_datetime(fcv, format="%Y-%m-%d", errors="raise")
-            except Exception: errs.append("Fecha de compra inválida (YYYY-MM-DD).")
-            inv=_read_xlsx(PATH_INV, INV_COLS)
-            if (inv["Num_Propiedad"].astype(str).str.upper()==npv).any(): errs.append("Num_Propiedad duplicado.")
-            if (inv["ID_Laptop"].astype(str).str.upper()==idv).any(): errs.append("ID_Laptop duplicado.")
-            if (inv["Service_Tag"].astype(str).str.upper()==stv).any(): errs.append("Service_Tag duplicado.")
+            fechas, invalidas = fechas_columna([gav, fcv], formatos=("%Y-%m-%d",))
+            if invalidas[0]: errs.append("Garantía inválida (YYYY-MM-DD).")
+            elif fechas[0].date() <= datetime.now().date(): errs.append("Garantía debe ser FUTURA (YYYY-MM-DD).")
+            if invalidas[1]: errs.append("Fecha de compra inválida (YYYY-MM-DD).")
+            if ALMACEN.existe("inv", npv): errs.append("Num_Propiedad duplicado.")
+            if ALMACEN.existe("inv", idv, "ID_Laptop"): errs.append("ID_Laptop duplicado.")
+            if ALMACEN.existe("inv", stv, "Service_Tag"): errs.append("Service_Tag duplicado.")
             if _exists_decomisada(npv): errs.append("Ese Num_Propiedad aparece en decomisados.")
             if errs:
                 messagebox.showwarning("Datos inválidos", "\n".join(f"• {e}" for e in errs)); return
-            new = pd.DataFrame([{
+            fila = {
                 "Num_Propiedad": npv, "ID_Laptop": idv, "Service_Tag": stv,
                 "Modelo": mdv, "Disponible": "X", "Garantía": gav, "Fecha_Compra": fcv
-            }])
-            inv = pd.concat([inv, new], ignore_index=True)
-            _write_xlsx_exact(inv, PATH_INV, INV_COLS)
-            messagebox.showinfo("Éxito","Máquina añadida."); win.destroy(); self._load_inventory()
-        ttk.Button(win, text="Guardar", bootstyle="success", command=guardar).grid(row=6, column=0, columnspan=2, pady=(6,12))
-
+            }
+            def fin(ok):
+                _cerrar_con_aviso(win, "Máquina añadida.", "No se añadió la máquina: ese Num_Propiedad ya existe "
+                                                           "o no se pudo guardar.")(ok)
+                if ok:
+                    self._load_inventory()
+            self.io.ejecutar(lambda: ALMACEN.agregar("inv", fila), fin, widgets=(btn,))
+        btn = ttk.Button(win, text="Guardar", bootstyle="success", command=lambda: self._con_registros(guardar))
+        btn.grid(row=6, column=0, columnspan=2, pady=(6,12))
+
+    @_tras_io
     def _decomisar(self):
-        num = self.q_var.get().strip()
+        num = self._num_actual()
         if not num:
             messagebox.showwarning("Atención","Ingresa un Num_Propiedad para decomisar."); return
         if _exists_decomisada(num):
             messagebox.showwarning("Atención", f"La máquina {num} ya está DECOMISADA."); return
 
-        inv = _read_xlsx(PATH_INV, INV_COLS)
-        row = inv[inv["Num_Propiedad"].astype(str).str.upper()==num.upper()]
+        row = ALMACEN.filas("inv", num)
         if row.empty:
             messagebox.showwarning("Atención","No está en inventario. Si fue decomisada antes, usa 'Decomisadas'.")
             return
@@ -855,30 +1184,154 @@ class App(ttk.Window):
         r = row.iloc[0]
         id_lap = str(r["ID_Laptop"]); st = str(r["Service_Tag"]); modelo = str(r["Modelo"])
 
-        mant = _read_xlsx(PATH_MANT, MANT_COLS)
-        mm = mant[mant["Num_Propiedad"].astype(str).str.upper()==num.upper()]
-        num_m = int((mm["Tipo"].astype(str)=="Mantenimiento").sum())
-        num_r = int((mm["Tipo"].astype(str)=="Reparación").sum())
-        prest = _read_xlsx(PATH_PREST, PREST_COLS)
-        pp = prest[prest["Num_Propiedad"].astype(str).str.upper()==num.upper()]
-        num_p = len(pp)
+        est = ALMACEN.estadisticas(num)
+        num_m, num_r, num_p = est["mantenimientos"], est["reparaciones"], est["prestamos"]
 
-        dec = _read_xlsx(PATH_DEC, DEC_COLS)
-        nueva = pd.DataFrame([{
+        fila = {
             "Num_Propiedad": num, "ID_Laptop": id_lap, "Service_Tag": st, "Modelo": modelo,
             "Num_Mantenimiento": num_m, "Num_Reparaciones": num_r, "Num_Prestamos": num_p,
             "Fecha_Dec": _now_full()
-        }])
-        dec = pd.concat([dec, nueva], ignore_index=True)
-        _write_xlsx_exact(dec, PATH_DEC, DEC_COLS)
+        }
 
-        if messagebox.askyesno("Inventario", "Decomiso guardado.\n\n¿Quitar del inventario ahora?"):
-            inv = inv[inv["Num_Propiedad"].astype(str).str.upper()!=num.upper()].copy()
-            _write_xlsx_exact(inv, PATH_INV, INV_COLS)
+        def retirado(ok):
             self._load_inventory()
+            if not ok:
+                messagebox.showerror("Error", "No se pudo quitar la máquina del inventario (el decomiso sí quedó guardado).")
+                return
             messagebox.showinfo("Hecho","Máquina retirada del inventario.")
-        else:
-            messagebox.showinfo("Hecho","Decomiso registrado (inventario se mantiene).")
+
+        def guardado(ok):
+            if not ok:
+                messagebox.showerror("Error", "No se guardó el decomiso: ya está en decomisados o no se pudo guardar.")
+                return
+            if messagebox.askyesno("Inventario", "Decomiso guardado.\n\n¿Quitar del inventario ahora?"):
+                self.io.ejecutar(lambda: ALMACEN.quitar("inv", num), retirado)
+            else:
+                messagebox.showinfo("Hecho","Decomiso registrado (inventario se mantiene).")
+
+        self.io.ejecutar(lambda: ALMACEN.agregar("dec", fila), guardado)
+
+    def _exportar_excel(self):
+        carpeta = filedialog.askdirectory(title="Carpeta destino de los archivos Excel")
+        if not carpeta:
+            return
+        self.io.ejecutar(
+            lambda: ALMACEN.exportar_excel(carpeta),
+            lambda escritos: messagebox.showinfo("Exportar a Excel", "Archivos generados:\n\n" + "\n".join(escritos)),
+            widgets=(self.btn_exportar,)
+        )
+
+    # ---------- Reportes de cumplimiento ----------
+    def _reportes(self):
+        win = ttk.Toplevel(self); win.title("Reportes de mantenimiento"); win.resizable(False, False); win.grab_set()
+        pad = {"padx": 10, "pady": 6}
+        tipo = tk.StringVar(value="maquinas")
+        ttk.Label(win, text="Reporte:").grid(row=0, column=0, sticky=NW, **pad)
+        opciones = ttk.Frame(win); opciones.grid(row=0, column=1, sticky=W, **pad)
+        for valor, texto in [*osi_reportes.TIPOS.items(), ("todos", "Todos (una hoja por reporte, solo .xlsx)")]:
+            ttk.Radiobutton(opciones, text=texto, value=valor, variable=tipo).pack(anchor=W, pady=1)
+
+        ttk.Label(win, text="Solo máquinas a las\nque les falta:").grid(row=1, column=0, sticky=NW, **pad)
+        lista = tk.Listbox(win, selectmode=tk.MULTIPLE, height=len(osi_reportes.CHECKLIST), exportselection=False)
+        for c in osi_reportes.CHECKLIST:
+            lista.insert(END, c)
+        lista.grid(row=1, column=1, sticky=EW, **pad)
+
+        archivo = tk.BooleanVar(value=True)
+        ttk.Checkbutton(win, text="Incluir archivo histórico", variable=archivo).grid(row=2, column=1, sticky=W, **pad)
+
+        def exportar():
+            path = filedialog.asksaveasfilename(parent=win, title="Guardar reporte", defaultextension=".xlsx",
+                                                filetypes=[("Excel", "*.xlsx"), ("CSV", "*.csv")])
+            if not path:
+                return
+            tipos = list(osi_reportes.TIPOS) if tipo.get() == "todos" else [tipo.get()]
+            falta = [lista.get(i) for i in lista.curselection()] if tipo.get() == "maquinas" else []
+            incluir = archivo.get()
+            self.io.ejecutar(lambda: osi_reportes.generar(tipos, path, falta=falta, incluir_archivo=incluir),
+                             _cerrar_con_aviso(win, f"Reporte generado:\n{path}"), widgets=(btn, self.btn_reportes))
+
+        btn = ttk.Button(win, text="Exportar…", bootstyle="success", command=exportar)
+        btn.grid(row=3, column=0, columnspan=2, pady=(6, 12))
+
+    # ---------- Búsqueda en reparaciones y préstamos (Ctrl+F) ----------
+    def _buscar_texto(self):
+        """Busca palabras en descripciones de reparación, técnicos y datos de quien tomó prestado."""
+        win = ttk.Toplevel(self); win.title("Buscar en el historial")
+        arriba = ttk.Frame(win); arriba.grid(row=0, column=0, sticky=EW, padx=10, pady=(10, 6))
+        ttk.Label(arriba, text="Palabras:").pack(side=LEFT)
+        consulta = tk.StringVar()
+        entrada = ttk.Entry(arriba, width=40, textvariable=consulta)
+        entrada.pack(side=LEFT, fill=X, expand=True, padx=6)
+        cols = ("Registro", "Num_Propiedad", "Fecha", "Texto")
+        tree = ttk.Treeview(win, columns=cols, show="headings", height=16)
+        for c, ancho in zip(cols, (110, 120, 150, 420)):
+            tree.heading(c, text=c)
+            tree.column(c, width=ancho, anchor=W)
+        tree.grid(row=1, column=0, sticky=NSEW, padx=10)
+        win.rowconfigure(1, weight=1); win.columnconfigure(0, weight=1)
+        info = ttk.Label(win, font=("Segoe UI", 9), text="Ej.: pantalla, bateria dell, S12345678, 7875550101")
+        info.grid(row=2, column=0, sticky=W, padx=10, pady=(4, 10))
+        registros = {"mant": "Mantenimiento", "prest": "Préstamo"}
+
+        def mostrar(res):
+            if not win.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for r in res:
+                tree.insert("", END, values=(registros[r["tabla"]], r["Num_Propiedad"],
+                                             _fmt_date_only(r["fecha"]), r["texto"]))
+            info.configure(text=f"{len(res)} resultado(s). Doble clic: buscar la máquina.")
+
+        def buscar(_=None):
+            q = consulta.get().strip()
+            if q:
+                self.io.ejecutar(lambda: ALMACEN.buscar_texto(q), mostrar, widgets=(btn,))
+
+        def abrir(_=None):
+            sel = tree.selection()
+            if sel:
+                self.q_var.set(tree.item(sel[0], "values")[1])
+                self._buscar_info()
+
+        btn = ttk.Button(arriba, text="Buscar", bootstyle="primary", command=buscar)
+        btn.pack(side=LEFT)
+        entrada.bind("<Return>", buscar)
+        tree.bind("<Double-1>", abrir)
+        entrada.focus_set()
+
+    # ---------- Diagnóstico de tiempos (F12) ----------
+    def _diagnostico(self):
+        """p50/p95 de cada operación medida en esta sesión (ver osi_perf)."""
+        win = ttk.Toplevel(self); win.title("Diagnóstico — tiempos de la sesión")
+        cols = ("Operación", "n", "p50 ms", "p95 ms", "máx ms", "total s")
+        tree = ttk.Treeview(win, columns=cols, show="headings", height=14)
+        for c in cols:
+            tree.heading(c, text=c)
+            tree.column(c, width=220 if c == "Operación" else 80, anchor=W if c == "Operación" else E)
+        tree.grid(row=0, column=0, columnspan=3, sticky=NSEW, padx=10, pady=(10, 6))
+        win.rowconfigure(0, weight=1); win.columnconfigure(0, weight=1)
+
+        modo = "cProfile ACTIVO (OSI_PERFIL)" if osi_perf.PERFILAR else "cProfile inactivo (OSI_PERFIL=1 para activarlo)"
+        info = ttk.Label(win, font=("Segoe UI", 9), justify=LEFT)
+        info.grid(row=1, column=0, columnspan=3, sticky=W, padx=10)
+
+        def llenar():
+            respuesta = self.vigia.texto().replace("\t", "   ")
+            info.configure(text=f"Ventana: {respuesta}\nLog: {osi_perf.ruta_log() or '(sin log)'}\n{modo}")
+            tree.delete(*tree.get_children())
+            for f in osi_perf.resumen():
+                tree.insert("", END, values=(f["op"], f["n"], f"{f['p50']:.1f}", f"{f['p95']:.1f}",
+                                             f"{f['max']:.1f}", f"{f['total']:.2f}"))
+
+        def copiar():
+            self.clipboard_clear()
+            self.clipboard_append(osi_perf.texto_resumen())
+
+        ttk.Button(win, text="Actualizar", bootstyle="secondary", command=llenar).grid(row=2, column=0, sticky=W, padx=10, pady=10)
+        ttk.Button(win, text="Copiar", bootstyle="info", command=copiar).grid(row=2, column=1, padx=6, pady=10)
+        ttk.Button(win, text="Cerrar", bootstyle="light", command=win.destroy).grid(row=2, column=2, sticky=E, padx=10, pady=10)
+        llenar()
 
     # ---------- Importación por lote (protegida) ----------
     def _importar_lote(self):
@@ -897,79 +1350,35 @@ class App(ttk.Window):
         if not path:
             return
 
-        df = _read_xlsx(path, expected_cols=["Num_Propiedad","ID_Laptop","Service_Tag","Modelo","Garantía","Fecha_Compra"])
-        if df.empty:
-            messagebox.showwarning("Importación cancelada","No se encontraron filas válidas."); return
-
-        errs = []
-        inv = _read_xlsx(PATH_INV, INV_COLS)
-
-        for i, row in df.iterrows():
-            npv = str(row["Num_Propiedad"]).strip().upper()
-            idv = str(row["ID_Laptop"]).strip().upper()
-            stv = str(row["Service_Tag"]).strip().upper()
-            mdv = str(row["Modelo"]).strip()
-
-            # >>> LEE LAS FECHAS CRUDAS DE LA FILA <<<
-            gav_raw = row["Garantía"]
-            fcv_raw = row["Fecha_Compra"]
-
-            # --- Normaliza fechas a ISO ---
-            try:
-                gav_iso = _to_iso_date(gav_raw)  # 'YYYY-MM-DD'
-            except Exception:
-                errs.append(f"Fila {i+2}: Garantía inválida (YYYY-MM-DD).")
-                continue
-
-            try:
-                fcv_iso = _to_iso_date(fcv_raw)  # 'YYYY-MM-DD'
-            except Exception:
-                errs.append(f"Fila {i+2}: Fecha_Compra inválida (YYYY-MM-DD).")
-                continue
-
-            # --- Validaciones ---
-            if not re.fullmatch(r"R\d{8}", npv):
-                errs.append(f"Fila {i+2}: Num_Propiedad inválido."); continue
-            if not re.fullmatch(r"UIPRA-(EST|FAC)-L\d{3}", idv):
-                errs.append(f"Fila {i+2}: ID_Laptop inválido."); continue
-            if not re.fullmatch(r"[A-Z0-9]{7}", stv):
-                errs.append(f"Fila {i+2}: Service_Tag inválido."); continue
-
-            # Garantía debe ser futura
-            try:
-                if pd.to_datetime(gav_iso).date() <= datetime.now().date():
-                    errs.append(f"Fila {i+2}: Garantía no es futura."); continue
-            except Exception:
-                errs.append(f"Fila {i+2}: Garantía inválida."); continue
-
-            # Duplicados y decomisados
-            if (inv["Num_Propiedad"].astype(str).str.upper()==npv).any():
-                errs.append(f"Fila {i+2}: Num_Propiedad duplicado."); continue
-            if (inv["ID_Laptop"].astype(str).str.upper()==idv).any():
-                errs.append(f"Fila {i+2}: ID_Laptop duplicado."); continue
-            if (inv["Service_Tag"].astype(str).str.upper()==stv).any():
-                errs.append(f"Fila {i+2}: Service_Tag duplicado."); continue
-            if _exists_decomisada(npv):
-                errs.append(f"Fila {i+2}: Num_Propiedad aparece en decomisados."); continue
-
-            # --- Inserta usando las fechas normalizadas ---
-            inv = pd.concat([inv, pd.DataFrame([{
-                "Num_Propiedad": npv,
-                "ID_Laptop": idv,
-                "Service_Tag": stv,
-                "Modelo": mdv,
-                "Disponible": "X",
-                "Garantía": gav_iso,
-                "Fecha_Compra": fcv_iso
-            }])], ignore_index=True)
-
-        if errs:
-            messagebox.showwarning("Importación cancelada", "Se encontraron problemas y NO se importó nada:\n\n• " + "\n• ".join(errs))
-            return
+        def leer():
+            with osi_perf.medir("importar_lote", bytes=osi_perf.tamano(path)) as m:
+                df = _read_xlsx(path, expected_cols=IMPORT_COLS)
+                m.filas = len(df)
+                if df.empty:
+                    return None
+                # Validación por columnas contra inventario, decomisados y el propio lote
+                return validar_lote(df)
+
+        def importado(ok):
+            if ok:
+                messagebox.showinfo("Éxito","Importación completada.")
+            else:
+                messagebox.showerror("Error", "No se importó nada: algún Num_Propiedad ya existe o no se pudo guardar.")
+            self._load_inventory()
 
-        _write_xlsx_exact(inv, PATH_INV, INV_COLS)
-        messagebox.showinfo("Éxito","Importación completada.")
-        self._load_inventory()
+        def validado(res):
+            if res is None:
+                messagebox.showwarning("Importación cancelada","No se encontraron filas válidas."); return
+            nuevas, errs = res
+            if errs:
+                messagebox.showwarning("Importación cancelada", "Se encontraron problemas y NO se importó nada:\n\n• " + "\n• ".join(errs))
+                return
+            def guardar():
+                with osi_perf.medir("importar_lote:guardar", filas=len(nuevas)):
+                    return ALMACEN.agregar_lote("inv", nuevas)
+            self.io.ejecutar(guardar, importado, widgets=(self.btn_importar,))
+
+        self.io.ejecutar(leer, validado, widgets=(self.btn_importar,))
 
 # ------------------------------------ Run -----------------------------------
 
@@ -0,0 +1,519 @@
+# =============================================================================
+# OSI Arecibo — Banco de pruebas de rendimiento (sin GUI)
+# Genera registros sintéticos con los encabezados exactos y mide las rutas de datos.
+# Uso:
+#   python osi_bench.py                          -> 1k y 10k filas, JSON por pantalla
+#   python osi_bench.py --filas 1000 100000 1000000 --salida bench.json
+#   python osi_bench.py --sin-memoria            -> solo tiempo (tracemalloc añade costo)
+#   python osi_bench.py --estres 4 --ops 50      -> 4 procesos escribiendo a la vez en la misma carpeta
+#   python osi_bench.py --comprobar              -> comprobaciones de la lectura/escritura de los .xlsx
+# Los datos se generan en una carpeta temporal: los registros reales no se tocan.
+# =============================================================================
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("PROGRAMDATA", tempfile.gettempdir())  # fuera de Windows
+
+import osi_datos
+import osi_reportes
+from osi_datos import (
+    INV_COLS, MANT_COLS, PREST_COLS, IMPORT_COLS, AlmacenDatos, BackendExcel,
+    _read_xlsx, _write_xlsx_exact, validar_lote
+)
+
+# --------------------------- Datos sintéticos ---------------------------
+
+def _fechas_mixtas(rng, n, desde, hasta) -> list:
+    """Fechas en los formatos que aparecen en los registros reales: ISO, m/d/Y, Timestamp y serial de Excel."""
+    dias = rng.integers(pd.Timestamp(desde).toordinal(), pd.Timestamp(hasta).toordinal(), n)
+    fechas = [datetime.fromordinal(int(d)) for d in dias]
+    tipo = rng.integers(0, 4, n)
+    out = []
+    for f, t in zip(fechas, tipo):
+        if t == 0:
+            out.append(f.strftime("%Y-%m-%d"))
+        elif t == 1:
+            out.append(f.strftime("%m/%d/%Y"))
+        elif t == 2:
+            out.append(pd.Timestamp(f))
+        else:
+            out.append((f - datetime(1899, 12, 30)).days)
+    return out
+
+def _nums(n, desde=40000000) -> np.ndarray:
+    return np.array([f"R{desde + i:08d}" for i in range(n)], dtype=object)
+
+# ID_Laptop válidos (UIPRA-(EST|FAC)-L###) solo hay 2000: se reservan para el lote de
+# importación, que los valida. Inventario y decomisados van a continuación, sin repetirse
+# (L1000 en adelante: como los registros viejos, la validación solo se aplica a lo nuevo).
+IDS_VALIDOS = 2000
+
+def _ids(n, desde=0) -> list:
+    """`n` ID_Laptop distintos y consecutivos a partir del número `desde`."""
+    return [f"UIPRA-{'FAC' if k % 2 else 'EST'}-L{k // 2:03d}" for k in range(desde, desde + n)]
+
+def _tags(rng, n) -> list:
+    alfabeto = np.array(list("ABCDEFGHJKLMNPQRSTUVWXYZ0123456789"))
+    return ["".join(f) for f in alfabeto[rng.integers(0, len(alfabeto), (n, 7))]]
+
+def _momentos(rng, n, desde="2019-01-01", hasta="2026-01-01") -> list:
+    seg = rng.integers(pd.Timestamp(desde).value // 10**9, pd.Timestamp(hasta).value // 10**9, n)
+    return pd.to_datetime(seg, unit="s").strftime("%Y-%m-%d %H:%M:%S").tolist()
+
+def generar(n: int, semilla: int = 1) -> dict:
+    """Las cuatro tablas con `n` filas (decomisados: n/20), con valores y formatos realistas."""
+    rng = np.random.default_rng(semilla)
+    nums = _nums(n)
+    inv = pd.DataFrame({
+        "Num_Propiedad": nums, "ID_Laptop": _ids(n, IDS_VALIDOS), "Service_Tag": _tags(rng, n),
+        "Modelo": rng.choice(["5510", "5520", "7420", "3520", "E7470"], n),
+        "Disponible": rng.choice(["X", ""], n, p=[0.7, 0.3]),
+        "Garantía": _fechas_mixtas(rng, n, "2024-01-01", "2031-01-01"),
+        "Fecha_Compra": _fechas_mixtas(rng, n, "2018-01-01", "2024-01-01"),
+    })
+    tipo = rng.choice(["Mantenimiento", "Reparación"], n, p=[0.8, 0.2])
+    dia = np.array(_momentos(rng, n), dtype=object)
+    dia[(tipo == "Reparación") & (rng.random(n) < 0.05)] = ""  # reparaciones esperando pieza
+    mant = pd.DataFrame({c: "" for c in MANT_COLS}, index=range(n))
+    mant["Num_Propiedad"] = nums[rng.integers(0, n, n)]
+    mant["Dia"] = dia
+    mant["tecnico"] = rng.choice(["Ana", "Luis", "Marta", "José"], n)
+    mant["Tipo"] = tipo
+    mant["Desc_Reparacion"] = np.where(tipo == "Reparación", "Cambio de pantalla", "")
+    for c in MANT_COLS[5:]:
+        mant[c] = np.where((tipo == "Mantenimiento") & (rng.random(n) < 0.6), "X", "")
+    prest = pd.DataFrame({
+        "Num_Propiedad": nums[rng.integers(0, n, n)],
+        "Nombre": rng.choice(["Juan del Pueblo", "María López", "Pedro Rivera"], n),
+        "Identificador": [f"S{k:08d}" for k in rng.integers(0, 10**8, n)],
+        "Num_Tele": [f"787-{k:07d}" for k in rng.integers(0, 10**7, n)],
+        "Dia_Pres": _momentos(rng, n),
+        "Dia_Entr": np.where(rng.random(n) < 0.1, "", _momentos(rng, n)),
+    })
+    nd = max(1, n // 20)
+    dec = pd.DataFrame({
+        "Num_Propiedad": _nums(nd, desde=30000000), "ID_Laptop": _ids(nd, IDS_VALIDOS + n), "Service_Tag": _tags(rng, nd),
+        "Modelo": rng.choice(["E6440", "E7450"], nd), "Num_Mantenimiento": rng.integers(0, 10, nd),
+        "Num_Reparaciones": rng.integers(0, 5, nd), "Num_Prestamos": rng.integers(0, 30, nd),
+        "Fecha_Dec": _momentos(rng, nd),
+    })
+    return {"inv": inv, "mant": mant, "prest": prest, "dec": dec}
+
+def lote_importacion(n: int, semilla: int = 2) -> pd.DataFrame:
+    """
+    Archivo de importación con ~5% de filas inválidas (para ejercitar todos los chequeos).
+    A lo sumo IDS_VALIDOS filas: no hay más ID_Laptop válidos distintos.
+    """
+    rng = np.random.default_rng(semilla)
+    n = min(n, IDS_VALIDOS)
+    validos = _ids(IDS_VALIDOS)
+    df = pd.DataFrame({
+        "Num_Propiedad": _nums(n, desde=50000000), "ID_Laptop": [validos[k] for k in rng.permutation(IDS_VALIDOS)[:n]], "Service_Tag": _tags(rng, n),
+        "Modelo": rng.choice(["5510", "7420"], n),
+        "Garantía": _fechas_mixtas(rng, n, "2027-01-01", "2031-01-01"),
+        "Fecha_Compra": _fechas_mixtas(rng, n, "2023-01-01", "2025-01-01"),
+    })
+    malas = rng.random(n) < 0.05
+    df.loc[malas, "Num_Propiedad"] = "R400000"
+    return df[IMPORT_COLS]
+
+# ------------------------------- Medición -------------------------------
+
+class Banco:
+    def __init__(self, memoria: bool = True):
+        self.memoria = memoria
+        self.resultados = []
+        self.fallidas = []  # operaciones que no se guardaron: su tiempo no mide trabajo real
+
+    def medir(self, op: str, filas: int, func):
+        if self.memoria:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        res = func()
+        seg = time.perf_counter() - t0
+        pico = None
+        if self.memoria:
+            pico = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+        fila = {"op": op, "filas": filas, "segundos": round(seg, 4)}
+        if pico is not None:
+            fila["pico_mb"] = round(pico, 2)
+        self.resultados.append(fila)
+        print(f"  {op:<24} {filas:>9} filas  {seg:9.3f} s" + (f"  {pico:9.1f} MB" if pico is not None else ""),
+              file=sys.stderr)
+        return res
+
+    def exito(self, ok) -> bool:
+        """Anota si la última operación medida se aplicó de verdad (el tiempo de un fallo no vale)."""
+        fila = self.resultados[-1]
+        fila["ok"] = bool(ok)
+        if not ok:
+            self.fallidas.append(fila["op"])
+            print(f"  {fila['op']:<24} FALLÓ: no se aplicó", file=sys.stderr)
+        return bool(ok)
+
+def _borrar_carpeta(carpeta: str):
+    """La carpeta de datos generada y sus instantáneas/índices en la caché local."""
+    shutil.rmtree(carpeta, ignore_errors=True)
+    shutil.rmtree(os.path.dirname(osi_datos._ruta_cache(os.path.join(carpeta, "x"), "")), ignore_errors=True)
+
+def _almacen(carpeta: str) -> AlmacenDatos:
+    tablas = {k: (os.path.join(carpeta, os.path.basename(path)), cols) for k, (path, cols) in osi_datos.TABLAS.items()}
+    return AlmacenDatos(tablas=tablas, backend=BackendExcel(diario=os.path.join(carpeta, "osi_diario.jsonl")))
+
+def correr(n: int, banco: Banco, semilla: int = 1, carpeta: str | None = None):
+    """Todas las operaciones sobre registros de `n` filas."""
+    propia = carpeta is None
+    carpeta = carpeta or tempfile.mkdtemp(prefix=f"osi_bench_{n}_")
+    os.makedirs(carpeta, exist_ok=True)
+    try:
+        datos = generar(n, semilla)
+        alm = _almacen(carpeta)
+        for k, df in datos.items():
+            banco.medir(f"_write_xlsx_exact:{k}", len(df), lambda: _write_xlsx_exact(df, alm.path(k), alm.cols(k), alm.backend.diario))
+        for k in ("inv", "mant", "prest"):
+            banco.medir(f"_read_xlsx:{k}", n, lambda: _read_xlsx(alm.path(k), alm.cols(k)))
+
+        # Arranque de la app: tablas en memoria + contadores + resumen por máquina
+        banco.medir("cargar_almacen", n, lambda: [alm.tabla(k) for k in alm.nombres()])
+        banco.medir("contadores", n, alm.contadores)
+        banco.medir("estadisticas:build", n, lambda: alm.estadisticas(""))
+
+        nums = datos["inv"]["Num_Propiedad"].tolist()
+        muestra = nums[:: max(1, n // 1000)]
+        banco.medir("resumen_maquina", len(muestra), lambda: [alm.estadisticas(x) for x in muestra])
+        banco.resultados[-1]["por_consulta_us"] = round(banco.resultados[-1]["segundos"] / len(muestra) * 1e6, 2)
+        banco.medir("reporte:todos", n, lambda: osi_reportes.generar(
+            list(osi_reportes.TIPOS), os.path.join(carpeta, "reporte.xlsx"), almacen=alm))
+
+        imp = lote_importacion(max(10, n // 10))
+        nuevas, errs = banco.medir("validar_lote", len(imp), lambda: validar_lote(imp, alm))
+        banco.resultados[-1]["errores"] = len(errs)
+
+        # disponible y sin préstamo abierto: si no, el préstamo (con razón) no se registra
+        disp = [k for k in sorted(alm.disponibles()) if alm.prestamo_abierto(k) is None]
+        libre = disp[0] if disp else nums[0]
+
+        def en_lote(*pasos):
+            """Como la app: si un paso no procede, el lote no escribe nada. True si se guardó."""
+            try:
+                with alm.lote():
+                    for paso in pasos:
+                        if not paso():
+                            raise _Rechazado
+            except _Rechazado:
+                return False
+            return alm.ok_lote
+
+        banco.exito(banco.medir("prestar", n, lambda: en_lote(
+            lambda: alm.agregar("prest", {"Num_Propiedad": libre, "Nombre": "Bench", "Identificador": "S0",
+                                          "Num_Tele": "787", "Dia_Pres": "2026-01-01 08:00:00", "Dia_Entr": ""}),
+            lambda: alm.marcar_disponible(libre, False))))
+
+        banco.exito(banco.medir("devolver", n, lambda: en_lote(
+            lambda: alm.cerrar_prestamo(libre, "2026-01-02 08:00:00"),
+            lambda: alm.marcar_disponible(libre, True))))
+
+        banco.exito(banco.medir("registrar_reparacion", n, lambda: alm.agregar("mant", {
+            "Num_Propiedad": libre, "Tipo": "Reparación", "tecnico": "Bench", "Dia": ""})))
+        banco.exito(banco.medir("finalizar_reparacion", n,
+                                lambda: alm.finalizar_reparacion(libre, "Bench", "Pieza cambiada", "2026-01-03 08:00:00")))
+
+        def decomisar():
+            est = alm.estadisticas(libre)
+            fila = alm.filas("inv", libre).iloc[0]
+            return en_lote(
+                lambda: alm.agregar("dec", {
+                    "Num_Propiedad": libre, "ID_Laptop": fila["ID_Laptop"], "Service_Tag": fila["Service_Tag"],
+                    "Modelo": fila["Modelo"], "Num_Mantenimiento": est["mantenimientos"],
+                    "Num_Reparaciones": est["reparaciones"], "Num_Prestamos": est["prestamos"],
+                    "Fecha_Dec": "2026-01-04 08:00:00"}),
+                lambda: alm.quitar("inv", libre))
+        banco.exito(banco.medir("decomisar", n, decomisar))
+
+        banco.exito(banco.medir("importar_lote", len(nuevas), lambda: alm.agregar_lote("inv", nuevas)))
+    finally:
+        if propia:
+            _borrar_carpeta(carpeta)
+
+# ------------------------ Estrés: varias estaciones ------------------------
+# Cada proceso es una "estación" con su propio almacén sobre la MISMA carpeta: registra
+# mantenimientos y presta/devuelve máquinas al azar. Al final se cuentan en los archivos
+# las filas de cada estación: si alguna escritura pisó a otra, faltan filas.
+
+class _Rechazado(Exception):
+    """Sale del lote de un préstamo sin escribir nada."""
+
+def _estacion(carpeta: str, k: int, ops: int) -> dict:
+    alm = _almacen(carpeta)
+    rng = random.Random(k)
+    nums = sorted(alm.claves("inv"))
+    hechas = {"mant": 0, "prest": 0}
+    for i in range(ops):
+        num = rng.choice(nums)
+        momento = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if rng.random() < 0.5:
+            if alm.agregar("mant", {"Num_Propiedad": num, "Tipo": "Mantenimiento", "tecnico": f"E{k}", "Dia": momento}):
+                hechas["mant"] += 1
+        elif alm.disponible(num):
+            try:
+                with alm.lote():
+                    if not (alm.agregar("prest", {"Num_Propiedad": num, "Nombre": f"E{k}", "Identificador": str(i),
+                                                  "Num_Tele": "", "Dia_Pres": momento, "Dia_Entr": ""})
+                            and alm.marcar_disponible(num, False)):
+                        raise _Rechazado  # p. ej. ya tenía un préstamo abierto: el lote no escribe nada
+            except _Rechazado:
+                continue
+            if alm.ok_lote:
+                hechas["prest"] += 1
+        else:
+            with alm.lote():
+                alm.cerrar_prestamo(num, momento)
+                alm.marcar_disponible(num, True)
+    return hechas
+
+def estres(n: int, procesos: int, ops: int, banco: Banco, semilla: int = 1, carpeta: str | None = None) -> dict:
+    """`procesos` estaciones x `ops` operaciones sobre registros de `n` filas; cuenta las filas perdidas."""
+    propia = carpeta is None
+    carpeta = carpeta or tempfile.mkdtemp(prefix=f"osi_estres_{n}_")
+    os.makedirs(carpeta, exist_ok=True)
+    try:
+        alm = _almacen(carpeta)
+        for k, df in generar(n, semilla).items():
+            _write_xlsx_exact(df, alm.path(k), alm.cols(k), alm.backend.diario)
+        ctx = multiprocessing.get_context("spawn")  # como en Windows
+        with ctx.Pool(procesos) as pool:
+            hechas = banco.medir(f"estres:{procesos}x{ops}", procesos * ops,
+                                 lambda: pool.starmap(_estacion, [(carpeta, k, ops) for k in range(procesos)]))
+        mant, prest = _read_xlsx(alm.path("mant"), alm.cols("mant")), _read_xlsx(alm.path("prest"), alm.cols("prest"))
+        perdidas = 0
+        for k, h in enumerate(hechas):
+            perdidas += h["mant"] - int((mant["tecnico"] == f"E{k}").sum())
+            perdidas += h["prest"] - int((prest["Nombre"] == f"E{k}").sum())
+        resumen = {"procesos": procesos, "ops": ops, "escrituras": sum(h["mant"] + h["prest"] for h in hechas),
+                   "perdidas": perdidas}
+        print(f"  estrés: {resumen}", file=sys.stderr)
+        return resumen
+    finally:
+        if propia:
+            _borrar_carpeta(carpeta)
+
+# ------------------------------ Comprobaciones ------------------------------
+# Casos de libros reales que rompieron la lectura o la escritura. Cada comprobación
+# devuelve None si todo va bien o el texto del fallo.
+
+def _libro_con_hueco(path: str, vacias: int = 2500, final: bool = True):
+    """Préstamos: 1 fila, `vacias` filas vacías CON formato (como deja Excel) y otra fila al final (si `final`)."""
+    import openpyxl
+    from openpyxl.styles import Font
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(PREST_COLS)
+    ws.append(["R00000001", "Ana", "S1", "787", "2025-01-01 08:00:00", "2025-01-02 08:00:00"])
+    for r in range(3, 3 + vacias):
+        for c in range(1, len(PREST_COLS) + 1):
+            ws.cell(r, c).font = Font(bold=True)
+    if final:
+        for c, v in enumerate(["R00000002", "Luis", "S2", "787", "2025-02-01 08:00:00", ""], start=1):
+            ws.cell(3 + vacias, c, v)
+    wb.save(path)
+
+def _comprobar_hueco(carpeta: str):
+    path = os.path.join(carpeta, "hueco.xlsx")
+    _libro_con_hueco(path)
+    filas = len(_read_xlsx(path, PREST_COLS))
+    if filas != 2:
+        return f"fila tras 2500 vacías con formato: se leyeron {filas} filas de 2"
+
+def _comprobar_anexar(carpeta: str):
+    """Un préstamo anexado a un libro que termina en filas vacías con formato se vuelve a leer."""
+    alm = _almacen(carpeta)
+    path = alm.path("prest")
+    _libro_con_hueco(path, final=False)
+    if not alm.agregar("prest", {"Num_Propiedad": "R00000003", "Nombre": "Eva", "Identificador": "S3",
+                                 "Num_Tele": "787", "Dia_Pres": "2025-03-01 08:00:00", "Dia_Entr": ""}):
+        return "agregar() no guardó el préstamo"
+    osi_datos._borrar(osi_datos._ruta_instantanea(path))  # releer el .xlsx, no la instantánea
+    prest = _almacen(carpeta).tabla("prest")
+    if len(prest) != 2 or prest["Num_Propiedad"].iloc[-1] != "R00000003":
+        return f"tras agregar() la relectura trae {len(prest)} filas de 2"
+    leido = pd.read_excel(path, dtype=object)
+    if len(leido) < 2 or leido["Num_Propiedad"].iloc[1] != "R00000003":
+        return "la fila anexada no quedó justo después de los datos (fila 3 de la hoja)"
+
+def _comprobar_reescritura(carpeta: str):
+    """Prestar reescribe el inventario: solo debe cambiar el Disponible de esa máquina."""
+    import openpyxl
+    alm = _almacen(carpeta)
+    path = alm.path("inv")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(INV_COLS)
+    ws.append(["R00000001", "UIPRA-EST-L001", "ABC1234", "5510", "X", "05/03/2030", "2024-01-01"])
+    ws.append([" r00000002 ", "UIPRA-EST-L002", "ABC1235", 5520, "x", datetime(2030, 1, 2), datetime(2023, 1, 2)])
+    ws.append(["R00000003", "UIPRA-EST-L003", "ABC1236", "5510", None, "12/31/2030", 45000])
+    wb.save(path)
+
+    def celdas():
+        libro = openpyxl.load_workbook(path)
+        return [[c.value if c.value != "" else None for c in fila] for fila in libro.active.iter_rows(min_row=2)]
+    esperado = celdas()
+    esperado[0][INV_COLS.index("Disponible")] = None
+    if not alm.marcar_disponible("R00000001", False):
+        return "marcar_disponible() no guardó"
+    cambiadas = [(f + 2, INV_COLS[c], a, b) for f, (fa, fb) in enumerate(zip(esperado, celdas()))
+                 for c, (a, b) in enumerate(zip(fa, fb)) if a != b or type(a) is not type(b)]
+    if cambiadas:
+        return f"celdas que nadie editó cambiaron: {cambiadas}"
+
+def _comprobar_candado(carpeta: str):
+    """El candado: no se rompe mientras se refresca, se rompe vencido y no se borra si es ajeno."""
+    path = os.path.join(carpeta, "prueba.lock")
+    refresco, vencido = osi_datos.REFRESCO_BLOQUEO, osi_datos.BLOQUEO_VENCIDO
+    osi_datos.REFRESCO_BLOQUEO, osi_datos.BLOQUEO_VENCIDO = 0.2, 1.0
+    try:
+        with osi_datos._candado(path):
+            time.sleep(1.6)  # escritura larga: el refresco lo mantiene vivo
+            try:
+                with osi_datos._candado(path, espera=0.3):
+                    return "se rompió un candado que su dueño seguía refrescando"
+            except TimeoutError:
+                pass
+        if os.path.exists(path):
+            return "el candado no se soltó"
+
+        with open(path, "wb") as f:
+            f.write(b"otra-pc pid=1 abandonado")
+        viejo = time.time() - 3600  # la PC caída lo dejó hace una hora
+        os.utime(path, (viejo, viejo))
+        with osi_datos._candado(path, espera=2.0):
+            with open(path, "wb") as f:  # otra estación lo rompió y lo tomó mientras tanto
+                f.write(b"otra-pc pid=2 vivo")
+        try:
+            with open(path, "rb") as f:
+                if f.read() != b"otra-pc pid=2 vivo":
+                    return "se pisó el candado de otra estación"
+        except FileNotFoundError:
+            return "al soltar se borró el candado de otra estación"
+    finally:
+        osi_datos.REFRESCO_BLOQUEO, osi_datos.BLOQUEO_VENCIDO = refresco, vencido
+        osi_datos._borrar(path)
+
+def _comprobar_guardar_conflicto(carpeta: str):
+    """guardar() con una tabla que otra estación cambió después de leerla: falla, no la pisa."""
+    import openpyxl
+    a = _almacen(carpeta)
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(INV_COLS)
+    ws.append(["R00000001", "UIPRA-EST-L001", "ABC1234", "5510", "X", "05/03/2030", "2024-01-01"])
+    ws.append(["R00000002", "UIPRA-EST-L002", "ABC1235", "5520", "X", "05/03/2030", "2024-01-01"])
+    wb.save(a.path("inv"))
+    df = a.tabla("inv").copy()  # la copia de esta estación todavía tiene R00000002 disponible
+    if not _almacen(carpeta).marcar_disponible("R00000002", False):  # otra estación presta
+        return "marcar_disponible() no guardó"
+    errores, mostrar = [], osi_datos.mostrar_error
+    osi_datos.mostrar_error = lambda titulo, texto: errores.append(texto)
+    try:
+        if a.guardar("inv", df):
+            return "guardar() pisó una tabla que otra estación había cambiado"
+    finally:
+        osi_datos.mostrar_error = mostrar
+    if not errores or "guardar(<DataFrame de 2 filas>" not in errores[0].replace("'inv', ", ""):
+        return f"el conflicto no se informó bien: {errores}"
+    inv = _almacen(carpeta).tabla("inv")
+    if inv["Disponible"].iloc[1]:
+        return "tras el conflicto el inventario en disco no es el de la otra estación"
+
+COMPROBACIONES = {
+    "lectura_tras_filas_vacias": _comprobar_hueco,
+    "anexar_tras_filas_vacias": _comprobar_anexar,
+    "reescritura_sin_cambios": _comprobar_reescritura,
+    "candado_entre_estaciones": _comprobar_candado,
+    "guardar_con_conflicto": _comprobar_guardar_conflicto,
+}
+
+def comprobar(carpeta: str | None = None) -> list:
+    """Corre COMPROBACIONES; devuelve los fallos como "nombre: detalle"."""
+    propia = carpeta is None
+    carpeta = carpeta or tempfile.mkdtemp(prefix="osi_comprobar_")
+    os.makedirs(carpeta, exist_ok=True)
+    fallos = []
+    try:
+        for nombre, func in COMPROBACIONES.items():
+            sub = os.path.join(carpeta, nombre)
+            os.makedirs(sub, exist_ok=True)
+            fallo = func(sub)
+            print(f"  {nombre:<32} {'FALLA: ' + fallo if fallo else 'ok'}", file=sys.stderr)
+            if fallo:
+                fallos.append(f"{nombre}: {fallo}")
+    finally:
+        if propia:
+            for nombre in COMPROBACIONES:
+                _borrar_carpeta(os.path.join(carpeta, nombre))
+            _borrar_carpeta(carpeta)
+    return fallos
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="osi_bench", description="OSI Arecibo — banco de pruebas de rendimiento")
+    ap.add_argument("--filas", type=int, nargs="+", default=[1000, 10000],
+                    help="Tamaños a medir (p. ej. 1000 10000 100000 1000000)")
+    ap.add_argument("--semilla", type=int, default=1)
+    ap.add_argument("--salida", help="Archivo JSON de resultados (por defecto, la salida estándar)")
+    ap.add_argument("--carpeta", help="Carpeta donde generar los registros (se conservan)")
+    ap.add_argument("--sin-memoria", action="store_true", help="No medir memoria pico (tracemalloc)")
+    ap.add_argument("--estres", type=int, metavar="PROCESOS",
+                    help="Modo estrés: PROCESOS estaciones escribiendo a la vez en la misma carpeta")
+    ap.add_argument("--ops", type=int, default=50, help="Operaciones por estación en el modo estrés")
+    ap.add_argument("--comprobar", action="store_true",
+                    help="Solo las comprobaciones de lectura/escritura (código 1 si alguna falla)")
+    args = ap.parse_args(argv)
+
+    if args.comprobar:
+        return 1 if comprobar(args.carpeta) else 0
+
+    banco = Banco(memoria=not args.sin_memoria and not args.estres)
+    estreses = []
+    for n in args.filas:
+        print(f"== {n} filas", file=sys.stderr)
+        carpeta = os.path.join(args.carpeta, str(n)) if args.carpeta else None
+        if args.estres:
+            estreses.append(estres(n, args.estres, args.ops, banco, args.semilla, carpeta))
+        else:
+            correr(n, banco, args.semilla, carpeta)
+
+    informe = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(), "pandas": pd.__version__, "plataforma": platform.platform(),
+        "tracemalloc": banco.memoria, "semilla": args.semilla, "resultados": banco.resultados,
+    }
+    if estreses:
+        informe["estres"] = estreses
+    if banco.fallidas:
+        informe["fallidas"] = banco.fallidas
+        print(f"ERROR: no se aplicaron {', '.join(banco.fallidas)}: esos tiempos no miden trabajo real.",
+              file=sys.stderr)
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+    return 1 if banco.fallidas or any(e["perdidas"] for e in estreses) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
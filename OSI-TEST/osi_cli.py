@@ -0,0 +1,288 @@
+# =============================================================================
+# OSI Arecibo — Línea de comandos (sin GUI)
+# Uso:
+#   python osi_cli.py migrar              -> copia los .xlsx a la base SQLite (una vez)
+#   python osi_cli.py exportar CARPETA    -> genera los .xlsx (encabezados exactos)
+#   python osi_cli.py archivar [--meses N | --antes-de FECHA]  -> historial viejo al archivo por año
+#   python osi_cli.py reporte maquinas|modelos|tecnicos|todos DESTINO.xlsx|.csv [--falta CASILLA ...]
+#   python osi_cli.py buscar PALABRAS... [-n N]  -> reparaciones/préstamos que las contienen
+#   python osi_cli.py prestar ARCHIVO.csv        -> préstamos por lote
+#   python osi_cli.py devolver ARCHIVO.csv       -> devoluciones por lote
+#   python osi_cli.py mantenimiento ARCHIVO.csv  -> mantenimientos/reparaciones por lote
+# Los lotes validan fila por fila con las mismas reglas de la app y se guardan con
+# UNA escritura por registro al final (--simular: solo valida).
+# =============================================================================
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import osi_datos
+import osi_reportes
+from osi_datos import ALMACEN, MANT_COLS, _find_pending_flag_col, fechas_columna
+
+def cmd_migrar(args) -> int:
+    copiadas = osi_datos.migrar_a_sqlite(args.db or osi_datos.PATH_DB)
+    if not copiadas:
+        print("Nada que migrar: la base ya tiene datos.")
+    for nombre, n in copiadas.items():
+        print(f"{nombre}: {n} filas copiadas")
+    return 0
+
+def cmd_exportar(args) -> int:
+    for destino in ALMACEN.exportar_excel(args.carpeta):
+        print(destino)
+    return 0
+
+def cmd_archivar(args) -> int:
+    if args.antes_de:
+        try:
+            corte = datetime.strptime(args.antes_de, "%Y-%m-%d")
+        except ValueError:
+            print("--antes-de debe ser YYYY-MM-DD.", file=sys.stderr)
+            return 2
+    else:
+        corte = datetime.now() - timedelta(days=round(args.meses * 365.25 / 12))
+    informe = ALMACEN.archivar(corte, simular=args.simular)
+    if informe is None:
+        return 1
+    if not informe:
+        print(f"Nada que archivar antes de {corte:%Y-%m-%d}.")
+    for nombre, anios in informe.items():
+        for anio, n in anios.items():
+            print(f"{nombre} {anio}: {n} filas")
+    if args.simular:
+        print("(simulación: no se movió nada)")
+    return 0
+
+def cmd_reporte(args) -> int:
+    tipos = list(osi_reportes.TIPOS) if args.tipo == "todos" else [args.tipo]
+    try:
+        n = osi_reportes.generar(tipos, args.destino, falta=args.falta or (),
+                                 incluir_archivo=not args.sin_archivo)
+    except (ValueError, OSError) as e:
+        print(f"No se pudo generar el reporte: {e}", file=sys.stderr)
+        return 1
+    print(f"{args.destino}: {n} filas")
+    return 0
+
+def cmd_buscar(args) -> int:
+    res = ALMACEN.buscar_texto(" ".join(args.palabras), n=args.n)
+    for r in res:
+        print(f"{r['tabla']:<6} {r['Num_Propiedad']:<12} {r['fecha'][:10]:<10}  {r['texto']}")
+    print(f"{len(res)} resultado(s)", file=sys.stderr)
+    return 0 if res else 1
+
+# ------------------------------ Lotes CSV ------------------------------
+
+TIPOS_MANT = ("Mantenimiento", "Reparación")
+TAREAS_MANT = MANT_COLS[5:]  # casillas del checklist: "X" o vacío, como las marca la app
+
+class _Simulacion(Exception):
+    """Aborta el lote al final de --simular: nada se escribe."""
+
+class _Rechazado(Exception):
+    """Una fila quedó a medias (préstamo sin su marca de Disponible): aborta el lote entero."""
+
+def _now_full():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def _leer_csv(path: str, requeridas: list) -> pd.DataFrame | None:
+    try:
+        # utf-8-sig: los CSV guardados desde Excel traen BOM
+        df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    except Exception as e:
+        print(f"No se pudo leer {path}: {e}", file=sys.stderr)
+        return None
+    df.columns = [str(c).strip() for c in df.columns]
+    faltan = [c for c in requeridas if c not in df.columns]
+    if faltan:
+        print(f"Faltan columnas en {path}: {', '.join(faltan)}", file=sys.stderr)
+        return None
+    return df.apply(lambda col: col.str.strip())
+
+def _error_maquina(num: str, accion: str) -> str | None:
+    """Mismas reglas que la app al abrir Préstamos/Mantenimientos."""
+    if not num:
+        return "Num_Propiedad vacío."
+    if ALMACEN.existe_decomisada(num):
+        return f"La máquina {num} está DECOMISADA (no se pueden registrar {accion})."
+    if not ALMACEN.inv_tiene(num):
+        return "Esta máquina NO existe en el inventario."
+    return None
+
+def _prestar(f) -> tuple:
+    num = f["Num_Propiedad"]
+    err = _error_maquina(num, "préstamos")
+    if err:
+        return False, err
+    if not all([f["Identificador"], f["Nombre"], f["Num_Tele"]]):
+        return False, "Debes completar Identificador, Nombre y Teléfono."
+    if not ALMACEN.disponible(num):
+        return False, "La máquina ya está PRESTADA."
+    if ALMACEN.prestamo_abierto(num) is not None:
+        return False, "La máquina tiene un préstamo sin devolver."
+    if not ALMACEN.agregar("prest", {
+        "Num_Propiedad": num, "Nombre": f["Nombre"], "Identificador": f["Identificador"],
+        "Num_Tele": f["Num_Tele"], "Dia_Pres": f.get("Dia_Pres") or _now_full(), "Dia_Entr": ""
+    }):
+        return False, "No se pudo registrar el préstamo."
+    if not ALMACEN.marcar_disponible(num, False):
+        raise _Rechazado("Se anotó el préstamo pero no se pudo marcar la máquina como PRESTADA.")
+    return True, "Préstamo registrado."
+
+def _devolver(f) -> tuple:
+    num = f["Num_Propiedad"]
+    err = _error_maquina(num, "devoluciones")
+    if err:
+        return False, err
+    if not ALMACEN.cerrar_prestamo(num, f.get("Dia_Entr") or _now_full()):
+        return False, "No se encontró préstamo pendiente para esta máquina."
+    if not ALMACEN.marcar_disponible(num, True):
+        raise _Rechazado("Se cerró el préstamo pero no se pudo marcar la máquina como DISPONIBLE.")
+    return True, "Devolución registrada y máquina marcada DISPONIBLE."
+
+def _mantenimiento(f) -> tuple:
+    num = f["Num_Propiedad"]
+    err = _error_maquina(num, "mantenimientos/reparaciones")
+    if err:
+        return False, err
+    if not f["tecnico"]:
+        return False, "Debes indicar el técnico."
+    tipo = f["Tipo"]
+    if tipo not in TIPOS_MANT:
+        return False, f"Tipo inválido ({' o '.join(TIPOS_MANT)})."
+    # en la app, con una reparación pendiente solo se puede finalizarla
+    if ALMACEN.reparacion_abierta(num) is not None:
+        return False, "Tiene una reparación PENDIENTE (esperando pieza): finalízala primero."
+    fila = {c: f.get(c, "") for c in MANT_COLS}
+    for c in TAREAS_MANT:
+        marca = fila[c].upper()
+        if marca not in ("X", ""):
+            return False, f"Valor inválido en «{c}»: {fila[c]!r} (X o vacío)."
+        if marca and tipo != "Mantenimiento":
+            return False, f"«{c}» es una tarea de mantenimiento: no va en una reparación."
+        fila[c] = marca
+    if tipo == "Mantenimiento":
+        fila["Desc_Reparacion"] = ""
+    # Dia vacío en una reparación = PENDIENTE (esperando pieza), igual que en la app
+    if "Dia" not in f or (not f["Dia"] and tipo == "Mantenimiento"):
+        fila["Dia"] = _now_full()
+    elif fila["Dia"]:
+        fechas, invalidas = fechas_columna([fila["Dia"]], solo_dia=False)
+        if invalidas[0]:
+            return False, f"Dia inválido: {fila['Dia']!r} (YYYY-MM-DD [HH:MM:SS])."
+        fila["Dia"] = fechas[0].strftime("%Y-%m-%d %H:%M:%S")
+    else:
+        flag = _find_pending_flag_col(ALMACEN.tabla("mant"))
+        if flag:
+            fila[flag] = "X"
+    if not ALMACEN.agregar("mant", fila):
+        return False, "No se pudo registrar."
+    return True, f"{tipo} registrada" + (" (pendiente)." if not fila["Dia"] else ".")
+
+def _aplicar_lote(args, requeridas: list, por_fila) -> int:
+    df = _leer_csv(args.archivo, requeridas)
+    if df is None:
+        return 2
+    resultados, rechazada = [], None
+    try:
+        with ALMACEN.lote():
+            for i, f in enumerate(df.to_dict("records")):
+                try:
+                    ok, msg = por_fila(f)
+                except _Rechazado as e:
+                    rechazada = i + 2  # lo ya anotado de esa fila no se puede deshacer solo
+                    resultados.append((i + 2, f.get("Num_Propiedad", ""), False, str(e)))
+                    raise
+                resultados.append((i + 2, f.get("Num_Propiedad", ""), ok, msg))
+            if args.simular:
+                raise _Simulacion()
+    except (_Simulacion, _Rechazado):
+        pass
+    for linea, num, ok, msg in resultados:
+        print(f"Fila {linea:>5}  {num:<12} {'OK   ' if ok else 'ERROR'}  {msg}")
+    n_ok = sum(ok for _, _, ok, _ in resultados)
+    if rechazada is not None:
+        print(f"\nERROR: la fila {rechazada} quedó a medias; para no dejarla así no se guardó ninguna fila "
+              f"(se procesaron {len(resultados)} de {len(df)}).", file=sys.stderr)
+        return 2
+    if not args.simular and not ALMACEN.ok_lote:
+        # escritura fallida, candado ocupado u otra estación cambió lo mismo: nada quedó guardado
+        print(f"\nERROR: no se pudo guardar el lote; ninguna de las {n_ok} filas válidas se aplicó.",
+              file=sys.stderr)
+        return 2
+    estado = "validadas (simulación: nada se guardó)" if args.simular else "aplicadas"
+    print(f"\n{n_ok} de {len(resultados)} filas {estado}; {len(resultados) - n_ok} con error.")
+    return 0 if n_ok == len(resultados) else 1
+
+def cmd_prestar(args) -> int:
+    return _aplicar_lote(args, ["Num_Propiedad", "Nombre", "Identificador", "Num_Tele"], _prestar)
+
+def cmd_devolver(args) -> int:
+    return _aplicar_lote(args, ["Num_Propiedad"], _devolver)
+
+def cmd_mantenimiento(args) -> int:
+    return _aplicar_lote(args, ["Num_Propiedad", "tecnico", "Tipo"], _mantenimiento)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="osi_cli", description="OSI Arecibo — operaciones por lote")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("migrar", help="Migración única de los .xlsx a SQLite")
+    p.add_argument("--db", help=f"Ruta de la base (por defecto {osi_datos.PATH_DB})")
+    p.set_defaults(func=cmd_migrar)
+
+    p = sub.add_parser("exportar", help="Exportar las cuatro tablas a Excel")
+    p.add_argument("carpeta", help="Carpeta destino de los .xlsx")
+    p.set_defaults(func=cmd_exportar)
+
+    p = sub.add_parser("archivar", help="Mover el historial cerrado viejo a libros por año",
+                       description="Préstamos devueltos y mantenimientos/reparaciones terminados anteriores "
+                                   "al corte pasan a archivo/<registro>_<año>.xlsx. Lo abierto nunca se mueve.")
+    corte = p.add_mutually_exclusive_group()
+    corte.add_argument("--meses", type=int, default=osi_datos.ARCHIVAR_MESES,
+                       help=f"Archivar lo anterior a hace N meses (por defecto {osi_datos.ARCHIVAR_MESES})")
+    corte.add_argument("--antes-de", help="Archivar lo anterior a esta fecha (YYYY-MM-DD)")
+    p.add_argument("--simular", action="store_true", help="Solo contar lo que se movería")
+    p.set_defaults(func=cmd_archivar)
+
+    p = sub.add_parser("reporte", help="Reporte de cumplimiento del mantenimiento (.xlsx o .csv)",
+                       description="Casillas del checklist por máquina, modelo o técnico, incluido el archivo "
+                                   "histórico. 'todos' genera un .xlsx con una hoja por reporte.")
+    p.add_argument("tipo", choices=[*osi_reportes.TIPOS, "todos"])
+    p.add_argument("destino", help="Archivo .xlsx o .csv")
+    p.add_argument("--falta", nargs="+", choices=osi_reportes.CHECKLIST, metavar="CASILLA",
+                   help="Solo las máquinas a las que les falta alguna de estas casillas (reporte maquinas)")
+    p.add_argument("--sin-archivo", action="store_true", help="No incluir el archivo histórico por año")
+    p.set_defaults(func=cmd_reporte)
+
+    p = sub.add_parser("buscar", help="Buscar palabras en reparaciones y préstamos",
+                       description="Descripción de reparación y técnico; nombre, identificador y teléfono "
+                                   "del préstamo. Sin acentos ni mayúsculas; cada palabra vale como inicio.")
+    p.add_argument("palabras", nargs="+")
+    p.add_argument("-n", type=int, default=50, help="Máximo de resultados por registro (50)")
+    p.set_defaults(func=cmd_buscar)
+
+    lotes = (
+        ("prestar", cmd_prestar, "Préstamos por lote",
+         "Columnas: Num_Propiedad, Nombre, Identificador, Num_Tele [, Dia_Pres]"),
+        ("devolver", cmd_devolver, "Devoluciones por lote",
+         "Columnas: Num_Propiedad [, Dia_Entr]"),
+        ("mantenimiento", cmd_mantenimiento, "Mantenimientos/reparaciones por lote",
+         "Columnas: Num_Propiedad, tecnico, Tipo (Mantenimiento|Reparación) [, Dia, Desc_Reparacion, "
+         "tareas con X]. Una reparación con Dia vacío queda PENDIENTE."),
+    )
+    for nombre, func, ayuda, columnas in lotes:
+        p = sub.add_parser(nombre, help=ayuda, description=columnas)
+        p.add_argument("archivo", help="Archivo CSV (primera fila = encabezados)")
+        p.add_argument("--simular", action="store_true", help="Solo validar e informar; no guardar nada")
+        p.set_defaults(func=func)
+
+    args = ap.parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
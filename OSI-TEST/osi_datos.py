@@ -0,0 +1,2205 @@
+# =============================================================================
+# OSI Arecibo — Capa de datos
+# Rutas, esquemas exactos de los registros y el almacén compartido en memoria.
+# Este módulo NO depende de la GUI: lo usan la app, la consola y las pruebas.
+# =============================================================================
+
+from __future__ import annotations
+
+import os
+import re
+import bisect
+import functools
+import hashlib
+import json
+import numbers
+import pickle
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+import zipfile
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from xml.sax.saxutils import escape as _xml_escape
+from datetime import date, datetime
+
+import osi_perf
+
+class _ModuloDiferido:
+    """Importa el módulo real en el primer uso: pandas tarda ~0.5 s y no hace falta para abrir la ventana."""
+    def __init__(self, importar):
+        self._importar = importar
+        self._mod = None
+
+    def __getattr__(self, attr):
+        if self._mod is None:
+            self._mod = self._importar()
+        return getattr(self._mod, attr)
+
+def _importar_pandas():
+    import pandas  # import explícito: PyInstaller (--onefile) lo detecta y lo empaqueta
+    return pandas
+
+pd = _ModuloDiferido(_importar_pandas)
+
+# ------------------------------- Rutas globales --------------------------------
+
+APP_NAME = "OSI_Arecibo"
+
+PROGRAM_DATA = os.getenv("PROGRAMDATA")  # C:\ProgramData
+DATA_DIR = os.path.join(PROGRAM_DATA, APP_NAME)
+
+os.makedirs(DATA_DIR, exist_ok=True)
+osi_perf.configurar(DATA_DIR)  # log de tiempos: osi_tiempos.log
+
+PATH_INV   = os.path.join(DATA_DIR, "Registro Laptops.xlsx")
+PATH_MANT  = os.path.join(DATA_DIR, "Registro_Mantenimiento_Reparacion_Laptop.xlsx")
+PATH_PREST = os.path.join(DATA_DIR, "Registro_Prestamos_Laptop.xlsx")
+PATH_DEC   = os.path.join(DATA_DIR, "Registro_Decomisados.xlsx")
+PATH_DB    = os.path.join(DATA_DIR, "osi_arecibo.sqlite")  # backend opcional (ver migrar_a_sqlite)
+PATH_DIARIO = os.path.join(DATA_DIR, "osi_diario.jsonl")     # renombres pendientes (ver _confirmar_reemplazos)
+
+# Cachés en pickle (instantáneas, índices): de cada usuario y en su equipo, NUNCA en DATA_DIR.
+# La carpeta de datos la comparten varias estaciones y cargar un pickle ejecuta código:
+# quien pudiera escribir ahí lo ejecutaría en todas.
+CACHE_DIR = os.path.join(os.getenv("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache"),
+                         APP_NAME, "cache")
+
+# Encabezados exactos (NO cambiar)
+INV_COLS  = [
+    "Num_Propiedad","ID_Laptop","Service_Tag","Modelo","Disponible","Garantía","Fecha_Compra"
+]
+MANT_COLS = [
+    "Num_Propiedad","Dia","tecnico","Tipo","Desc_Reparacion","Nombre","Descripcion","Dominio",
+    "Check Update","Dell Command Updates","Bios Update","Upgrade Windows 10 - 11",
+    "Office 2019 Installed","PatchMyPC Installed","Dell Support Assist Installed"
+]
+PREST_COLS= ["Num_Propiedad","Nombre","Identificador","Num_Tele","Dia_Pres","Dia_Entr"]
+DEC_COLS  = ["Num_Propiedad","ID_Laptop","Service_Tag","Modelo",
+             "Num_Mantenimiento","Num_Reparaciones","Num_Prestamos","Fecha_Dec"]
+
+# Columnas del archivo de importación por lote (Disponible se asigna "X")
+IMPORT_COLS = ["Num_Propiedad","ID_Laptop","Service_Tag","Modelo","Garantía","Fecha_Compra"]
+
+# Formatos de identificadores
+RE_NUM_PROP    = r"R\d{8}"
+RE_ID_LAPTOP   = r"UIPRA-(EST|FAC)-L\d{3}"
+RE_SERVICE_TAG = r"[A-Z0-9]{7}"
+
+# Nombre corto de cada tabla -> (ruta, encabezados)
+TABLAS = {
+    "inv":   (PATH_INV,   INV_COLS),
+    "mant":  (PATH_MANT,  MANT_COLS),
+    "prest": (PATH_PREST, PREST_COLS),
+    "dec":   (PATH_DEC,   DEC_COLS),
+}
+
+# ------------------------------ Errores -------------------------------
+
+def _mostrar_error_consola(titulo: str, msg: str):
+    print(f"[{titulo}] {msg}", file=sys.stderr)
+
+# La GUI lo reemplaza por messagebox.showerror al arrancar.
+mostrar_error = _mostrar_error_consola
+
+# ------------------------------ Utils ---------------------------------
+
+def _normkey(s: str) -> str:
+    import unicodedata as _ud
+    s = "" if s is None else str(s)
+    s = _ud.normalize("NFKD", s)
+    s = "".join(ch for ch in s if not _ud.combining(ch))
+    s = s.lower()
+    for ch in (" ", "_", "-", ".", "/"):
+        s = s.replace(ch, "")
+    return s
+
+# ------------------------------ Fechas ---------------------------------
+# Motor de fechas por COLUMNA: una pasada vectorizada por tipo de dato (fechas de Excel ya
+# convertidas, seriales numéricos, texto). Para el texto se detecta el formato dominante de
+# la columna (p. ej. m/d/Y vs d/m/Y) y se recuerda para la próxima vez, por registro y
+# columna ("inv.Garantía"): un archivo de importación no hereda el formato del inventario.
+
+FORMATOS_FECHA = ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y/%m/%d", "%m/%d/%Y", "%d/%m/%Y")
+_formato_columna = {}  # "tabla.columna" -> formato detectado la última vez
+
+def _tipo_fecha(v) -> str:
+    if isinstance(v, str):
+        return "t"
+    if isinstance(v, (date, datetime)):  # incluye pd.Timestamp
+        return "f"
+    if isinstance(v, numbers.Real) and not isinstance(v, bool):
+        return "n"
+    return "t"
+
+def _fechas_texto(s: pd.Series, nombre=None, formatos=None) -> pd.Series:
+    candidatos = list(formatos or FORMATOS_FECHA)
+    previo = _formato_columna.get(nombre) if nombre else None
+    if previo in candidatos:
+        dt = pd.to_datetime(s, format=previo, errors="coerce")
+        if dt.notna().all():
+            return dt
+    # Formato dominante de la columna (empate -> el primero de la lista: mes/día como siempre)
+    intentos = {f: pd.to_datetime(s, format=f, errors="coerce") for f in candidatos}
+    mejor = max(candidatos, key=lambda f: (intentos[f].notna().sum(), -candidatos.index(f)))
+    dt = intentos[mejor]
+    if nombre and dt.notna().any():
+        _formato_columna[nombre] = mejor
+    # Filas que no siguen el formato dominante: los demás formatos, en orden
+    for f in candidatos:
+        if dt.isna().any():
+            dt = dt.fillna(intentos[f])
+    if formatos is None and dt.isna().any():
+        resto = dt.isna()
+        dt[resto] = pd.to_datetime(s[resto], format="mixed", errors="coerce")
+    return dt
+
+def fechas_columna(col, nombre: str | None = None, formatos=None, solo_dia: bool = True):
+    """
+    Convierte una columna de fechas mixtas (Timestamp/date, serial de Excel, texto
+    ISO, m/d/Y o d/m/Y) a datetime64 (solo el día, salvo solo_dia=False). Devuelve
+    (fechas, invalidas): `invalidas` marca las filas sin fecha reconocible (incluidas
+    las vacías). `nombre` ("tabla.columna") activa la caché del formato detectado; sin él
+    el formato se detecta solo con los valores de `col`. `formatos` restringe
+    los formatos de texto aceptados (sin interpretación libre).
+    """
+    col = pd.Series(col)
+    fechas = pd.Series(pd.NaT, index=col.index, dtype="datetime64[ns]")
+    if col.empty:
+        return fechas, pd.Series(False, index=col.index)
+    if pd.api.types.is_datetime64_any_dtype(col):
+        fechas = col.dt.tz_localize(None) if col.dt.tz is not None else col
+        fechas = fechas.astype("datetime64[ns]")
+        if solo_dia:
+            fechas = fechas.dt.normalize()
+        return fechas, fechas.isna()
+
+    vals = col.astype(object)
+    tipos = vals.map(_tipo_fecha)
+    es_f, es_n, es_t = tipos == "f", tipos == "n", tipos == "t"
+    if es_f.any():
+        fechas[es_f] = pd.to_datetime(vals[es_f].tolist(), errors="coerce")
+    if es_n.any():
+        seriales = pd.to_numeric(vals[es_n], errors="coerce")
+        fechas[es_n] = pd.to_datetime(seriales, unit="D", origin="1899-12-30", errors="coerce")
+    if es_t.any():
+        txt = vals[es_t].astype(str).str.strip()
+        txt = txt[txt != ""]
+        if not txt.empty:
+            fechas[txt.index] = _fechas_texto(txt, nombre, formatos)
+    if solo_dia:
+        fechas = fechas.dt.normalize()
+    return fechas, fechas.isna()
+
+def iso_columna(col, nombre: str | None = None, formatos=None) -> pd.Series:
+    """'YYYY-MM-DD' por fila; None donde no hay fecha válida."""
+    fechas, invalidas = fechas_columna(col, nombre, formatos)
+    return fechas.dt.strftime("%Y-%m-%d").astype(object).where(~invalidas, None)
+
+def texto_fecha_columna(col, nombre: str | None = None) -> pd.Series:
+    """Para mostrar: fecha -> 'YYYY-MM-DD'; lo que no es fecha se deja como texto (vacío si falta)."""
+    col = pd.Series(col)
+    fechas, invalidas = fechas_columna(col, nombre)
+    txt = col.astype(object).where(col.notna(), "").astype(str)
+    return fechas.dt.strftime("%Y-%m-%d").where(~invalidas, txt)
+
+def _to_iso_date(value) -> str:
+    """Versión escalar de iso_columna (ValueError si no es fecha)."""
+    iso = iso_columna(pd.Series([value], dtype=object))[0]
+    if iso is None:
+        raise ValueError(f"No se pudo parsear fecha: {value!r}")
+    return iso
+
+def _texto(col: pd.Series) -> pd.Series:
+    return col.astype(object).where(col.notna(), "").astype(str).str.strip()
+
+def _find_pending_flag_col(df: pd.DataFrame) -> str | None:
+    """
+    Detecta (si existe) una columna de 'reparación pendiente por pieza' sin renombrarla ni crearla.
+    Acepta variantes comunes: 'Esperando_Pieza', 'Pendiente', 'En_Espera', etc.
+    Devuelve el nombre EXACTO de la columna si la encuentra; si no, None.
+    """
+    candidates = {
+        "esperandopieza",
+        "pendientepieza",
+        "pendiente",
+        "enespera",
+        "enesperapieza",
+        "pieza_pendiente",
+        "piezaespera"
+    }
+    for col in df.columns:
+        if _normkey(col) in candidates:
+            return col
+    return None
+
+# ------------------------------ Esquema ---------------------------------
+# En memoria cada tabla va TIPADA (al cargarla y en cada cambio):
+# - claves (Num_Propiedad, ID_Laptop, Service_Tag): texto ya normalizado (strip + mayúsculas);
+# - Modelo, Tipo y tecnico: category (pocos valores repetidos miles de veces);
+# - Disponible y las casillas del checklist: bool ("X" = True);
+# - fechas: datetime64 (con hora si la tenían).
+# Al escribir se vuelve al formato del registro ("X"/vacío, fechas en texto ISO o celdas de
+# fecha). Lo que el tipado no devolvería igual (una fecha escrita como texto '05/03/2030',
+# " r123 " en una clave...) se guarda aparte en los ORIGINALES de la tabla (ver _originales):
+# reescribir un registro deja tal cual las celdas que nadie editó.
+# Una columna con valores que no encajan en su tipo (texto libre en una fecha, "N/A" en
+# una casilla) se deja como está: reescribir el archivo nunca pierde datos.
+
+# tabla -> {columna: tipo}. Por tabla y no por nombre de columna: "Nombre" es una casilla
+# del checklist en mant y el nombre de quien pide prestado en prest.
+ESQUEMA = {
+    "inv":   {"Num_Propiedad": "clave", "ID_Laptop": "clave", "Service_Tag": "clave",
+              "Modelo": "categoria", "Disponible": "marca", "Garantía": "fecha", "Fecha_Compra": "fecha"},
+    "mant":  {"Num_Propiedad": "clave", "Dia": "fecha", "tecnico": "categoria", "Tipo": "categoria",
+              **{c: "marca" for c in MANT_COLS[5:]}},
+    "prest": {"Num_Propiedad": "clave", "Dia_Pres": "fecha", "Dia_Entr": "fecha"},
+    "dec":   {"Num_Propiedad": "clave", "ID_Laptop": "clave", "Service_Tag": "clave",
+              "Modelo": "categoria", "Fecha_Dec": "fecha"},
+}
+
+_VACIOS = ["", "NaT", "nan"]  # celdas que cuentan como vacías (NaT/nan escritos como texto)
+
+def _tipar_columna(col: pd.Series, tipo: str, nombre: str) -> pd.Series:
+    """`col` con el `tipo` del esquema; la misma `col` si ya lo tiene o si sus valores no encajan."""
+    if tipo == "clave":
+        return _texto(col).str.upper()
+    if tipo == "categoria":
+        return col if isinstance(col.dtype, pd.CategoricalDtype) else col.astype("category")
+    if tipo == "marca":
+        if pd.api.types.is_bool_dtype(col):
+            return col
+        txt = _texto(col).str.upper()
+        if not txt.isin(["X"] + _VACIOS).all():
+            return col
+        return (txt == "X").astype(bool)
+    if tipo == "fecha":
+        if pd.api.types.is_datetime64_any_dtype(col):
+            return col
+        fechas, invalidas = fechas_columna(col, nombre, solo_dia=False)
+        if (invalidas & ~_texto(col).isin(_VACIOS)).any():
+            return col
+        return fechas
+    return col
+
+def _tipar(df: pd.DataFrame, tabla: str) -> pd.DataFrame:
+    """Aplica el esquema de `tabla` a las columnas de `df` (no modifica `df`)."""
+    cambios = {}
+    for c, tipo in ESQUEMA.get(tabla, {}).items():
+        if c in df.columns:
+            col = df[c]
+            nueva = _tipar_columna(col, tipo, f"{tabla}.{c}")
+            if nueva is not col:
+                cambios[c] = nueva
+    return df.assign(**cambios) if cambios else df
+
+def columna_registro(col: pd.Series, fechas_texto: bool = True) -> pd.Series:
+    """
+    Inversa de _tipar_columna: los valores tal como se escriben en el registro.
+    fechas_texto=False deja las fechas como datetime (celdas de fecha en el .xlsx).
+    """
+    if pd.api.types.is_bool_dtype(col):
+        return col.map({True: "X", False: ""}).astype(object)
+    if pd.api.types.is_datetime64_any_dtype(col):
+        if not fechas_texto:
+            return col.astype(object).where(col.notna(), None)
+        dia = col.dt.strftime("%Y-%m-%d")
+        completa = col.dt.strftime("%Y-%m-%d %H:%M:%S").where(col != col.dt.normalize(), dia)
+        return completa.astype(object).where(col.notna(), None)
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return col.astype(object)
+    return col
+
+class _Tipado:
+    """Celda de los originales que se escribe con su valor tipado (columna_registro)."""
+    def __reduce__(self):
+        return "_TIPADO"  # la misma instancia al leer la instantánea
+
+    def __repr__(self):
+        return "_TIPADO"
+
+_TIPADO = _Tipado()
+
+def _es_original(v) -> bool:
+    return v is not _TIPADO
+
+def _originales(crudo: pd.DataFrame, tipado: pd.DataFrame, tabla: str, fechas_texto: bool = True):
+    """
+    Valores del registro que columna_registro no devuelve igual, por columna del esquema:
+    el valor leído (`crudo`) donde el tipado da otra cosa y _TIPADO donde coincide.
+    `fechas_texto` es cómo escribe las fechas el backend. None si todo vuelve tal cual.
+    Una celda vacía (None) y "" cuentan como iguales: se escriben igual.
+    """
+    cols = {}
+    for c in ESQUEMA.get(tabla, {}):
+        if c not in crudo.columns or c not in tipado.columns:
+            continue
+        orig = crudo[c].astype(object).reset_index(drop=True)
+        reg = columna_registro(tipado[c], fechas_texto).astype(object).reset_index(drop=True)
+        igual = (orig == reg) | ((orig.isna() | (orig == "")) & (reg.isna() | (reg == "")))
+        if not igual.all():
+            cols[c] = orig.where(~igual, _TIPADO)
+    return pd.DataFrame(cols) if cols else None
+
+def _originales_juntar(partes: list):
+    """Originales de bloques de filas consecutivos: [(originales o None, filas del bloque)]."""
+    if all(o is None for o, _ in partes):
+        return None
+    cols = list(dict.fromkeys(c for o, _ in partes if o is not None for c in o.columns))
+    return pd.concat([pd.DataFrame({c: [_TIPADO] * n for c in cols}, dtype=object) if o is None
+                      else o.reindex(columns=cols, fill_value=_TIPADO) for o, n in partes], ignore_index=True)
+
+def _originales_editar(originales, tipado: pd.DataFrame, pos: list, valores: dict, tabla: str,
+                       fechas_texto: bool = True):
+    """
+    `originales` tras poner `valores` en las filas `pos` (ya tipadas en `tipado`): esas celdas
+    se escribirán como se pusieron (p. ej. el texto de la fecha de entrega), como antes de tipar.
+    """
+    cols = [c for c in valores if c in tipado.columns]
+    if not cols or not pos:
+        return originales
+    puestos = pd.DataFrame([{c: valores[c] for c in cols}] * len(pos), columns=cols)
+    nuevos = _originales(puestos, tipado[cols].iloc[pos], tabla, fechas_texto)
+    originales = None if originales is None else originales.copy()
+    for c in cols:
+        if nuevos is not None and c in nuevos.columns:
+            vals = nuevos[c].tolist()
+        elif originales is not None and c in originales.columns:
+            vals = [_TIPADO] * len(pos)  # lo puesto se escribe igual tipado: fuera el original viejo
+        else:
+            continue
+        if originales is None:
+            originales = pd.DataFrame(index=range(len(tipado)))
+        if c not in originales.columns:
+            originales[c] = pd.Series([_TIPADO] * len(tipado), dtype=object)
+        j = originales.columns.get_loc(c)
+        for p, v in zip(pos, vals):
+            originales.iat[p, j] = v
+    return originales
+
+def _a_registro(df: pd.DataFrame, fechas_texto: bool = True, originales=None) -> pd.DataFrame:
+    """Los valores tal como se escriben; con `originales` (de las mismas filas), los leídos del registro."""
+    if originales is not None and len(originales) != len(df):
+        originales = None  # no corresponden a estas filas
+    cambios = {}
+    for c in df.columns:
+        col = df[c]
+        nueva = columna_registro(col, fechas_texto)
+        if originales is not None and c in originales.columns:
+            orig = originales[c].set_axis(df.index)
+            usar = orig.map(_es_original)
+            if usar.any():
+                nueva = orig.where(usar, nueva.astype(object))
+        if nueva is not col:
+            cambios[c] = nueva
+    return df.assign(**cambios) if cambios else df
+
+def _marcadas(col: pd.Series) -> pd.Series:
+    """Casilla marcada por fila: columna bool del esquema, o "X" si quedó como texto."""
+    if pd.api.types.is_bool_dtype(col):
+        return col
+    return _texto(col).str.upper() == "X"
+
+# ------------------------------ Excel ---------------------------------
+
+def _xlsx_bloques(path, expected_cols=None, sheet_name=0, tam_bloque=None):
+    """
+    Lee la hoja en streaming (openpyxl read_only + values_only) y produce DataFrames de
+    `tam_bloque` filas (uno solo si es None) con SOLO las columnas pedidas:
+    - la primera fila son los encabezados; una columna pedida que no exista sale vacía ("");
+    - no se leen las columnas a la derecha de la última pedida;
+    - las filas vacías se saltan, pero se lee hasta el final de la hoja: tras miles de filas
+      vacías con formato puede venir un registro (anexado por otra estación o a mano);
+    - los valores quedan como los da Excel (texto, número, fecha): "0787" sigue siendo texto.
+    """
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if isinstance(sheet_name, str) else wb.worksheets[sheet_name]
+        ws.reset_dimensions()  # la dimensión guardada en el libro puede mentir
+        encabezados = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        pos = {}
+        for i, v in enumerate(encabezados):
+            if v is not None:
+                pos.setdefault(str(v).strip(), i)
+        cols = list(expected_cols) if expected_cols else list(pos)
+        idx = [pos.get(c) for c in cols]
+        usados = [i for i in idx if i is not None]
+
+        bloque, entregados = [], 0
+        if usados:
+            for r in ws.iter_rows(min_row=2, max_col=max(usados) + 1, values_only=True):
+                if all(v is None for v in r):
+                    continue
+                bloque.append(tuple("" if i is None else (r[i] if i < len(r) else None) for i in idx))
+                if tam_bloque and len(bloque) >= tam_bloque:
+                    yield pd.DataFrame.from_records(bloque, columns=cols)
+                    bloque, entregados = [], entregados + 1
+        if bloque or not entregados:
+            yield pd.DataFrame.from_records(bloque, columns=cols)
+    finally:
+        wb.close()  # read_only deja el archivo abierto hasta cerrar (y Windows no deja reemplazarlo)
+
+def _read_xlsx(path, expected_cols=None, sheet_name=0):
+    try:
+        with osi_perf.medir("leer_xlsx", bytes=osi_perf.tamano(path)) as m:
+            (df,) = _xlsx_bloques(path, expected_cols, sheet_name)
+            m.filas = len(df)
+        return df
+    except FileNotFoundError:
+        return pd.DataFrame(columns=expected_cols or [])
+    except Exception as e:
+        mostrar_error("Error", f"No se pudo leer:\n{path}\n\n{e}")
+        return pd.DataFrame(columns=expected_cols or [])
+
+def _write_xlsx_exact(df, path, header_order, diario=None) -> bool:
+    """
+    Guarda `df` en `path` de forma atómica (temporal + renombre): nunca deja el archivo a medias.
+    Con el candado de la carpeta de datos del `diario` (el mismo que toma BackendExcel).
+    """
+    diario = diario or PATH_DIARIO
+    try:
+        with _candado(os.path.splitext(diario)[0] + ".lock"), osi_perf.medir("guardar_xlsx", filas=len(df)) as m:
+            tmp = _escribir_xlsx_tmp(df, path, header_order)
+            ok = tmp is not None and _confirmar_reemplazos([(tmp, path)], diario)
+            m.bytes = osi_perf.tamano(path) if ok else None
+    except TimeoutError as e:
+        mostrar_error("Error", f"No se pudo guardar:\n{path}\n\n{e}")
+        return False
+    return ok
+
+def _escribir_xlsx_tmp(df, path, header_order, originales=None):
+    """
+    Escribe `df` completo en el temporal de `path` (ya en disco: fsync). Devuelve la ruta temporal o None.
+    Las fechas tipadas van como celdas de fecha; lo que tenga valor en `originales`, tal como se leyó.
+    """
+    out = _a_registro(df, fechas_texto=False, originales=originales).reindex(columns=header_order, fill_value="")
+    tmp = _ruta_tmp(path)
+    try:
+        with pd.ExcelWriter(tmp, engine="openpyxl") as w:
+            out.to_excel(w, index=False)
+        _fsync_archivo(tmp)
+        return tmp
+    except Exception as e:
+        _borrar(tmp)
+        mostrar_error("Error", f"No se pudo guardar:\n{path}\n\n{e}")
+        return None
+
+# ------------------ Reemplazo atómico + diario de escrituras ------------------
+# Guardar = escribir <archivo>.tmp.xlsx completo y luego os.replace() (atómico por archivo).
+# Cuando una operación toca VARIOS archivos (p. ej. préstamo: préstamos + inventario),
+# antes de renombrar se anota la lista de renombres en el diario. Si el proceso muere a
+# mitad, recuperar_diario() completa los renombres al arrancar; si murió ANTES de anotar,
+# los .tmp huérfanos se descartan y los registros quedan como estaban.
+
+def _ruta_tmp(path: str) -> str:
+    """'Registro Laptops.xlsx' -> 'Registro Laptops.tmp.xlsx' (pandas exige la extensión .xlsx)."""
+    base, ext = os.path.splitext(path)
+    return base + ".tmp" + ext
+
+def _borrar(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _fsync_archivo(path):
+    with open(path, "rb+") as f:
+        os.fsync(f.fileno())
+
+def _confirmar_reemplazos(pares, diario=None) -> bool:
+    """
+    Reemplaza cada destino por su temporal: [(tmp, destino), ...].
+    Con más de un archivo, la anotación en el diario es el punto de confirmación.
+    """
+    diario = diario or PATH_DIARIO
+    if os.path.exists(diario):
+        recuperar_diario(diario)  # un renombre que quedó pendiente va primero
+    if len(pares) > 1:
+        with open(diario, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"renombrar": pares}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    try:
+        for tmp, destino in pares:
+            os.replace(tmp, destino)
+    except OSError as e:
+        # p. ej. el .xlsx está abierto en Excel: el diario lo completará más tarde
+        mostrar_error("Error", f"No se pudo reemplazar:\n{destino}\n\n{e}")
+        if len(pares) == 1:
+            _borrar(pares[0][0])
+        return False
+    if len(pares) > 1:
+        _borrar(diario)
+    return True
+
+def recuperar_diario(diario=None, paths=()) -> int:
+    """
+    Al arrancar: completa los renombres confirmados en el diario y descarta los .tmp
+    huérfanos de `paths`. Devuelve cuántos archivos se completaron.
+    """
+    diario = diario or PATH_DIARIO
+    hechos, pendientes = 0, False
+    if os.path.exists(diario):
+        with open(diario, encoding="utf-8") as f:
+            lineas = f.read().splitlines()
+        for linea in lineas:
+            try:
+                pares = [(str(tmp), str(destino)) for tmp, destino in json.loads(linea)["renombrar"]]
+            except (ValueError, KeyError, TypeError):
+                continue  # línea incompleta: esa operación nunca se confirmó
+            for tmp, destino in pares:
+                if not os.path.exists(tmp):
+                    continue  # ya se había renombrado
+                try:
+                    os.replace(tmp, destino)
+                    hechos += 1
+                except OSError:
+                    pendientes = True
+        if not pendientes:
+            _borrar(diario)
+    if not pendientes:
+        for path in paths:
+            _borrar(_ruta_tmp(path))
+    return hechos
+
+# ------------------ Candado entre estaciones (archivo .lock) ------------------
+# Varias PCs escriben en la misma carpeta: cada escritura (y la recuperación del diario)
+# se hace con el candado tomado. El candado es un archivo creado en exclusiva (O_EXCL,
+# que también respetan los recursos compartidos de red) con una marca de dueño
+# (equipo, pid y un uuid). Mientras se tiene, un hilo lo reescribe cada REFRESCO_BLOQUEO
+# para que una escritura larga no parezca abandonada. Si quien lo tomó murió sin
+# soltarlo, pasado BLOQUEO_VENCIDO sin refrescar se considera abandonado. La edad se mide
+# con el reloj del recurso compartido (mtime de un archivo recién escrito), no con el de
+# esta PC, que puede ir adelantado o atrasado. Solo se borra un candado cuya marca es la
+# nuestra (al soltar) o la misma que se vio vencida (al romperlo).
+
+ESPERA_BLOQUEO   = 15.0   # segundos esperando el candado antes de rendirse
+BLOQUEO_VENCIDO  = 120.0  # un candado sin refrescar más que esto quedó de un proceso caído
+REFRESCO_BLOQUEO = BLOQUEO_VENCIDO / 4
+
+def _leer_marca(path: str):
+    """(marca, mtime) del candado, o None si no existe o no se puede leer."""
+    try:
+        with open(path, "rb") as f:
+            marca = f.read()
+            return marca, os.fstat(f.fileno()).st_mtime
+    except OSError:
+        return None
+
+def _reloj_compartido(carpeta: str) -> float:
+    """Hora actual según el recurso compartido: mtime de un archivo recién escrito ahí.
+    Si no se puede escribir, la hora local."""
+    sonda = os.path.join(carpeta, f".reloj-{uuid.uuid4().hex}.tmp")
+    try:
+        with open(sonda, "wb") as f:
+            f.write(b"reloj")
+            f.flush()
+            os.fsync(f.fileno())
+        return os.path.getmtime(sonda)
+    except OSError:
+        return time.time()
+    finally:
+        _borrar(sonda)
+
+def _refrescar_candado(path: str, marca: bytes, parar: threading.Event):
+    while not parar.wait(REFRESCO_BLOQUEO):
+        try:
+            with open(path, "r+b") as f:
+                if f.read() != marca:
+                    return  # ya no es nuestro (lo rompieron por vencido): no lo pisamos
+                f.seek(0)
+                f.write(marca)  # escribir actualiza el mtime en el servidor
+        except OSError:
+            return
+
+@contextmanager
+def _candado(path: str, espera: float | None = None):
+    limite = time.monotonic() + (ESPERA_BLOQUEO if espera is None else espera)
+    marca = f"{socket.gethostname()} pid={os.getpid()} {uuid.uuid4().hex}".encode()
+    revisado = 0.0  # cuándo se miró por última vez si el candado ajeno está vencido
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except (FileExistsError, PermissionError):  # Windows: PermissionError si se está borrando
+            if time.monotonic() - revisado >= 1.0:
+                revisado = time.monotonic()
+                visto = _leer_marca(path)
+                if visto is None:
+                    continue  # lo soltaron mientras mirábamos
+                if _reloj_compartido(os.path.dirname(path) or ".") - visto[1] > BLOQUEO_VENCIDO:
+                    if _leer_marca(path) == visto:  # sigue siendo el mismo candado vencido
+                        _borrar(path)
+                    continue
+            if time.monotonic() >= limite:
+                raise TimeoutError(f"Otra estación tiene bloqueado el registro ({path}).")
+            time.sleep(0.05)
+    parar = threading.Event()
+    try:
+        try:
+            os.write(fd, marca)
+        finally:
+            os.close(fd)
+        threading.Thread(target=_refrescar_candado, args=(path, marca, parar), daemon=True).start()
+        yield
+    finally:
+        parar.set()
+        visto = _leer_marca(path)
+        if visto is not None and visto[0] == marca:
+            _borrar(path)
+
+def _huella(path: str):
+    """Token de versión de un archivo: (mtime_ns, tamaño, hash del contenido), o None si no existe.
+    El hash cubre lo que mtime+tamaño no ven (recursos compartidos con mtime de 2 s)."""
+    firma = _firma(path)
+    if firma is None:
+        return None
+    h = hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, "rb") as f:
+            for bloque in iter(lambda: f.read(1 << 20), b""):
+                h.update(bloque)
+    except OSError:
+        return None
+    return firma + (h.hexdigest(),)
+
+# ---------------------- Anexar fila sin reescribir ---------------------
+# Un .xlsx es un zip: no se puede "anexar" al archivo en sitio. Lo que sí evitamos es
+# el costo real (openpyxl construyendo todas las celdas + pandas serializándolas):
+# se inserta el XML de la fila nueva tras la última fila CON DATOS y el resto del zip se
+# copia tal cual. Las filas vacías que Excel deja solo por el formato no cuentan: la fila
+# nueva ocupa la primera de ellas (con su formato) y no queda miles de filas más abajo.
+# Cualquier formato inesperado -> None y el llamador reescribe completo.
+
+_NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_REL  = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_PKG  = "http://schemas.openxmlformats.org/package/2006/relationships"
+_XML_ILEGAL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_RE_FILA_R  = re.compile(rb'<row\b[^>]*?\sr="(\d+)"')
+_RE_VALOR   = re.compile(rb"<(?:v|is|f)[\s>/]")  # una celda con valor, texto o fórmula
+_RE_ESTILO  = re.compile(rb'<c\b[^>]*?\sr="([A-Z]+)\d+"[^>]*?\ss="(\d+)"')
+
+def _col_letra(i: int) -> str:
+    s = ""
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+def _primera_hoja(z: zipfile.ZipFile) -> str:
+    wb = ET.fromstring(z.read("xl/workbook.xml"))
+    rid = wb.find(f"{{{_NS_MAIN}}}sheets/{{{_NS_MAIN}}}sheet").get(f"{{{_NS_REL}}}id")
+    rels = ET.fromstring(z.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.iter(f"{{{_NS_PKG}}}Relationship"):
+        if rel.get("Id") == rid:
+            target = rel.get("Target")
+            return target.lstrip("/") if target.startswith("/") else "xl/" + target
+    raise KeyError(rid)
+
+def _shared_strings(z: zipfile.ZipFile, hasta: int) -> list:
+    """Lee solo los primeros `hasta`+1 textos compartidos (los del encabezado)."""
+    out = []
+    if hasta < 0 or "xl/sharedStrings.xml" not in z.namelist():
+        return out
+    with z.open("xl/sharedStrings.xml") as f:
+        for _, el in ET.iterparse(f):
+            if el.tag == f"{{{_NS_MAIN}}}si":
+                out.append("".join(t.text or "" for t in el.iter(f"{{{_NS_MAIN}}}t")))
+                el.clear()
+                if len(out) > hasta:
+                    break
+    return out
+
+def _encabezado_hoja(z: zipfile.ZipFile, xml: bytes) -> list:
+    ini = xml.find(b"<row ")
+    fin = xml.find(b"</row>", ini)
+    if ini < 0 or fin < 0:
+        return []
+    row = ET.fromstring(b'<x xmlns="' + _NS_MAIN.encode() + b'">' + xml[ini:fin + 6] + b"</x>")
+    celdas = []
+    for c in row.iter(f"{{{_NS_MAIN}}}c"):
+        v = c.find(f"{{{_NS_MAIN}}}v")
+        if c.get("t") == "s":
+            celdas.append(("s", int(v.text)))
+        elif c.get("t") == "inlineStr":
+            celdas.append(("t", "".join(t.text or "" for t in c.iter(f"{{{_NS_MAIN}}}t"))))
+        else:
+            celdas.append(("t", v.text if v is not None else ""))
+    sst = _shared_strings(z, max([i for k, i in celdas if k == "s"], default=-1))
+    return [sst[i] if k == "s" else i for k, i in celdas]
+
+def _celda_xml(ref: str, v, estilo: str | None = None) -> str:
+    """XML de una celda; `estilo` (atributo s) conserva el formato que ya tenía esa celda."""
+    s_attr = f' s="{estilo}"' if estilo else ""
+    vacia = f'<c r="{ref}"{s_attr}/>' if estilo else ""
+    if v is None or (isinstance(v, float) and pd.isna(v)):
+        return vacia
+    if isinstance(v, bool):
+        return f'<c r="{ref}"{s_attr} t="b"><v>{int(v)}</v></c>'
+    if isinstance(v, numbers.Integral):
+        return f'<c r="{ref}"{s_attr}><v>{int(v)}</v></c>'
+    if isinstance(v, numbers.Real):
+        return f'<c r="{ref}"{s_attr}><v>{float(v)!r}</v></c>'
+    s = _XML_ILEGAL.sub("", str(v))
+    if s == "":
+        return vacia
+    return f'<c r="{ref}"{s_attr} t="inlineStr"><is><t xml:space="preserve">{_xml_escape(s)}</t></is></c>'
+
+def _ultima_fila_con_datos(xml: bytes, fin: int):
+    """
+    (número, posición donde termina, filas vacías que la siguen) de la última <row> con algún
+    valor antes de `fin` (</sheetData>); las vacías como [(número, xml de la fila)].
+    None si alguna fila no trae r= (se reescribe completo).
+    """
+    vacias = []
+    while True:
+        ini = xml.rfind(b"<row", 0, fin)
+        if ini < 0:
+            return None
+        fila = xml[ini:fin]
+        m = _RE_FILA_R.match(fila)
+        if not m:
+            return None
+        if _RE_VALOR.search(fila):
+            return int(m.group(1)), fin, vacias[::-1]
+        vacias.append((int(m.group(1)), fila))
+        fin = ini
+
+def _append_xlsx_tmp(path, header_order, filas: list):
+    """
+    Escribe en el temporal de `path` el libro con `filas` (dicts columna -> valor) anexadas a la
+    primera hoja, sin reserializar las filas previas. Devuelve la ruta temporal, o None
+    si el archivo no existe o no tiene la forma esperada (encabezados exactos); en ese
+    caso el llamador debe reescribir completo.
+    """
+    if not os.path.exists(path):
+        return None
+    tmp = _ruta_tmp(path)
+    try:
+        with zipfile.ZipFile(path) as z:
+            hoja = _primera_hoja(z)
+            xml = z.read(hoja)
+            if _encabezado_hoja(z, xml) != list(header_order):
+                return None
+            fin = xml.rfind(b"</sheetData>")
+            ultima = _ultima_fila_con_datos(xml, fin) if fin >= 0 else None
+            if ultima is None:
+                return None
+            n, corte, vacias = ultima
+            formato = dict(vacias)  # número -> fila vacía con formato que la nueva reemplaza
+            xml_filas = []
+            for fila in filas:
+                n += 1
+                previa = formato.pop(n, None)
+                estilos = {k.decode(): v.decode() for k, v in _RE_ESTILO.findall(previa)} if previa else {}
+                celdas = "".join(_celda_xml(f"{_col_letra(i)}{n}", fila.get(c), estilos.get(_col_letra(i)))
+                                 for i, c in enumerate(header_order))
+                xml_filas.append(f'<row r="{n}">{celdas}</row>')
+            resto = b"".join(f for r, f in vacias if r in formato)  # filas vacías más abajo: intactas
+            nuevo = xml[:corte] + "".join(xml_filas).encode("utf-8") + resto + xml[fin:]
+            ult_col = _col_letra(len(header_order) - 1)
+            ult_fila = max([n] + list(formato))
+            nuevo = re.sub(rb'<dimension ref="[^"]*"', f'<dimension ref="A1:{ult_col}{ult_fila}"'.encode(), nuevo, count=1)
+            with zipfile.ZipFile(tmp, "w") as out:
+                for info in z.infolist():
+                    # compresión rápida: el costo dominante aquí es zlib, no el XML
+                    out.writestr(info, nuevo if info.filename == hoja else z.read(info.filename),
+                                 compresslevel=1)
+        _fsync_archivo(tmp)
+        return tmp
+    except Exception:
+        _borrar(tmp)
+        return None
+
+# ------------------------- Backends de almacenamiento -------------------------
+
+def _firma(path):
+    """(mtime_ns, tamaño) del archivo, o None si no existe."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+# --------------------- Instantáneas binarias de los .xlsx ---------------------
+# Abrir un .xlsx con openpyxl es lo más lento del arranque. Tras cada lectura o escritura
+# se guarda el DataFrame (con sus originales) en un pickle (en CACHE_DIR, local) marcado con la firma
+# (mtime, tamaño) del .xlsx: si la firma sigue igual, se usa el pickle y Excel no se abre.
+# Si alguien edita el .xlsx a mano (o desde otra PC), la firma cambia y se vuelve a leer el libro.
+
+VERSION_INSTANTANEA = 5  # subir si cambia lo que devuelve la lectura del .xlsx
+
+def _ruta_cache(path: str, ext: str) -> str:
+    """Archivo de CACHE_DIR para el registro `path`: una subcarpeta por carpeta de datos."""
+    carpeta, nombre = os.path.split(os.path.abspath(path))
+    sub = hashlib.blake2b(os.path.normcase(carpeta).encode("utf-8"), digest_size=8).hexdigest()
+    return os.path.join(CACHE_DIR, sub, nombre + ext)
+
+def _crear_dir_cache(ruta: str):
+    os.makedirs(os.path.dirname(ruta), mode=0o700, exist_ok=True)  # solo para el usuario
+
+def _ruta_instantanea(path: str) -> str:
+    return _ruta_cache(path, ".pkl")
+
+def _leer_instantanea(path: str, cols):
+    """(DataFrame, originales) de la instantánea de `path` si sigue vigente; None si falta, es vieja o está dañada."""
+    try:
+        with open(_ruta_instantanea(path), "rb") as f:
+            datos = pickle.load(f)
+    except Exception:
+        return None
+    if (not isinstance(datos, dict) or datos.get("version") != VERSION_INSTANTANEA
+            or datos.get("cols") != list(cols or []) or datos.get("firma") != _firma(path)):
+        return None
+    return datos.get("df"), datos.get("originales")
+
+def _guardar_instantanea(path: str, cols, df: pd.DataFrame, firma, originales=None):
+    """`firma` es la del .xlsx cuyo contenido es `df` (tomada ANTES de leerlo o DESPUÉS de escribirlo)."""
+    if firma is None or df is None:
+        return
+    ruta = _ruta_instantanea(path)
+    tmp = f"{ruta}.{os.getpid()}.tmp"  # varias estaciones pueden guardar la misma a la vez
+    try:
+        _crear_dir_cache(ruta)
+        with open(tmp, "wb") as f:
+            pickle.dump({"version": VERSION_INSTANTANEA, "firma": firma, "cols": list(cols or []), "df": df,
+                         "originales": originales}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, ruta)
+    except Exception:
+        _borrar(tmp)  # la instantánea es solo un atajo: sin ella se lee el .xlsx
+
+class BackendExcel:
+    """Los .xlsx SON la base de datos (modo original)."""
+    nombre = "excel"
+    fechas_texto = False  # las fechas tipadas se reescriben como celdas de fecha
+
+    def __init__(self, diario: str = None):
+        self.diario = diario or PATH_DIARIO
+        self.path_candado = os.path.splitext(self.diario)[0] + ".lock"  # un candado por carpeta de datos
+
+    def bloqueo(self):
+        return _candado(self.path_candado)
+
+    def recuperar(self, tablas):
+        # con el candado: sin él se podrían "recuperar" los temporales de otra estación a medio escribir
+        try:
+            with self.bloqueo():
+                recuperar_diario(self.diario, [t.path for t in tablas])
+        except TimeoutError:
+            pass  # otra estación está escribiendo: su commit (o su propio arranque) completa el diario
+
+    def firma(self, t):
+        return _firma(t.path)
+
+    def token(self, t):
+        return _huella(t.path)
+
+    def cargar(self, t):
+        """(DataFrame tipado, originales) de la tabla `t`."""
+        datos = _leer_instantanea(t.path, t.cols)
+        if datos is None:
+            firma = _firma(t.path)
+            crudo = _read_xlsx(t.path, t.cols)
+            df = _tipar(crudo, t.nombre)  # se guarda ya tipada: más chica y lista
+            datos = df, _originales(crudo, df, t.nombre, self.fechas_texto)
+            _guardar_instantanea(t.path, t.cols, df, firma, datos[1])
+        return datos
+
+    def escribir(self, cambios, extra=()) -> bool:
+        """
+        cambios: [(tabla, df completo, filas anexadas o None), ...].
+        Si solo hubo filas nuevas se anexan (sin reescribir el historial); si no, o si el
+        archivo no admite anexar, se reescribe completo. Todos los archivos se confirman juntos,
+        también `extra`: [(temporal ya escrito, destino)] (libros y resumen del archivo histórico).
+        """
+        pares = list(extra)
+        for t, df, anexadas in cambios:
+            tmp = _append_xlsx_tmp(t.path, t.cols, anexadas) if anexadas else None
+            if tmp is None:
+                tmp = _escribir_xlsx_tmp(df, t.path, t.cols, t.originales)
+            if tmp is None:
+                for tmp_previo, _ in pares:
+                    _borrar(tmp_previo)
+                return False
+            pares.append((tmp, t.path))
+        if not _confirmar_reemplazos(pares, self.diario):
+            return False
+        for t, df, _ in cambios:
+            _guardar_instantanea(t.path, t.cols, df, _firma(t.path), t.originales)
+        return True
+
+    def guardar(self, t, df) -> bool:
+        return self.escribir([(t, df, None)])
+
+def _valor_sql(v):
+    if v is None or (not isinstance(v, str) and pd.isna(v)):
+        return None
+    if isinstance(v, (pd.Timestamp, datetime)):
+        return v.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(v, numbers.Integral) and not isinstance(v, bool):
+        return int(v)
+    if isinstance(v, numbers.Real) and not isinstance(v, bool):
+        return float(v)
+    return str(v) if not isinstance(v, (str, bool)) else v
+
+class BackendSQLite:
+    """
+    Las cuatro tablas en un archivo SQLite local, con los MISMOS encabezados.
+    - Índices en Num_Propiedad, Dia y Dia_Pres.
+    - La firma de cada tabla es un contador de versión (tabla _meta) que sube en cada escritura.
+    - Los .xlsx se generan a pedido con exportar_excel().
+    """
+    nombre = "sqlite"
+    fechas_texto = True  # como en los .xlsx de siempre: texto ISO
+    INDICES = {"inv": ["Num_Propiedad"], "mant": ["Num_Propiedad", "Dia"],
+               "prest": ["Num_Propiedad", "Dia_Pres"], "dec": ["Num_Propiedad"]}
+
+    def __init__(self, path_db: str):
+        self.path = path_db
+        self.con = sqlite3.connect(path_db, check_same_thread=False)
+        self.con.execute("CREATE TABLE IF NOT EXISTS _meta (tabla TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+
+    @staticmethod
+    def _q(c: str) -> str:
+        return '"' + c.replace('"', '""') + '"'
+
+    def preparar(self, nombre: str, cols: list):
+        # Columnas sin tipo: SQLite guarda cada valor tal cual (texto, número o NULL)
+        self.con.execute(f"CREATE TABLE IF NOT EXISTS {nombre} ({', '.join(self._q(c) for c in cols)})")
+        for c in self.INDICES.get(nombre, []):
+            self.con.execute(f"CREATE INDEX IF NOT EXISTS ix_{nombre}_{_normkey(c)} ON {nombre} ({self._q(c)})")
+        self.con.execute("INSERT OR IGNORE INTO _meta (tabla, version) VALUES (?, 0)", (nombre,))
+        self.con.commit()
+
+    def _subir_version(self, nombre: str):
+        self.con.execute("UPDATE _meta SET version = version + 1 WHERE tabla = ?", (nombre,))
+
+    def firma(self, t):
+        row = self.con.execute("SELECT version FROM _meta WHERE tabla = ?", (t.nombre,)).fetchone()
+        return row[0] if row else None
+
+    def token(self, t):
+        return self.firma(t)  # el contador de versión ya cambia en cada escritura
+
+    def bloqueo(self):
+        return _candado(self.path + ".lock")
+
+    def cargar(self, t):
+        """(DataFrame tipado, originales) de la tabla `t`."""
+        cols = ", ".join(self._q(c) for c in t.cols)
+        crudo = pd.read_sql_query(f"SELECT {cols} FROM {t.nombre} ORDER BY rowid", self.con)
+        df = _tipar(crudo, t.nombre)
+        return df, _originales(crudo, df, t.nombre, self.fechas_texto)
+
+    def _insertar(self, t, filas):
+        marcas = ", ".join("?" for _ in t.cols)
+        self.con.executemany(f"INSERT INTO {t.nombre} VALUES ({marcas})",
+                             ([_valor_sql(v) for v in fila] for fila in filas))
+
+    def escribir(self, cambios) -> bool:
+        """Igual que BackendExcel.escribir, en UNA transacción para todas las tablas."""
+        try:
+            with self.con:
+                for t, df, anexadas in cambios:
+                    if anexadas:
+                        self._insertar(t, ([fila.get(c) for c in t.cols] for fila in anexadas))
+                    else:
+                        self.con.execute(f"DELETE FROM {t.nombre}")
+                        filas = _a_registro(df, originales=t.originales).reindex(columns=t.cols)
+                        self._insertar(t, filas.itertuples(index=False, name=None))
+                    self._subir_version(t.nombre)
+            return True
+        except Exception as e:
+            nombres = ", ".join(t.nombre for t, _, _ in cambios)
+            mostrar_error("Error", f"No se pudo guardar ({nombres}) en:\n{self.path}\n\n{e}")
+            return False
+
+    def guardar(self, t, df) -> bool:
+        return self.escribir([(t, df, None)])
+
+    def vacia(self, nombre: str) -> bool:
+        return self.con.execute(f"SELECT 1 FROM {nombre} LIMIT 1").fetchone() is None
+
+# ------------------------- Almacén en memoria -------------------------
+
+def _clave(v) -> str:
+    """Normaliza un identificador (Num_Propiedad, ID_Laptop, Service_Tag) para buscarlo."""
+    return str(v).strip().upper()
+
+class _Tabla:
+    def __init__(self, nombre, path, cols):
+        self.nombre = nombre
+        self.path = path
+        self.cols = cols
+        self.df = None
+        self.originales = None    # valores leídos que el tipado no devuelve igual (ver _originales)
+        self.firma = None
+        self.token = None         # versión en disco de lo que se leyó (ver backend.token)
+        self.version = 0          # sube cada vez que cambia el DataFrame en memoria
+        self.version_claves = 0   # sube solo si pudieron cambiar las claves/posiciones
+        self.indices = {}  # columna -> {clave normalizada: [posiciones]}
+
+    def poner_df(self, df, mismas_claves=False, originales=None):
+        self.df = df
+        self.originales = originales
+        self.version += 1
+        if not mismas_claves:
+            self.version_claves += 1
+            self.indices = {}
+
+    def indice(self, col: str) -> dict:
+        idx = self.indices.get(col)
+        if idx is None:
+            idx = {}
+            vals = self.df[col]
+            if ESQUEMA.get(self.nombre, {}).get(col) != "clave":  # las claves ya vienen normalizadas
+                vals = vals.astype(str).str.strip().str.upper()
+            for pos, k in enumerate(vals):
+                idx.setdefault(k, []).append(pos)
+            self.indices[col] = idx
+        return idx
+
+class IndicePrefijos:
+    """
+    Lista ORDENADA de (identificador normalizado, texto, Num_Propiedad) sobre Num_Propiedad,
+    ID_Laptop y Service_Tag. Buscar por prefijo = bisect + recorrer solo las coincidencias.
+    """
+    COLS = ("Num_Propiedad", "ID_Laptop", "Service_Tag")
+
+    def __init__(self, entradas):
+        self._entradas = sorted(entradas)
+        self._claves = [e[0] for e in self._entradas]
+
+    @classmethod
+    def desde_inventario(cls, inv: pd.DataFrame) -> "IndicePrefijos":
+        nums = _texto(inv["Num_Propiedad"]).tolist()
+        entradas = [(_clave(n), n, n) for n in nums if n]
+        for col in cls.COLS[1:]:
+            for v, n in zip(_texto(inv[col]).tolist(), nums):
+                if v and n:
+                    entradas.append((_clave(v), f"{n}  ({v})", n))
+        return cls(entradas)
+
+    def buscar(self, prefijo: str, n: int = 15) -> list:
+        p = _clave(prefijo)
+        out, vistos = [], set()
+        i = bisect.bisect_left(self._claves, p)
+        while i < len(self._claves) and self._claves[i].startswith(p) and len(out) < n:
+            _, texto, num = self._entradas[i]
+            if num not in vistos:
+                vistos.add(num)
+                out.append((texto, num))
+            i += 1
+        return out
+
+# ------------------- Búsqueda de texto (reparaciones y préstamos) -------------------
+# Índice invertido: palabra normalizada con _normkey (sin acentos, minúsculas, sin - . / _)
+# -> posiciones de las filas que la contienen. "787-555-0101" queda "7875550101" y se
+# encuentra con o sin guiones. Se guarda en la caché local (CACHE_DIR, <registro>.idx.pkl)
+# junto a la huella de cada bloque de filas: al arrancar solo se vuelven a indexar los bloques que cambiaron
+# (lo anexado, un préstamo devuelto...). Las posiciones de más (texto que ya se editó)
+# no estorban: cada resultado se verifica contra el texto actual de la fila.
+
+TEXTO_BUSCABLE = {"mant": ["Desc_Reparacion", "tecnico"],
+                  "prest": ["Nombre", "Identificador", "Num_Tele"]}
+VERSION_INDICE_TEXTO = 1
+_RE_PALABRA = re.compile(r"[^\s,;:()\[\]{}\"'¿?¡!]+")
+
+def _palabras(texto: str) -> set:
+    return {k for k in map(_normkey, _RE_PALABRA.findall(texto)) if k}
+
+def _texto_buscable(nombre: str, df: pd.DataFrame) -> pd.Series:
+    """Texto indexable por fila: las columnas de TEXTO_BUSCABLE unidas con espacios."""
+    cols = [c for c in TEXTO_BUSCABLE[nombre] if c in df.columns]
+    if not cols:
+        return pd.Series("", index=df.index, dtype=object)
+    texto = _texto(df[cols[0]])
+    for c in cols[1:]:
+        texto = texto + " " + _texto(df[c])
+    return texto
+
+class IndiceTexto:
+    BLOQUE = 4096  # filas por huella: lo que se reindexa cuando cambia una fila
+
+    def __init__(self):
+        self.postings = {}   # palabra normalizada -> [posiciones]
+        self.bloques = []    # huella de cada bloque de BLOQUE filas
+        self.n = 0           # filas indexadas
+        self._orden = None   # palabras ordenadas (para buscar por prefijo con bisect)
+
+    @classmethod
+    def cargar(cls, path: str) -> "IndiceTexto":
+        idx = cls()
+        try:
+            with open(path, "rb") as f:
+                datos = pickle.load(f)
+            if isinstance(datos, dict) and datos.get("version") == VERSION_INDICE_TEXTO:
+                idx.postings, idx.bloques, idx.n = datos["postings"], datos["bloques"], datos["n"]
+        except Exception:
+            pass  # sin índice guardado (o dañado): se construye de cero
+        return idx
+
+    def guardar(self, path: str):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            _crear_dir_cache(path)
+            with open(tmp, "wb") as f:
+                pickle.dump({"version": VERSION_INDICE_TEXTO, "postings": self.postings,
+                             "bloques": self.bloques, "n": self.n}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except Exception:
+            _borrar(tmp)  # solo es un atajo: sin él se reconstruye al arrancar
+
+    def sumar(self, texto: pd.Series, base: int):
+        """Indexa `texto` (una fila por elemento) como las posiciones base, base+1, ..."""
+        palabras = texto.str.findall(_RE_PALABRA).explode().dropna()
+        if palabras.empty:
+            return
+        norm = {p: _normkey(p) for p in pd.unique(palabras)}  # cada palabra distinta se normaliza una vez
+        pares = pd.DataFrame({"k": palabras.map(norm).to_numpy(),
+                              "pos": palabras.index.to_numpy() - texto.index[0] + base})
+        pares = pares[pares["k"] != ""].drop_duplicates()
+        for k, pos in pares.groupby("k", sort=False)["pos"]:
+            self.postings.setdefault(k, []).extend(pos.tolist())
+        self._orden = None
+
+    def ponerse_al_dia(self, texto: pd.Series) -> int:
+        """Reindexa solo los bloques cuya huella cambió (o todo si se borraron filas). Devuelve cuántos."""
+        texto = texto.reset_index(drop=True)
+        h = pd.util.hash_pandas_object(texto, index=False).to_numpy()
+        B = self.BLOQUE
+        bloques = [hashlib.blake2b(h[i:i + B].tobytes(), digest_size=8).hexdigest() for i in range(0, len(h), B)]
+        distintos = [b for b, hb in enumerate(bloques) if b >= len(self.bloques) or self.bloques[b] != hb]
+        if len(texto) < self.n or len(distintos) > max(2, len(bloques) // 4):
+            self.postings, distintos = {}, list(range(len(bloques)))  # filas borradas o corridas: de cero
+        elif distintos:
+            viejos = set(distintos)  # fuera lo que se indexó de esos bloques antes de reindexarlos
+            self.postings = {k: q for k, lista in self.postings.items()
+                             if (q := [p for p in lista if p // B not in viejos])}
+        for b in distintos:
+            self.sumar(texto.iloc[b * B:(b + 1) * B], b * B)
+        for lista in self.postings.values() if distintos else ():
+            lista.sort()
+        self.bloques, self.n = bloques, len(texto)
+        return len(distintos)
+
+    def candidatas(self, consulta: str) -> list:
+        """Posiciones que contienen TODAS las palabras de `consulta` (cada una como prefijo), sin verificar."""
+        claves = sorted(_palabras(consulta), key=len, reverse=True)
+        if not claves:
+            return []
+        if self._orden is None:
+            self._orden = sorted(self.postings)
+        res = None
+        for k in claves:
+            pos = set()
+            i = bisect.bisect_left(self._orden, k)
+            while i < len(self._orden) and self._orden[i].startswith(k):
+                pos.update(self.postings[self._orden[i]])
+                i += 1
+            res = pos if res is None else res & pos
+            if not res:
+                return []
+        return sorted(res, reverse=True)  # lo más nuevo primero
+
+def _sincronizado(metodo):
+    """El almacén se usa desde el hilo de la GUI y desde el hilo de E/S: un candado por instancia."""
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        with self._lock:
+            return metodo(self, *args, **kwargs)
+    return envoltura
+
+def _describir_op(metodo, args) -> str:
+    """Operación para el mensaje de error, p. ej. marcar_disponible('R001', False); un DataFrame se resume."""
+    partes = [f"<DataFrame de {len(a)} filas>" if isinstance(a, pd.DataFrame) else repr(a) for a in args]
+    return f"{metodo.__name__}({', '.join(partes)})"
+
+def _mutacion(metodo):
+    """
+    Modificación del almacén que se puede REAPLICAR: queda anotada en el lote en curso (o
+    en uno propio) para repetirla sobre los datos frescos si otra estación escribió antes.
+    """
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        with self._lock:
+            if self._lote is not None:
+                res = metodo(self, *args, **kwargs)
+                if res:  # lo que no cambió nada no se reaplica
+                    self._ops.append((metodo, args, kwargs))
+                return res
+            with self.lote():
+                res = metodo(self, *args, **kwargs)
+                if res:
+                    self._ops.append((metodo, args, kwargs))
+            return res and self._ok_lote
+    return envoltura
+
+def _stats_vacias() -> dict:
+    return {"mantenimientos": 0, "reparaciones": 0, "prestamos": 0, "ultimo_servicio": pd.NaT}
+
+def _stats_de(mant: pd.DataFrame, prest: pd.DataFrame) -> dict:
+    """Num_Propiedad -> conteos y último servicio de esas filas (un groupby por tabla)."""
+    stats = {}
+    if not mant.empty:
+        tipo = _texto(mant["Tipo"])
+        g = pd.DataFrame({
+            "k": mant["Num_Propiedad"],
+            "m": tipo == "Mantenimiento", "r": tipo == "Reparación",
+            "d": fechas_columna(mant["Dia"], "mant.Dia")[0],
+        }).groupby("k", sort=False).agg(m=("m", "sum"), r=("r", "sum"), d=("d", "max"))
+        for k, m, r, d in g.itertuples(name=None):
+            e = stats.setdefault(k, _stats_vacias())
+            e.update(mantenimientos=int(m), reparaciones=int(r), ultimo_servicio=d)
+    if not prest.empty:
+        g = prest["Num_Propiedad"].value_counts(sort=False)
+        for k, n in g.items():
+            stats.setdefault(k, _stats_vacias())["prestamos"] = int(n)
+    return stats
+
+def _abiertas(nombre: str, df: pd.DataFrame) -> pd.Series:
+    """
+    Filas pendientes de cerrar:
+    - prest: préstamo sin Dia_Entr (vacío, o NaT/nan escrito como texto).
+    - mant: reparación sin Dia, o con la columna de 'esperando pieza' en "X" (si existe).
+    """
+    if nombre == "prest":
+        dia_entr = df["Dia_Entr"]
+        return dia_entr.isna() | dia_entr.astype(str).str.strip().isin(["", "NaT", "nan"])
+    es_rep = _texto(df["Tipo"]).str.lower() == "reparación"
+    pendiente = _texto(df["Dia"]) == ""
+    flag = _find_pending_flag_col(df)
+    if flag:
+        pendiente |= _texto(df[flag]).str.upper() == "X"
+    return es_rep & pendiente
+
+# ------------------- Archivo histórico por año (mant / prest) -------------------
+# Los préstamos devueltos y los mantenimientos/reparaciones terminados anteriores a un corte
+# se mueven a un libro por año en la carpeta "archivo" (mismos encabezados exactos): los
+# registros de siempre quedan solo con lo reciente y lo abierto. Los conteos por máquina de
+# lo archivado se guardan precalculados en archivo/resumen.json, así el resumen de una
+# máquina (Buscar, Decomisar) los incluye sin abrir nunca los libros archivados.
+
+ARCHIVAR_MESES = 12  # corte por defecto: lo cerrado hace más de un año
+ARCHIVABLES = {"mant": "Dia", "prest": "Dia_Pres"}  # tabla -> fecha que decide el año
+
+def _dir_archivo(path: str) -> str:
+    return os.path.join(os.path.dirname(path), "archivo")
+
+def ruta_archivo(path: str, anio: int) -> str:
+    """'Registro_Prestamos_Laptop.xlsx', 2023 -> 'archivo/Registro_Prestamos_Laptop_2023.xlsx'."""
+    base, ext = os.path.splitext(os.path.basename(path))
+    return os.path.join(_dir_archivo(path), f"{base}_{anio}{ext}")
+
+def libros_archivo(path: str) -> list:
+    """[(año, ruta)] de los libros archivados del registro `path`, del más viejo al más nuevo."""
+    base, ext = os.path.splitext(os.path.basename(path))
+    patron = re.compile(re.escape(base) + r"_(\d{4})" + re.escape(ext) + "$")
+    carpeta = _dir_archivo(path)
+    try:
+        nombres = os.listdir(carpeta)
+    except OSError:
+        return []
+    libros = []
+    for nombre in nombres:
+        m = patron.match(nombre)
+        if m:
+            libros.append((int(m.group(1)), os.path.join(carpeta, nombre)))
+    return sorted(libros)
+
+def _leer_resumen_archivo(path: str) -> dict:
+    """{"maquinas": {Num_Propiedad: conteos}, "anios": {tabla: {año: filas}}}; vacío si no hay archivo."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            datos = json.load(f)
+        if isinstance(datos, dict) and isinstance(datos.get("maquinas"), dict):
+            datos.setdefault("anios", {})
+            return datos
+    except (OSError, ValueError):
+        pass
+    return {"maquinas": {}, "anios": {}}
+
+def _resumen_sumar(maquinas: dict, stats: dict):
+    """Suma al resumen (formato JSON) los conteos de `stats` (formato _stats_de)."""
+    for k, e in stats.items():
+        a = maquinas.setdefault(k, {"mantenimientos": 0, "reparaciones": 0, "prestamos": 0,
+                                    "ultimo_servicio": ""})
+        for c in ("mantenimientos", "reparaciones", "prestamos"):
+            a[c] += e[c]
+        d = e["ultimo_servicio"]
+        if not pd.isna(d) and d.strftime("%Y-%m-%d") > a["ultimo_servicio"]:
+            a["ultimo_servicio"] = d.strftime("%Y-%m-%d")
+
+def _stats_con_archivo(e: dict, a: dict | None):
+    """Agrega a las estadísticas `e` de una máquina lo que tiene archivado (`a`, del resumen)."""
+    if not a:
+        return
+    for c in ("mantenimientos", "reparaciones", "prestamos"):
+        e[c] += int(a.get(c, 0))
+    d = pd.Timestamp(a["ultimo_servicio"]) if a.get("ultimo_servicio") else pd.NaT
+    if not pd.isna(d) and (pd.isna(e["ultimo_servicio"]) or d > e["ultimo_servicio"]):
+        e["ultimo_servicio"] = d
+
+def _escribir_json_tmp(datos, path: str) -> str:
+    tmp = _ruta_tmp(path)
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp
+
+def diferencias(viejo: pd.DataFrame, nuevo: pd.DataFrame, clave: str = "Num_Propiedad"):
+    """
+    Diferencias fila a fila entre dos versiones de una tabla, alineadas por `clave`:
+    (altas, bajas, cambiadas) como listas de claves. None si alguna versión repite claves
+    (no se pueden alinear: hay que redibujar completo).
+    """
+    if viejo[clave].duplicated().any() or nuevo[clave].duplicated().any():
+        return None
+    a = _a_registro(viejo).set_index(clave)
+    b = _a_registro(nuevo).set_index(clave)
+    altas, bajas = b.index.difference(a.index), a.index.difference(b.index)
+    comunes = a.index.intersection(b.index)
+    a = a.loc[comunes].astype(str)
+    b = b.loc[comunes, a.columns].astype(str)
+    cambiadas = comunes[(a != b).any(axis=1).to_numpy()]
+    return altas.tolist(), bajas.tolist(), cambiadas.tolist()
+
+class AlmacenDatos:
+    """
+    Dueño único de las cuatro tablas (inventario, mantenimientos, préstamos y decomisados).
+    - Cada tabla se lee UNA vez y se sirve desde memoria.
+    - Solo se vuelve a leer si cambió en disco (firma del backend), p. ej. desde otra PC.
+    - Los DataFrames devueltos son compartidos: NO modificarlos; usar .copy() y guardar().
+    - Es seguro entre hilos (RLock): la GUI consulta mientras el hilo de E/S guarda.
+    - Dentro de `with almacen.lote():` cada tabla tocada se escribe UNA vez al salir, y
+      todas juntas (diario / transacción): un préstamo no puede quedar a medias.
+    - Varias estaciones: se escribe con el candado del backend y solo si el archivo sigue
+      en la versión que se leyó (token); si no, se relee y se reaplican las modificaciones.
+      guardar() (tabla completa) no se reaplica: ante un conflicto falla y no se escribe nada.
+    """
+    def __init__(self, tablas=None, backend=None):
+        tablas = tablas or TABLAS
+        self.backend = backend or BackendExcel()
+        self._lock = threading.RLock()
+        self._tablas = {nombre: _Tabla(nombre, path, cols) for nombre, (path, cols) in tablas.items()}
+        self._disponibles, self._prestadas, self._flota_ver = set(), set(), None
+        self._n_disp = 0  # FILAS marcadas Disponible (los conjuntos de arriba son de claves)
+        self._stats, self._stats_ver = {}, None
+        # nombre ("mant"/"prest") -> {Num_Propiedad: [posiciones abiertas]} y su versión
+        self._abiertos, self._abiertos_ver = {"mant": {}, "prest": {}}, {"mant": None, "prest": None}
+        self._prefijos, self._prefijos_ver = None, None
+        self._texto, self._texto_ver = {}, {}  # nombre -> IndiceTexto y la versión a la que está al día
+        self._archivado, self._archivado_firma = {}, None  # resumen.json del archivo histórico
+        self._lote = None  # nombre -> filas anexadas (o None = reescribir) mientras hay un lote abierto
+        self._ops = []     # modificaciones del lote abierto: (método, args, kwargs) para reaplicarlas
+        self._ok_lote = True
+        self._reaplicando = False  # _reaplicar en curso: guardar() no pisa lo de otra estación
+        if hasattr(self.backend, "preparar"):
+            for t in self._tablas.values():
+                self.backend.preparar(t.nombre, t.cols)
+        if hasattr(self.backend, "recuperar"):
+            self.backend.recuperar(list(self._tablas.values()))
+
+    def nombres(self) -> list:
+        return list(self._tablas)
+
+    def path(self, nombre: str) -> str:
+        return self._tablas[nombre].path
+
+    def cols(self, nombre: str) -> list:
+        return self._tablas[nombre].cols
+
+    @_sincronizado
+    def tabla(self, nombre: str) -> pd.DataFrame:
+        t = self._tablas[nombre]
+        if self._lote is not None and nombre in self._lote:
+            return t.df  # cambios aún sin escribir: la memoria manda
+        firma = self.backend.firma(t)
+        if t.df is None or firma != t.firma:
+            # token ANTES de leer: si el archivo cambia mientras se lee, al escribir se nota el conflicto
+            t.token = self.backend.token(t)
+            with osi_perf.medir(f"cargar:{nombre}") as m:
+                df, originales = self.backend.cargar(t)
+                t.poner_df(df, originales=originales)
+                m.filas = len(t.df)
+            t.firma = firma
+        return t.df
+
+    @_sincronizado
+    def al_dia(self, nombres=None) -> bool:
+        """¿Las tablas (todas por defecto) están en memoria y sin cambios en disco? Consultarlas no las relee."""
+        for n in nombres or self._tablas:
+            t = self._tablas[n]
+            if t.df is None or not (self._lote is not None and n in self._lote) and self.backend.firma(t) != t.firma:
+                return False
+        return True
+
+    @_sincronizado
+    def poner_al_dia(self, nombres=None):
+        """Lee las tablas (todas por defecto) que faltan o que cambiaron en disco (para el hilo de E/S)."""
+        for n in nombres or self._tablas:
+            self.tabla(n)
+
+    @property
+    def ok_lote(self) -> bool:
+        """¿Se guardó el último lote? False si falló la escritura, el candado o la reaplicación."""
+        return self._ok_lote
+
+    @_sincronizado
+    def version(self, nombre: str) -> int:
+        """Versión de la tabla en memoria (para cachés derivadas: vistas, contadores...)."""
+        self.tabla(nombre)
+        return self._tablas[nombre].version
+
+    # --------- escritura ---------
+    def _escribir(self, cambios: dict, extra=()) -> bool:
+        """
+        cambios: nombre -> filas anexadas (o None). Escribe lo que ya está en memoria.
+        extra: otros temporales a confirmar junto con las tablas (solo BackendExcel).
+        """
+        lista = [(self._tablas[n], self._tablas[n].df, anexadas) for n, anexadas in cambios.items()]
+        filas = sum(len(anexadas) if anexadas else len(df) for _, df, anexadas in lista)
+        with osi_perf.medir("escribir:" + "+".join(cambios), filas=filas) as m:
+            ok = self.backend.escribir(lista, extra) if extra else self.backend.escribir(lista)
+            if ok and self.backend.nombre == "excel":
+                m.bytes = sum(osi_perf.tamano(t.path) or 0 for t, _, _ in lista)
+        for t, _, _ in lista:
+            if ok:
+                t.firma = self.backend.firma(t)
+                t.token = self.backend.token(t)
+            else:
+                t.poner_df(None)  # estado incierto: releer en el próximo acceso
+                t.firma = None
+        return ok
+
+    def _confirmar(self, cambios: dict, ops: list) -> bool:
+        """
+        Escribe `cambios` con el candado tomado. Si otra estación cambió alguna de esas tablas
+        desde que se leyó, se releen y se reaplican `ops` (sin soltar el candado) antes de escribir.
+        """
+        try:
+            with self.backend.bloqueo():
+                movidas = [n for n in cambios if self.backend.token(self._tablas[n]) != self._tablas[n].token]
+                if movidas and ops:
+                    cambios = self._reaplicar(cambios, ops, movidas)
+                    if cambios is None:
+                        return False
+                return self._escribir(cambios) if cambios else True
+        except TimeoutError as e:
+            for n in cambios:
+                self.invalidar(n)
+            mostrar_error("Error", f"No se pudo guardar: {e}\nIntenta de nuevo en unos segundos.")
+            return False
+
+    def _reaplicar(self, cambios: dict, ops: list, movidas: list) -> dict | None:
+        """
+        Repite `ops` sobre lo que hay en disco; cada método vuelve a comprobar sus condiciones
+        (máquina ya prestada, Num_Propiedad repetido...). Si alguna falla no se guarda NADA
+        del lote (None): medio préstamo es peor que ninguno.
+        """
+        for n in cambios:
+            self.invalidar(n)  # lo de memoria ya incluye lo nuestro: partir de lo que hay en disco
+        self._lote, self._ops, self._reaplicando = {}, [], True
+        fallidas = []
+        try:
+            for metodo, args, kwargs in ops:
+                if not metodo(self, *args, **kwargs):
+                    fallidas.append(_describir_op(metodo, args))
+        finally:
+            nuevos, self._lote, self._ops, self._reaplicando = self._lote, None, [], False
+        if fallidas:
+            for n in set(cambios) | set(nuevos):
+                self.invalidar(n)
+            mostrar_error("Error", f"Otra estación modificó {', '.join(movidas)} mientras tanto.\n"
+                                   f"No se guardó nada; ya no se pudo aplicar:\n" + "\n".join(fallidas))
+            return None
+        return nuevos
+
+    def _pendiente(self, t: _Tabla, anexadas: list | None = None) -> bool:
+        """`t` ya cambió en memoria: dentro de un lote se anota para el final; si no, se escribe ya."""
+        if self._lote is None:
+            return self._confirmar({t.nombre: anexadas}, [])
+        previas = self._lote.get(t.nombre, [])
+        self._lote[t.nombre] = previas + anexadas if (previas is not None and anexadas is not None) else None
+        return True
+
+    @contextmanager
+    def lote(self):
+        """
+        Agrupa varias modificaciones en UNA escritura por archivo, confirmadas juntas.
+        Si el bloque lanza una excepción no se escribe nada y las tablas tocadas se releen.
+        """
+        with self._lock:
+            if self._lote is not None:  # lote anidado: lo confirma el de afuera
+                yield
+                return
+            self._lote, self._ops, self._ok_lote = {}, [], True
+            try:
+                yield
+            except BaseException:
+                cambios, self._lote, self._ops = self._lote, None, []
+                for n in cambios:
+                    self.invalidar(n)
+                raise
+            cambios, ops = self._lote, self._ops
+            self._lote, self._ops = None, []
+            if cambios:
+                self._ok_lote = self._confirmar(cambios, ops)
+
+    def _guardar(self, t: _Tabla, df: pd.DataFrame, mismas_claves=False, originales=None, editadas=None) -> bool:
+        """
+        Deja `df` como la tabla y la anota para escribir completa.
+        originales: los de las filas de `df` (None: todo se escribe con el valor tipado).
+        editadas: (posiciones, {columna: valor puesto}): esas celdas se escriben como se pusieron.
+        """
+        out = _tipar(df.reindex(columns=t.cols, fill_value="").reset_index(drop=True), t.nombre)
+        if editadas:
+            originales = _originales_editar(originales, out, *editadas, t.nombre, self.backend.fechas_texto)
+        # mismas_claves: el llamador garantiza que índices y posiciones siguen valiendo
+        t.poner_df(out, mismas_claves, originales)
+        return self._pendiente(t)
+
+    @_mutacion
+    def guardar(self, nombre: str, df: pd.DataFrame) -> bool:
+        """
+        Reescribe la tabla completa y deja `df` como la versión en memoria. Si otra estación
+        escribió desde que se leyó, NO se reaplica (`df` pisaría sus cambios): devuelve False,
+        no se guarda nada del lote y la tabla queda releída para volver a intentarlo.
+        """
+        if self._reaplicando:
+            return False
+        t = self._tablas[nombre]
+        if t.df is None and t.token is None:
+            self.tabla(nombre)  # nunca se leyó: `df` no viene de una versión vieja, la base es la actual
+        return self._guardar(t, df)
+
+    def _anexar_memoria(self, t: _Tabla, nuevas: pd.DataFrame, crudas: pd.DataFrame):
+        """
+        Concatena filas nuevas (ya tipadas) manteniendo los índices por clave (sin reconstruirlos).
+        `crudas`: esas filas tal como se escriben (sus originales).
+        """
+        base = len(t.df)
+        indices = t.indices
+        originales = _originales_juntar([(t.originales, base),
+                                         (_originales(crudas, nuevas, t.nombre, self.backend.fechas_texto), len(nuevas))])
+        # category + category con otras categorías da object: _tipar la vuelve a convertir
+        t.poner_df(_tipar(pd.concat([t.df, nuevas], ignore_index=True), t.nombre), originales=originales)
+        for col, idx in indices.items():
+            for pos, v in enumerate(nuevas[col].tolist(), start=base):
+                idx.setdefault(_clave(v), []).append(pos)
+        t.indices = indices
+
+    def _admite(self, nombre: str, nums: list) -> bool:
+        """
+        Condiciones de una fila nueva, comprobadas contra lo cargado (también al reaplicar sobre
+        lo que escribió otra estación): inventario y decomisados no repiten Num_Propiedad y no
+        se presta una máquina ya prestada o con un préstamo sin devolver.
+        """
+        claves = [_clave(v) for v in nums]
+        if nombre in ("inv", "dec"):
+            existentes = self._tablas[nombre].indice("Num_Propiedad")
+            return len(set(claves)) == len(claves) and not any(k in existentes for k in claves)
+        if nombre == "prest":
+            abiertos = self._abiertos_de("prest")
+            inv = self._tablas["inv"]
+            self.tabla("inv")
+            return not any(k in abiertos or (inv.indice("Num_Propiedad").get(k) and not self.disponible(k))
+                           for k in claves)
+        return True
+
+    @_mutacion
+    def agregar(self, nombre: str, fila: dict) -> bool:
+        """
+        Registra una fila NUEVA anexándola (sin reescribir el historial).
+        Si el backend no admite anexar (archivo inexistente, encabezados distintos), reescribe completo.
+        """
+        t = self._tablas[nombre]
+        self.tabla(nombre)
+        if not self._admite(nombre, [fila.get("Num_Propiedad", "")]):
+            return False
+        flota_ok = nombre == "inv" and self._flota_ver == t.version
+        stats_ok = nombre in ("mant", "prest") and self._stats_al_dia()
+        abiertos_ok = nombre in self._abiertos and self._abiertos_ver[nombre] == t.version
+        texto_ok = self._texto_ver.get(nombre) == t.version
+        fila = {c: fila.get(c, "") for c in t.cols}
+        cruda = pd.DataFrame([fila])
+        nuevas = _tipar(cruda, nombre)
+        base = len(t.df)
+        self._anexar_memoria(t, nuevas, cruda)
+        if flota_ok:
+            self._flota_sumar([fila])
+        if stats_ok:
+            self._stats_sumar(nombre, [fila])
+        if abiertos_ok:
+            self._abiertos_sumar(t, nuevas, base)
+        if texto_ok:
+            self._texto_sumar(t, nuevas, base)
+        return self._pendiente(t, [fila])
+
+    @_mutacion
+    def agregar_lote(self, nombre: str, nuevas: pd.DataFrame) -> bool:
+        """Añade varias filas con UNA sola escritura (importación por lote)."""
+        t = self._tablas[nombre]
+        self.tabla(nombre)
+        if "Num_Propiedad" in nuevas.columns and not self._admite(nombre, nuevas["Num_Propiedad"].tolist()):
+            return False
+        flota_ok = nombre == "inv" and self._flota_ver == t.version
+        stats_ok = nombre in ("mant", "prest") and self._stats_al_dia()
+        abiertos_ok = nombre in self._abiertos and self._abiertos_ver[nombre] == t.version
+        texto_ok = self._texto_ver.get(nombre) == t.version
+        nuevas = nuevas.reindex(columns=t.cols).reset_index(drop=True)
+        crudas = _a_registro(nuevas)
+        filas = crudas.to_dict("records")  # tal como van al archivo
+        nuevas = _tipar(nuevas, nombre)
+        base = len(t.df)
+        self._anexar_memoria(t, nuevas, crudas)
+        if flota_ok:
+            self._flota_sumar(filas)
+        if stats_ok:
+            self._stats_sumar(nombre, filas)
+        if abiertos_ok:
+            self._abiertos_sumar(t, nuevas, base)
+        if texto_ok:
+            self._texto_sumar(t, nuevas, base)
+        return self._pendiente(t, filas)
+
+    @_mutacion
+    def quitar(self, nombre: str, valor, col: str = "Num_Propiedad") -> bool:
+        """Elimina (reescribiendo) las filas cuya `col` coincide con `valor`."""
+        t = self._tablas[nombre]
+        df = self.tabla(nombre)
+        pos = self.posiciones(nombre, valor, col)
+        flota_ok = nombre == "inv" and self._flota_ver == t.version
+        if flota_ok:
+            n_disp = int(_marcadas(df["Disponible"].iloc[pos]).sum())
+        originales = None if t.originales is None else t.originales.drop(t.originales.index[pos])
+        if not self._guardar(t, df.drop(df.index[pos]), originales=originales):
+            return False
+        if flota_ok:
+            k = _clave(valor)
+            self._disponibles.discard(k); self._prestadas.discard(k)
+            self._n_disp -= n_disp
+            self._flota_ver = t.version
+        return True
+
+    @_mutacion
+    def marcar_disponible(self, num: str, disponible: bool) -> bool:
+        """Préstamo / devolución: cambia la columna Disponible ("X" o vacío) de una máquina."""
+        t = self._tablas["inv"]
+        df = self.tabla("inv")
+        pos = self.posiciones("inv", num)
+        if not pos:
+            return False
+        if not disponible and (not _marcadas(df["Disponible"].iloc[pos]).any() or self._prestamo_ajeno(num)):
+            return False  # ya prestada (p. ej. por otra estación mientras tanto)
+        flota_ok = self._flota_ver == t.version
+        n_disp = int(_marcadas(df["Disponible"].iloc[pos]).sum())
+        nuevo = df.copy()
+        marca = disponible if pd.api.types.is_bool_dtype(df["Disponible"]) else ("X" if disponible else "")
+        nuevo.iloc[pos, nuevo.columns.get_loc("Disponible")] = marca
+        if not self._guardar(t, nuevo, mismas_claves=True, originales=t.originales,
+                             editadas=(pos, {"Disponible": "X" if disponible else ""})):
+            return False
+        if flota_ok:
+            k = _clave(num)
+            (self._disponibles if disponible else self._prestadas).add(k)
+            (self._prestadas if disponible else self._disponibles).discard(k)
+            self._n_disp += (len(pos) if disponible else 0) - n_disp
+            self._flota_ver = t.version
+        return True
+
+    def _prestamo_ajeno(self, num: str) -> bool:
+        """¿`num` tiene un préstamo sin devolver que no es uno registrado en el lote en curso?"""
+        abiertos = len(self._abiertos_de("prest").get(_clave(num), []))
+        propias = (self._lote or {}).get("prest") or []
+        return abiertos > sum(1 for f in propias if _clave(f.get("Num_Propiedad", "")) == _clave(num))
+
+    @_sincronizado
+    def cambiadas_en_disco(self) -> list:
+        """Tablas ya cargadas cuyo archivo cambió desde la última lectura/escritura (otra estación)."""
+        return [n for n, t in self._tablas.items()
+                if t.df is not None and not (self._lote is not None and n in self._lote)
+                and self.backend.firma(t) != t.firma]
+
+    @_sincronizado
+    def invalidar(self, nombre: str | None = None):
+        """Fuerza la relectura de una tabla (o de todas) en el próximo acceso."""
+        for n in ([nombre] if nombre else list(self._tablas)):
+            self._tablas[n].poner_df(None)
+            self._tablas[n].firma = None
+
+    # --------- contadores de flota (Total / Prestadas / Disponibles) ---------
+    # Se mantienen al prestar, devolver, añadir, importar y decomisar; solo se
+    # recalculan completos si la tabla cambió por otra vía (p. ej. desde otra PC).
+    # Los números cuentan FILAS, como siempre (repetidas o sin Num_Propiedad incluidas);
+    # los conjuntos de claves sirven para preguntar por una máquina y para los filtros.
+    def _flota(self):
+        t = self._tablas["inv"]
+        df = self.tabla("inv")
+        if self._flota_ver != t.version:
+            claves = df["Num_Propiedad"].tolist()
+            disp = _marcadas(df["Disponible"]).tolist()
+            self._disponibles = {k for k, d in zip(claves, disp) if d}
+            self._prestadas = {k for k, d in zip(claves, disp) if not d}
+            self._n_disp = sum(disp)
+            self._flota_ver = t.version
+        return self._disponibles, self._prestadas
+
+    def _flota_sumar(self, filas):
+        for f in filas:
+            k = _clave(f.get("Num_Propiedad", ""))
+            if _clave(f.get("Disponible", "")) == "X":
+                self._disponibles.add(k)
+                self._n_disp += 1
+            else:
+                self._prestadas.add(k)
+        self._flota_ver = self._tablas["inv"].version
+
+    @_sincronizado
+    def contadores(self):
+        """(total, prestadas, disponibles) del inventario, en filas (total = len del inventario)."""
+        self._flota()
+        total = len(self._tablas["inv"].df)
+        return total, total - self._n_disp, self._n_disp
+
+    @_sincronizado
+    def disponible(self, num: str) -> bool:
+        """¿La máquina está marcada Disponible ("X")? (sin copiar el conjunto)"""
+        return _clave(num) in self._flota()[0]
+
+    @_sincronizado
+    def disponibles(self) -> set:
+        """Num_Propiedad (normalizados) disponibles (copia: el original cambia desde el hilo de E/S)."""
+        return set(self._flota()[0])
+
+    @_sincronizado
+    def prestadas(self) -> set:
+        """Num_Propiedad (normalizados) prestadas (copia)."""
+        return set(self._flota()[1])
+
+    # --------- estadísticas por máquina ---------
+    # Conteos de mantenimientos/reparaciones/préstamos, último servicio y pendientes por
+    # Num_Propiedad: un groupby al cargar y luego se suman los registros nuevos uno a uno.
+    # Cualquier reescritura de mant/prest (finalizar, devolver, otra PC) -> se recalcula.
+    def _stats_al_dia(self) -> bool:
+        return self._stats_ver == (self._tablas["mant"].version, self._tablas["prest"].version)
+
+    def _estadisticas(self) -> dict:
+        mant, prest = self.tabla("mant"), self.tabla("prest")
+        if self._stats_al_dia():
+            return self._stats
+        stats = _stats_de(mant, prest)
+        self._stats = stats
+        self._stats_ver = (self._tablas["mant"].version, self._tablas["prest"].version)
+        return stats
+
+    def _stats_sumar(self, nombre: str, filas):
+        for f in filas:
+            e = self._stats.setdefault(_clave(f.get("Num_Propiedad", "")), _stats_vacias())
+            if nombre == "prest":
+                e["prestamos"] += 1
+                continue
+            tipo = str(f.get("Tipo", "")).strip()
+            if tipo == "Mantenimiento":
+                e["mantenimientos"] += 1
+            elif tipo == "Reparación":
+                e["reparaciones"] += 1
+            self._stats_servicio(e, f.get("Dia"))
+        self._stats_ver = (self._tablas["mant"].version, self._tablas["prest"].version)
+
+    @staticmethod
+    def _stats_servicio(e: dict, dia):
+        dia = fechas_columna(pd.Series([dia], dtype=object), "mant.Dia")[0][0]
+        if not pd.isna(dia) and (pd.isna(e["ultimo_servicio"]) or dia > e["ultimo_servicio"]):
+            e["ultimo_servicio"] = dia
+
+    @_sincronizado
+    def estadisticas(self, num: str) -> dict:
+        """
+        Resumen de una máquina: mantenimientos, reparaciones, prestamos (conteos, incluido
+        el archivo histórico), ultimo_servicio (Timestamp o NaT), prestamo_abierto y reparacion_abierta.
+        """
+        k = _clave(num)
+        e = dict(self._estadisticas().get(k) or _stats_vacias())
+        _stats_con_archivo(e, self._resumen_archivo().get(k))
+        e["prestamo_abierto"] = k in self._abiertos_de("prest")
+        e["reparacion_abierta"] = k in self._abiertos_de("mant")
+        return e
+
+    # --------- archivo histórico por año ---------
+    def _ruta_resumen(self) -> str:
+        return os.path.join(_dir_archivo(self._tablas["mant"].path), "resumen.json")
+
+    def _resumen_archivo(self) -> dict:
+        """Num_Propiedad -> conteos archivados; resumen.json se relee solo si cambió (otra estación)."""
+        if "mant" not in self._tablas:
+            return {}
+        path = self._ruta_resumen()
+        firma = _firma(path)
+        if firma != self._archivado_firma:
+            self._archivado = _leer_resumen_archivo(path)["maquinas"]
+            self._archivado_firma = firma
+        return self._archivado
+
+    @_sincronizado
+    def archivar(self, corte, simular: bool = False) -> dict | None:
+        """
+        Mueve al libro de su año los préstamos devueltos y los mantenimientos/reparaciones
+        terminados con fecha anterior a `corte`. Libros del año, registros y resumen.json se
+        confirman juntos (diario). Devuelve {tabla: {año: filas}} (con simular=True solo lo
+        calcula); None si no se pudo escribir.
+        """
+        if self.backend.nombre != "excel":
+            mostrar_error("Archivo", "El archivo por año es para los registros .xlsx: con SQLite no hace falta.")
+            return None
+        corte = pd.Timestamp(corte).normalize()
+        try:
+            with self.backend.bloqueo():
+                for n in ARCHIVABLES:
+                    self.invalidar(n)  # con el candado: partir de lo que hay en disco ahora
+                mover, informe = {}, {}
+                for n, col in ARCHIVABLES.items():
+                    df = self.tabla(n)
+                    fechas = fechas_columna(df[col], f"{n}.{col}")[0]
+                    sel = (~_abiertas(n, df) & fechas.notna() & (fechas < corte)).to_numpy()
+                    if sel.any():
+                        anios = fechas.dt.year.to_numpy()[sel].astype(int)
+                        mover[n] = (df, sel, anios)
+                        informe[n] = {int(a): int(c) for a, c in pd.Series(anios).value_counts().sort_index().items()}
+                if simular or not mover:
+                    return informe
+                return informe if self._archivar(mover) else None
+        except TimeoutError as e:
+            mostrar_error("Error", f"No se pudo archivar: {e}\nIntenta de nuevo en unos segundos.")
+            return None
+
+    def _archivar(self, mover: dict) -> bool:
+        """Escribe los temporales del archivo y confirma todo junto con los registros recortados."""
+        pares = []
+        ruta_resumen = self._ruta_resumen()
+        resumen = _leer_resumen_archivo(ruta_resumen)
+        try:
+            os.makedirs(os.path.dirname(ruta_resumen), exist_ok=True)
+            for n, (df, sel, anios) in mover.items():
+                t = self._tablas[n]
+                viejas = df[sel].reset_index(drop=True)
+                originales = None if t.originales is None else t.originales[sel].reset_index(drop=True)
+                for anio, grupo in viejas.groupby(anios, sort=True):
+                    destino = ruta_archivo(t.path, anio)
+                    og = None if originales is None else originales.iloc[grupo.index].reset_index(drop=True)
+                    grupo = grupo.reset_index(drop=True)
+                    tmp = _append_xlsx_tmp(destino, t.cols, _a_registro(grupo, originales=og).to_dict("records"))
+                    if tmp is None:
+                        # libro nuevo, o con otra forma: se escribe completo (lo previo + lo nuevo)
+                        completo = grupo
+                        if os.path.exists(destino):
+                            crudo = _read_xlsx(destino, t.cols)
+                            previo = _tipar(crudo, n)
+                            completo = pd.concat([previo, grupo], ignore_index=True)
+                            og = _originales_juntar([(_originales(crudo, previo, n, BackendExcel.fechas_texto), len(previo)),
+                                                     (og, len(grupo))])
+                        tmp = _escribir_xlsx_tmp(completo, destino, t.cols, og)
+                    if tmp is None:
+                        raise OSError(f"No se pudo escribir {destino}")
+                    pares.append((tmp, destino))
+                    cuenta = resumen["anios"].setdefault(n, {})
+                    cuenta[str(anio)] = cuenta.get(str(anio), 0) + len(grupo)
+            vacia = {n: self._tablas[n].df.iloc[:0] for n in ARCHIVABLES}
+            movidas = {n: df[sel] for n, (df, sel, _) in mover.items()}
+            _resumen_sumar(resumen["maquinas"], _stats_de(movidas.get("mant", vacia["mant"]),
+                                                           movidas.get("prest", vacia["prest"])))
+            pares.append((_escribir_json_tmp(resumen, ruta_resumen), ruta_resumen))
+        except Exception as e:
+            for tmp, _ in pares:
+                _borrar(tmp)
+            mostrar_error("Error", f"No se pudo archivar:\n{e}")
+            return False
+        for n, (df, sel, _) in mover.items():
+            t = self._tablas[n]
+            t.poner_df(df[~sel].reset_index(drop=True),
+                       originales=None if t.originales is None else t.originales[~sel].reset_index(drop=True))
+        return self._escribir({n: None for n in mover}, extra=pares)
+
+    # --------- pendientes: préstamos sin devolver / reparaciones sin finalizar ---------
+    # Num_Propiedad -> posiciones de sus filas abiertas. Se construye una vez por versión
+    # y luego se mantiene al registrar, prestar, devolver y finalizar: abrir una ventana o
+    # cerrar un pendiente no recorre el historial.
+    def _abiertos_de(self, nombre: str) -> dict:
+        t = self._tablas[nombre]
+        df = self.tabla(nombre)
+        if self._abiertos_ver[nombre] != t.version:
+            self._abiertos[nombre] = {}
+            self._abiertos_ver[nombre] = t.version
+            if not df.empty:
+                self._abiertos_sumar(t, df, 0)
+        return self._abiertos[nombre]
+
+    def _abiertos_sumar(self, t: _Tabla, filas: pd.DataFrame, base: int):
+        abiertas = _abiertas(t.nombre, filas).to_numpy().nonzero()[0]
+        claves = filas["Num_Propiedad"].to_numpy()[abiertas]
+        mapa = self._abiertos[t.nombre]
+        for k, pos in zip(claves.tolist(), (abiertas + base).tolist()):
+            mapa.setdefault(k, []).append(pos)
+        self._abiertos_ver[t.nombre] = t.version
+
+    def _cerrar(self, nombre: str, num: str, valores: dict) -> bool:
+        """Escribe `valores` en la fila abierta más reciente de `num` y la quita de los pendientes."""
+        t = self._tablas[nombre]
+        k = _clave(num)
+        abiertas = self._abiertos_de(nombre).get(k)
+        if not abiertas:
+            return False
+        stats_ok = self._stats_al_dia()
+        texto_ok = self._texto_ver.get(nombre) == t.version
+        pos = abiertas[-1]
+        nuevo = t.df.copy()
+        for col, v in valores.items():
+            if col in nuevo.columns:
+                nuevo[col] = nuevo[col].astype(object)
+                nuevo.iat[pos, nuevo.columns.get_loc(col)] = v
+        if not self._guardar(t, nuevo, mismas_claves=True, originales=t.originales, editadas=([pos], valores)):
+            return False
+        abiertas.pop()
+        if not abiertas:
+            del self._abiertos[nombre][k]
+        self._abiertos_ver[nombre] = t.version
+        if texto_ok:
+            self._texto_sumar(t, t.df.iloc[pos:pos + 1], pos)  # la descripción final ya se encuentra
+        if stats_ok:
+            if "Dia" in valores:
+                self._stats_servicio(self._stats.setdefault(k, _stats_vacias()), valores["Dia"])
+            self._stats_ver = (self._tablas["mant"].version, self._tablas["prest"].version)
+        return True
+
+    @_sincronizado
+    def prestamo_abierto(self, num: str):
+        """Posición (iloc en tabla("prest")) del préstamo sin devolver de `num`, o None."""
+        abiertas = self._abiertos_de("prest").get(_clave(num))
+        return abiertas[-1] if abiertas else None
+
+    @_sincronizado
+    def reparacion_abierta(self, num: str):
+        """Posición (iloc en tabla("mant")) de la reparación pendiente de `num`, o None."""
+        abiertas = self._abiertos_de("mant").get(_clave(num))
+        return abiertas[-1] if abiertas else None
+
+    @_mutacion
+    def cerrar_prestamo(self, num: str, dia_entr: str) -> bool:
+        """Devolución: pone Dia_Entr al préstamo abierto de `num`. False si no había ninguno."""
+        return self._cerrar("prest", num, {"Dia_Entr": dia_entr})
+
+    @_mutacion
+    def finalizar_reparacion(self, num: str, tecnico: str, desc: str, dia: str) -> bool:
+        """Cierra la reparación pendiente de `num` (técnico, descripción final y fecha)."""
+        valores = {"Desc_Reparacion": desc, "tecnico": tecnico, "Dia": dia}
+        flag = _find_pending_flag_col(self.tabla("mant"))
+        if flag:
+            valores[flag] = ""
+        return self._cerrar("mant", num, valores)
+
+    # --------- autocompletado ---------
+    @_sincronizado
+    def sugerencias(self, texto: str, n: int = 15) -> list:
+        """Hasta `n` pares (texto a mostrar, Num_Propiedad) cuyo identificador empieza por `texto`."""
+        t = self._tablas["inv"]
+        self.tabla("inv")
+        if self._prefijos is None or self._prefijos_ver != t.version_claves:
+            self._prefijos = IndicePrefijos.desde_inventario(t.df)
+            self._prefijos_ver = t.version_claves
+        return self._prefijos.buscar(texto, n)
+
+    # --------- búsqueda de texto ---------
+    # Un IndiceTexto por registro, guardado en la caché local (CACHE_DIR). Se pone al día con la
+    # tabla solo cuando cambia su versión (y solo en los bloques que cambiaron); registrar,
+    # importar o finalizar una reparación lo amplían sin recorrer el historial.
+    def _indice_texto(self, nombre: str) -> IndiceTexto:
+        t = self._tablas[nombre]
+        df = self.tabla(nombre)
+        if self._texto_ver.get(nombre) != t.version:
+            ruta = _ruta_cache(t.path, ".idx.pkl")
+            idx = self._texto.get(nombre) or IndiceTexto.cargar(ruta)
+            with osi_perf.medir(f"indice_texto:{nombre}", filas=len(df)):
+                if idx.ponerse_al_dia(_texto_buscable(nombre, df)):
+                    idx.guardar(ruta)
+            self._texto[nombre], self._texto_ver[nombre] = idx, t.version
+        return self._texto[nombre]
+
+    def _texto_sumar(self, t: _Tabla, filas: pd.DataFrame, base: int):
+        self._texto[t.nombre].sumar(_texto_buscable(t.nombre, filas), base)
+        self._texto_ver[t.nombre] = t.version
+
+    @_sincronizado
+    def buscar_texto(self, consulta: str, n: int = 200) -> list:
+        """
+        Filas de reparaciones y préstamos que contienen todas las palabras de `consulta`
+        (cada una como inicio de palabra, sin acentos ni mayúsculas), las últimas registradas primero.
+        Devuelve hasta `n` dicts {tabla, pos, Num_Propiedad, fecha, texto}; `pos` es el iloc.
+        """
+        claves = _palabras(consulta)
+        if not claves:
+            return []
+        out = []
+        with osi_perf.medir("buscar_texto"):
+            for nombre in TEXTO_BUSCABLE:
+                idx = self._indice_texto(nombre)
+                df = self._tablas[nombre].df
+                col_fecha = ARCHIVABLES.get(nombre)
+                hallados = 0
+                for pos in idx.candidatas(consulta):
+                    if pos >= len(df):
+                        continue
+                    fila = df.iloc[pos]
+                    texto = " ".join(str(fila.get(c, "") or "") for c in TEXTO_BUSCABLE[nombre]
+                                     if c in df.columns and not pd.isna(fila.get(c)))
+                    palabras = _palabras(texto)
+                    if not all(any(p.startswith(k) for p in palabras) for k in claves):
+                        continue  # posición vieja: el texto de esa fila ya cambió
+                    fecha = fila.get(col_fecha)
+                    out.append({"tabla": nombre, "pos": pos, "Num_Propiedad": str(fila["Num_Propiedad"]),
+                                "fecha": "" if fecha is None or pd.isna(fecha) else str(fecha),
+                                "texto": texto})
+                    hallados += 1
+                    if hallados >= n:
+                        break
+        return out
+
+    # --------- índices por clave ---------
+    @_sincronizado
+    def posiciones(self, nombre: str, valor, col: str = "Num_Propiedad") -> list:
+        """Posiciones (iloc) de las filas cuya `col` coincide con `valor` (sin distinguir mayúsculas)."""
+        self.tabla(nombre)
+        return self._tablas[nombre].indice(col).get(_clave(valor), [])
+
+    @_sincronizado
+    def claves(self, nombre: str, col: str = "Num_Propiedad") -> set:
+        """Conjunto de claves normalizadas presentes en `col` (para cruces por lote)."""
+        self.tabla(nombre)
+        return set(self._tablas[nombre].indice(col))
+
+    @_sincronizado
+    def existe(self, nombre: str, valor, col: str = "Num_Propiedad") -> bool:
+        return len(self.posiciones(nombre, valor, col)) > 0
+
+    @_sincronizado
+    def filas(self, nombre: str, valor, col: str = "Num_Propiedad") -> pd.DataFrame:
+        return self.tabla(nombre).iloc[self.posiciones(nombre, valor, col)]
+
+    # --------- consultas comunes ---------
+    def existe_decomisada(self, num: str) -> bool:
+        return self.existe("dec", num)
+
+    def inv_tiene(self, num: str) -> bool:
+        return self.existe("inv", num)
+
+    # --------- SQLite: migración / exportación ---------
+    @_sincronizado
+    def exportar_excel(self, carpeta: str) -> list:
+        """Escribe cada tabla como .xlsx (mismo nombre de archivo y encabezados exactos) en `carpeta`."""
+        os.makedirs(carpeta, exist_ok=True)
+        escritos = []
+        for t in self._tablas.values():
+            destino = os.path.join(carpeta, os.path.basename(t.path))
+            if _write_xlsx_exact(self.tabla(t.nombre), destino, t.cols):
+                escritos.append(destino)
+        return escritos
+
+def migrar_a_sqlite(path_db: str = None, tablas=None) -> dict:
+    """
+    Migración única: copia los .xlsx actuales a la base SQLite (solo tablas vacías).
+    Devuelve {tabla: filas copiadas}. Los .xlsx originales no se tocan.
+    """
+    tablas = tablas or TABLAS
+    backend = BackendSQLite(path_db or PATH_DB)
+    copiadas = {}
+    for nombre, (path, cols) in tablas.items():
+        backend.preparar(nombre, cols)
+        if not backend.vacia(nombre):
+            continue
+        df = _read_xlsx(path, cols)
+        if df.empty:
+            continue
+        backend.guardar(_Tabla(nombre, path, cols), df)
+        copiadas[nombre] = len(df)
+    backend.con.close()
+    return copiadas
+
+def _crear_backend():
+    """OSI_BACKEND=excel|sqlite; por defecto SQLite solo si ya se migró (existe la base)."""
+    modo = (os.getenv("OSI_BACKEND") or "").strip().lower()
+    if modo == "sqlite" or (not modo and os.path.exists(PATH_DB)):
+        return BackendSQLite(PATH_DB)
+    return BackendExcel()
+
+# Instancia compartida por la app y las ventanas
+ALMACEN = AlmacenDatos(backend=_crear_backend())
+
+# ----------------------- Importación por lote ------------------------
+
+def validar_lote(df: pd.DataFrame, almacen: "AlmacenDatos" = None):
+    """
+    Valida un lote de máquinas (columnas IMPORT_COLS) por columnas, no fila a fila.
+    Devuelve (nuevas, errs): `nuevas` con INV_COLS listas para concatenar al inventario y
+    `errs` con los mensajes "Fila N: ..." (un solo error por fila, en el orden de siempre).
+    Todo o nada: si `errs` no está vacío, no se debe importar nada.
+    """
+    almacen = almacen or ALMACEN
+    df = df.reset_index(drop=True)
+    npv = _texto(df["Num_Propiedad"]).str.upper()
+    idv = _texto(df["ID_Laptop"]).str.upper()
+    stv = _texto(df["Service_Tag"]).str.upper()
+    mdv = _texto(df["Modelo"])
+
+    # Fechas: una pasada vectorizada por columna (formato detectado y cacheado por columna)
+    # formato detectado en ESTE archivo (sin caché): el del inventario no vale para otro origen
+    gav = iso_columna(df["Garantía"])
+    fcv = iso_columna(df["Fecha_Compra"])
+    hoy = datetime.now().date().isoformat()
+
+    # Chequeos independientes de otras filas, en el orden original (gana el primero que falla)
+    checks = [
+        (gav.isna(),                                   "Garantía inválida (YYYY-MM-DD)."),
+        (fcv.isna(),                                   "Fecha_Compra inválida (YYYY-MM-DD)."),
+        (~npv.str.fullmatch(RE_NUM_PROP).astype(bool),    "Num_Propiedad inválido."),
+        (~idv.str.fullmatch(RE_ID_LAPTOP).astype(bool),   "ID_Laptop inválido."),
+        (~stv.str.fullmatch(RE_SERVICE_TAG).astype(bool), "Service_Tag inválido."),
+        (gav.fillna("") <= hoy,                         "Garantía no es futura."),
+    ]
+    errs = {}
+    vivo = pd.Series(True, index=df.index)
+    for falla, msg in checks:
+        nuevas = vivo & falla
+        for i in nuevas[nuevas].index:
+            errs[i] = f"Fila {i+2}: {msg}"
+        vivo &= ~falla
+
+    # Duplicados: contra inventario (índices del almacén), contra el lote ya aceptado y contra decomisados
+    en_inv_np = npv.isin(almacen.claves("inv")).tolist()
+    en_inv_id = idv.isin(almacen.claves("inv", "ID_Laptop")).tolist()
+    en_inv_st = stv.isin(almacen.claves("inv", "Service_Tag")).tolist()
+    en_dec    = npv.isin(almacen.claves("dec")).tolist()
+    np_l, id_l, st_l = npv.tolist(), idv.tolist(), stv.tolist()
+    vistos_np, vistos_id, vistos_st = set(), set(), set()
+    aceptadas = []
+    for i in vivo[vivo].index:
+        if en_inv_np[i] or np_l[i] in vistos_np:
+            errs[i] = f"Fila {i+2}: Num_Propiedad duplicado."; continue
+        if en_inv_id[i] or id_l[i] in vistos_id:
+            errs[i] = f"Fila {i+2}: ID_Laptop duplicado."; continue
+        if en_inv_st[i] or st_l[i] in vistos_st:
+            errs[i] = f"Fila {i+2}: Service_Tag duplicado."; continue
+        if en_dec[i]:
+            errs[i] = f"Fila {i+2}: Num_Propiedad aparece en decomisados."; continue
+        vistos_np.add(np_l[i]); vistos_id.add(id_l[i]); vistos_st.add(st_l[i])
+        aceptadas.append(i)
+
+    nuevas = pd.DataFrame({
+        "Num_Propiedad": npv, "ID_Laptop": idv, "Service_Tag": stv, "Modelo": mdv,
+        "Disponible": "X", "Garantía": gav, "Fecha_Compra": fcv,
+    }).loc[aceptadas, INV_COLS].reset_index(drop=True)
+    return nuevas, [errs[i] for i in sorted(errs)]
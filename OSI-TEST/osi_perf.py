@@ -0,0 +1,330 @@
+# =============================================================================
+# OSI Arecibo — Medición de tiempos
+# Cronometra las operaciones lentas (leer/guardar .xlsx, llenar la tabla, buscar,
+# importar, abrir ventanas) y las anota en un log rotativo local. Con la variable de
+# entorno OSI_PERFIL=1 además perfila esas operaciones con cProfile. VigiaBucle detecta
+# cuándo se congela la ventana (el bucle de Tk no atiende) y anota qué estaba haciendo.
+# No depende de pandas ni de la GUI: se importa en el arranque sin costo.
+# =============================================================================
+
+import atexit
+import cProfile
+import functools
+import logging
+import math
+import os
+import sys
+import threading
+import traceback
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+LOG_NOMBRE   = "osi_tiempos.log"
+LOG_MAX      = 1_000_000   # bytes por archivo antes de rotar
+LOG_COPIAS   = 3           # osi_tiempos.log.1 … .3
+MUESTRAS_MAX = 2000        # mediciones por operación que se guardan para los percentiles
+
+PERFILAR = os.getenv("OSI_PERFIL", "").strip().lower() not in ("", "0", "no", "false")
+
+_carpeta = None
+_log = None
+_cerrojo = threading.Lock()
+_muestras = defaultdict(lambda: deque(maxlen=MUESTRAS_MAX))  # operación -> segundos
+_perfiles = []                 # un cProfile.Profile por hilo que midió algo
+_hilo = threading.local()      # .perfil (Profile del hilo), .activo (medición externa en curso)
+_inicio = time.time()
+_vigia = None                  # VigiaBucle de la sesión (si la GUI lo inició)
+
+def configurar(carpeta: str):
+    """Indica dónde dejar el log (y los perfiles). Sin llamarla solo se guardan las muestras en memoria."""
+    global _carpeta, _log
+    _carpeta = carpeta
+    log = logging.getLogger("osi_tiempos")
+    log.setLevel(logging.INFO)
+    log.propagate = False  # no mezclar con el logging de la app
+    for h in list(log.handlers):
+        log.removeHandler(h)
+        h.close()
+    try:
+        h = RotatingFileHandler(os.path.join(carpeta, LOG_NOMBRE), maxBytes=LOG_MAX,
+                                backupCount=LOG_COPIAS, encoding="utf-8", delay=True)
+    except OSError:
+        _log = None
+        return
+    h.setFormatter(logging.Formatter("%(asctime)s\t%(message)s"))
+    log.addHandler(h)
+    if _log is None:
+        atexit.register(escribir_resumen)
+    _log = log
+
+def ruta_log():
+    return os.path.join(_carpeta, LOG_NOMBRE) if _carpeta else None
+
+# ------------------------------- Mediciones --------------------------------
+
+class Medicion:
+    """Lo que mide el bloque: la operación fija el nombre; filas y bytes se pueden completar dentro."""
+    __slots__ = ("op", "filas", "bytes")
+
+    def __init__(self, op, filas=None, bytes=None):
+        self.op = op
+        self.filas = filas
+        self.bytes = bytes
+
+def _anotar(op: str, segundos: float):
+    with _cerrojo:
+        _muestras[op].append(segundos)
+
+def registrar(op: str, segundos: float, filas=None, bytes=None):
+    """Guarda una muestra para los percentiles de la sesión y la anota en el log."""
+    _anotar(op, segundos)
+    if _log is not None:
+        try:
+            _log.info("%s\t%.1f ms\tfilas=%s\tbytes=%s\t%s", op, segundos * 1000.0,
+                      "" if filas is None else filas, "" if bytes is None else bytes,
+                      threading.current_thread().name)
+        except Exception:
+            pass  # el log es diagnóstico: nunca debe tumbar la operación
+
+@contextmanager
+def medir(op: str, filas=None, bytes=None):
+    """
+    with medir("leer_xlsx", bytes=tamaño) as m:
+        ...
+        m.filas = len(df)
+    """
+    m = Medicion(op, filas, bytes)
+    perfil = _perfil_empezar()
+    t0 = time.perf_counter()
+    try:
+        yield m
+    finally:
+        segundos = time.perf_counter() - t0
+        _perfil_parar(perfil)
+        registrar(m.op, segundos, m.filas, m.bytes)
+
+def cronometrado(op: str = None):
+    """Decorador: mide cada llamada de la función con medir()."""
+    def deco(func):
+        nombre = op or func.__qualname__
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            with medir(nombre):
+                return func(*args, **kwargs)
+        return envoltura
+    return deco
+
+def tamano(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+# ------------------------------- Percentiles --------------------------------
+
+def _percentil(ordenadas, q):
+    # rango más cercano: sin interpolar, siempre es una muestra real
+    i = min(len(ordenadas) - 1, max(0, math.ceil(q * len(ordenadas)) - 1))
+    return ordenadas[i]
+
+def resumen():
+    """[{op, n, p50, p95, max, total}] de la sesión (en ms; total en s), de más a menos tiempo total."""
+    with _cerrojo:
+        copia = {op: sorted(v) for op, v in _muestras.items() if v}
+    filas = []
+    for op, v in copia.items():
+        filas.append({"op": op, "n": len(v),
+                      "p50": _percentil(v, 0.50) * 1000.0,
+                      "p95": _percentil(v, 0.95) * 1000.0,
+                      "max": v[-1] * 1000.0,
+                      "total": sum(v)})
+    filas.sort(key=lambda f: f["total"], reverse=True)
+    return filas
+
+def texto_resumen() -> str:
+    filas = resumen()
+    if not filas:
+        return "Sin mediciones en esta sesión."
+    ancho = max(10, *(len(f["op"]) for f in filas))
+    lineas = [f"{'Operación':<{ancho}}  {'n':>5}  {'p50 ms':>9}  {'p95 ms':>9}  {'máx ms':>9}  {'total s':>8}"]
+    for f in filas:
+        lineas.append(f"{f['op']:<{ancho}}  {f['n']:>5}  {f['p50']:>9.1f}  {f['p95']:>9.1f}"
+                      f"  {f['max']:>9.1f}  {f['total']:>8.2f}")
+    return "\n".join(lineas)
+
+# ------------------------ Bloqueos del bucle de eventos ------------------------
+# Un latido se reprograma con after() cada LATIDO_MS: lo tarde que llega es el retraso de
+# agenda del hilo de la GUI (lo mismo que sufre el temporizador de 1 s). Un hilo vigía mira
+# el último latido y, si lleva más de UMBRAL_BLOQUEO_MS sin llegar, toma la pila del hilo
+# de la GUI. Cuando el latido vuelve, el bloqueo se anota en el log con esas pilas.
+
+LATIDO_MS         = 200
+UMBRAL_BLOQUEO_MS = 500
+PILAS_POR_BLOQUEO = 5      # una por cada UMBRAL_BLOQUEO_MS que dure el bloqueo
+# Con un messagebox/filedialog abierto el bucle de Tk puede no atender (nativos en Windows):
+# es el usuario leyendo, no la app congelada
+_MODALES = ("messagebox.py", "filedialog.py", "simpledialog.py", "commondialog.py")
+
+class VigiaBucle:
+    def __init__(self, latido_ms: int = LATIDO_MS, umbral_ms: int = UMBRAL_BLOQUEO_MS):
+        self.latido_ms = latido_ms
+        self.umbral = umbral_ms / 1000.0
+        self.bloqueos = []     # segundos de cada bloqueo de la sesión
+        self.modales = 0       # bloqueos descartados por haber un diálogo modal abierto
+        self._activo = False
+        self._cerrojo = threading.Lock()
+        self._pilas = []       # [(segundos sin latido, pila)] del bloqueo en curso
+        self._esperado = 0.0   # cuándo debería llegar el próximo latido (perf_counter)
+
+    def iniciar(self, programar):
+        """`programar` = widget.after de la ventana principal. Llamar desde el hilo de la GUI."""
+        global _vigia
+        _vigia = self
+        self._programar = programar
+        self._hilo_gui = threading.get_ident()
+        self._activo = True
+        self._esperado = time.perf_counter() + self.latido_ms / 1000.0
+        programar(self.latido_ms, self._latir)
+        threading.Thread(target=self._vigilar, name="osi-vigia", daemon=True).start()
+
+    def detener(self):
+        self._activo = False
+
+    def _latir(self):
+        if not self._activo:
+            return
+        ahora = time.perf_counter()
+        retraso = max(0.0, ahora - self._esperado)
+        with self._cerrojo:
+            pilas, self._pilas = self._pilas, []
+            self._esperado = ahora + self.latido_ms / 1000.0
+        _anotar("bucle:retraso", retraso)
+        if retraso >= self.umbral:
+            self._bloqueo(retraso, pilas)
+        try:
+            self._programar(self.latido_ms, self._latir)
+        except Exception:
+            self._activo = False  # la ventana ya se destruyó
+
+    def _vigilar(self):
+        paso = min(self.umbral, self.latido_ms / 1000.0) / 2
+        while self._activo:
+            time.sleep(paso)
+            with self._cerrojo:
+                atraso = time.perf_counter() - self._esperado
+                n = len(self._pilas)
+                if n >= PILAS_POR_BLOQUEO or atraso < self.umbral * (n + 1):
+                    continue
+                marco = sys._current_frames().get(self._hilo_gui)
+                if marco is not None:
+                    self._pilas.append((atraso, "".join(traceback.format_stack(marco, limit=20))))
+
+    def _bloqueo(self, segundos, pilas):
+        if any(m in pila for _, pila in pilas for m in _MODALES):
+            self.modales += 1
+            return
+        self.bloqueos.append(segundos)
+        _anotar("bucle:bloqueo", segundos)
+        if _log is None:
+            return
+        partes = [f"BLOQUEO\t{segundos * 1000.0:.0f} ms sin atender la ventana"]
+        previa = None
+        for atraso, pila in pilas:
+            partes.append(f"--- pila a los {atraso * 1000.0:.0f} ms ---")
+            partes.append("(igual a la anterior)" if pila == previa else pila.rstrip())
+            previa = pila
+        if not pilas:
+            partes.append("(terminó antes de poder tomar la pila)")
+        try:
+            _log.warning("\n".join(partes))
+        except Exception:
+            pass
+
+    def texto(self) -> str:
+        """Una línea con la métrica de respuesta de la sesión (la misma que va al log al salir)."""
+        with _cerrojo:
+            retrasos = sorted(_muestras.get("bucle:retraso", ()))
+        if not retrasos:
+            return "sin latidos"
+        return (f"latidos={len(retrasos)}\tretraso_p50={_percentil(retrasos, 0.50) * 1000.0:.0f} ms"
+                f"\tretraso_p95={_percentil(retrasos, 0.95) * 1000.0:.0f} ms"
+                f"\tretraso_max={retrasos[-1] * 1000.0:.0f} ms"
+                f"\tbloqueos={len(self.bloqueos)}\tbloqueado={sum(self.bloqueos):.1f} s"
+                f"\tmodales={self.modales}")
+
+def escribir_resumen():
+    """Al salir: percentiles de la sesión y la métrica de respuesta de la ventana, al log."""
+    if _vigia is not None:
+        _vigia.detener()
+    if _log is None or not _muestras:
+        return
+    lineas = [f"RESUMEN de la sesión ({time.time() - _inicio:.0f} s, pid {os.getpid()})"]
+    if _vigia is not None:
+        lineas.append("RESPUESTA\t" + _vigia.texto())
+    lineas.append(texto_resumen())
+    try:
+        _log.info("\n".join(lineas))
+    except Exception:
+        pass
+
+# --------------------------------- cProfile ---------------------------------
+# Solo con OSI_PERFIL=1. Cada hilo tiene su propio Profile y solo se activa en la medición
+# más externa (anidar uno dentro de otro no se puede). Al salir se juntan todos en un
+# .prof (para snakeviz/pstats) y un .txt con las 40 funciones de más tiempo acumulado.
+
+def _perfil_empezar():
+    if not PERFILAR or getattr(_hilo, "activo", False):
+        return None
+    perfil = getattr(_hilo, "perfil", None)
+    if perfil is None:
+        perfil = _hilo.perfil = cProfile.Profile()
+        with _cerrojo:
+            _perfiles.append(perfil)
+    try:
+        perfil.enable()
+    except ValueError:
+        return None  # Python 3.12+: otro hilo ya está perfilando; esta medición va sin perfil
+    _hilo.activo = True
+    return perfil
+
+def _perfil_parar(perfil):
+    if perfil is not None:
+        perfil.disable()
+        _hilo.activo = False
+
+def volcar_perfil():
+    """Escribe lo perfilado en la sesión. Devuelve la ruta del .prof o None."""
+    if not PERFILAR or not _carpeta:
+        return None
+    import pstats
+    import io
+    stats = None
+    with _cerrojo:
+        perfiles = list(_perfiles)
+    for perfil in perfiles:
+        try:
+            if stats is None:
+                stats = pstats.Stats(perfil)
+            else:
+                stats.add(perfil)
+        except TypeError:
+            continue  # Profile que nunca se activó: pstats no acepta perfiles vacíos
+    if stats is None:
+        return None
+    base = os.path.join(_carpeta, "perfiles", datetime.now().strftime("perfil_%Y%m%d_%H%M%S"))
+    try:
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        stats.dump_stats(base + ".prof")
+        texto = io.StringIO()
+        pstats.Stats(base + ".prof", stream=texto).sort_stats("cumulative").print_stats(40)
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(texto.getvalue())
+    except OSError:
+        return None
+    return base + ".prof"
+
+if PERFILAR:
+    atexit.register(volcar_perfil)
@@ -0,0 +1,259 @@
+# =============================================================================
+# OSI Arecibo — Reportes de cumplimiento del mantenimiento
+# Cruza inventario y mantenimientos en UNA pasada por columnas (bloques de filas, sin
+# recorrer fila a fila) y resume las diez casillas del checklist por máquina, por modelo
+# y por técnico. Se exporta en streaming a .xlsx o .csv, fila a fila.
+# Incluye el archivo histórico por año (ver AlmacenDatos.archivar).
+# Uso desde la consola:
+#   python osi_cli.py reporte maquinas reporte.xlsx --falta "Bios Update" "Upgrade Windows 10 - 11"
+# =============================================================================
+
+from __future__ import annotations
+
+import csv
+import os
+import zipfile
+from xml.sax.saxutils import escape as _xml_escape
+
+import osi_perf
+from osi_datos import (
+    ALMACEN, MANT_COLS, fechas_columna, libros_archivo, _leer_instantanea, _guardar_instantanea,
+    _firma, _xlsx_bloques, _tipar, _texto, _marcadas, _ruta_tmp, _borrar, _celda_xml, _col_letra, pd
+)
+
+CHECKLIST  = MANT_COLS[5:]   # las diez casillas del formulario de mantenimiento
+TAM_BLOQUE = 20000           # filas de mantenimiento por pasada: la memoria no crece con el historial
+TIPOS = {"maquinas": "Por máquina", "modelos": "Por modelo", "tecnicos": "Por técnico"}
+
+# Agregación por máquina / técnico. n:<casilla> = veces marcada; u:<casilla> = último día en que se marcó
+_AGG_MAQ = {"m": "sum", "r": "sum", "d": "max",
+            **{f"n:{c}": "sum" for c in CHECKLIST}, **{f"u:{c}": "max" for c in CHECKLIST}}
+_AGG_TEC = {"m": "sum", "r": "sum", **{f"n:{c}": "sum" for c in CHECKLIST}}
+
+# ------------------------------ Una pasada ------------------------------
+
+def _bloques_mant(almacen, incluir_archivo: bool, tam_bloque: int):
+    """Mantenimientos ya tipados, en bloques: los libros archivados (año por año) y luego el registro."""
+    if incluir_archivo:
+        for _, path in libros_archivo(almacen.path("mant")):
+            df = _leer_instantanea(path, MANT_COLS)
+            if df is not None:
+                yield df
+                continue
+            firma = _firma(path)
+            leidos = []
+            for bloque in _xlsx_bloques(path, MANT_COLS, tam_bloque=tam_bloque):
+                bloque = _tipar(bloque, "mant")
+                leidos.append(bloque)
+                yield bloque
+            # un año archivado casi no cambia: la próxima vez se lee del pickle (memoria: un año)
+            _guardar_instantanea(path, MANT_COLS, _tipar(pd.concat(leidos, ignore_index=True), "mant"), firma)
+    mant = almacen.tabla("mant")
+    for i in range(0, len(mant), tam_bloque):
+        yield mant.iloc[i:i + tam_bloque]
+
+def _parcial(mant: pd.DataFrame):
+    """(por máquina, por técnico) de un bloque: todo por columnas y un groupby por clave."""
+    tipo = _texto(mant["Tipo"])
+    dia = fechas_columna(mant["Dia"], "mant.Dia")[0]
+    datos = {"Num_Propiedad": mant["Num_Propiedad"].to_numpy(),
+             "tecnico": _texto(mant["tecnico"]).to_numpy(),
+             "m": (tipo == "Mantenimiento").to_numpy(), "r": (tipo == "Reparación").to_numpy(),
+             "d": dia.to_numpy()}
+    for c in CHECKLIST:
+        marca = _marcadas(mant[c]).to_numpy()
+        datos[f"n:{c}"] = marca
+        datos[f"u:{c}"] = dia.where(marca).to_numpy()
+    g = pd.DataFrame(datos)
+    return (g.groupby("Num_Propiedad", sort=False).agg(_AGG_MAQ),
+            g.groupby("tecnico", sort=False).agg(_AGG_TEC))
+
+def _juntar(acumulado, parcial, agg):
+    if acumulado is None:
+        return parcial
+    return pd.concat([acumulado, parcial]).groupby(level=0, sort=False).agg(agg)
+
+def agregar_mantenimientos(almacen=None, incluir_archivo: bool = True, tam_bloque: int = TAM_BLOQUE) -> dict:
+    """
+    Recorre los mantenimientos una vez: {"maquinas": DataFrame por Num_Propiedad,
+    "tecnicos": DataFrame por técnico, "filas": filas leídas}. En memoria solo hay un
+    bloque y los acumulados (una fila por máquina / técnico).
+    """
+    almacen = almacen or ALMACEN
+    maq = tec = None
+    filas = 0
+    for bloque in _bloques_mant(almacen, incluir_archivo, tam_bloque):
+        if bloque.empty:
+            continue
+        p_maq, p_tec = _parcial(bloque)
+        maq, tec = _juntar(maq, p_maq, _AGG_MAQ), _juntar(tec, p_tec, _AGG_TEC)
+        filas += len(bloque)
+    if maq is None:
+        maq, tec = _parcial(almacen.tabla("mant").iloc[:0])
+    return {"maquinas": maq, "tecnicos": tec, "filas": filas}
+
+# ------------------------------- Reportes -------------------------------
+
+def _por_maquina(agregados: dict, almacen) -> pd.DataFrame:
+    """Inventario (izquierda) cruzado con los acumulados: las máquinas sin servicios salen en cero."""
+    inv = almacen.tabla("inv")
+    base = pd.DataFrame({"Num_Propiedad": inv["Num_Propiedad"].to_numpy(),
+                         "ID_Laptop": _texto(inv["ID_Laptop"]).to_numpy(),
+                         "Service_Tag": _texto(inv["Service_Tag"]).to_numpy(),
+                         "Modelo": _texto(inv["Modelo"]).to_numpy()})
+    m = base.join(agregados["maquinas"], on="Num_Propiedad")
+    cuentas = ["m", "r"] + [f"n:{c}" for c in CHECKLIST]
+    m[cuentas] = m[cuentas].fillna(0).astype(int)
+    return m
+
+def _texto_dia(fechas: pd.Series) -> pd.Series:
+    return fechas.dt.strftime("%Y-%m-%d").where(fechas.notna(), "")
+
+def reporte(tipo: str, agregados: dict, almacen=None, falta=()) -> pd.DataFrame:
+    """
+    - maquinas: por máquina del inventario, el último día de cada casilla ("X" si se marcó
+      sin fecha, vacío = nunca). `falta`: solo las máquinas a las que les falta alguna de esas casillas.
+    - modelos: máquinas, servicios, reparaciones por máquina y % de máquinas con cada casilla.
+    - tecnicos: servicios y casillas marcadas por técnico.
+    """
+    almacen = almacen or ALMACEN
+    desconocidas = [c for c in falta if c not in CHECKLIST]
+    if desconocidas:
+        raise ValueError(f"Casillas desconocidas: {', '.join(desconocidas)}")
+
+    if tipo == "tecnicos":
+        t = agregados["tecnicos"].sort_index()
+        out = pd.DataFrame({"Técnico": [k or "(sin técnico)" for k in t.index],
+                            "Mantenimientos": t["m"].astype(int).to_numpy(),
+                            "Reparaciones": t["r"].astype(int).to_numpy()})
+        for c in CHECKLIST:
+            out[c] = t[f"n:{c}"].astype(int).to_numpy()
+        return out
+
+    m = _por_maquina(agregados, almacen)
+    if tipo == "modelos":
+        modelo = m["Modelo"].where(m["Modelo"] != "", "(sin modelo)")
+        g = m.groupby(modelo, sort=True)
+        maquinas = g.size()
+        out = pd.DataFrame({"Modelo": maquinas.index, "Máquinas": maquinas.to_numpy(),
+                            "Mantenimientos": g["m"].sum().to_numpy(),
+                            "Reparaciones": g["r"].sum().to_numpy()})
+        out["Reparaciones por máquina"] = (out["Reparaciones"] / out["Máquinas"]).round(2)
+        hechas = (m[[f"n:{c}" for c in CHECKLIST]] > 0).groupby(modelo, sort=True).mean()
+        for c in CHECKLIST:
+            out[f"% {c}"] = (hechas[f"n:{c}"] * 100).round(1).to_numpy()
+        return out
+    if tipo != "maquinas":
+        raise ValueError(f"Reporte desconocido: {tipo}")
+
+    if falta:
+        m = m[(m[[f"n:{c}" for c in falta]] == 0).any(axis=1)]
+    m = m.sort_values("Num_Propiedad")
+    out = pd.DataFrame({"Num_Propiedad": m["Num_Propiedad"], "ID_Laptop": m["ID_Laptop"],
+                        "Service_Tag": m["Service_Tag"], "Modelo": m["Modelo"],
+                        "Mantenimientos": m["m"], "Reparaciones": m["r"],
+                        "Último servicio": _texto_dia(m["d"])})
+    for c in CHECKLIST:
+        out[c] = _texto_dia(m[f"u:{c}"]).mask(m[f"u:{c}"].isna() & (m[f"n:{c}"] > 0), "X")
+    out["Casillas pendientes"] = sum((m[f"n:{c}"] == 0).astype(int) for c in CHECKLIST)
+    return out.reset_index(drop=True)
+
+# -------------------------------- Exportar --------------------------------
+
+def _celda(v):
+    if v is None or (not isinstance(v, str) and pd.isna(v)):
+        return None
+    return v.item() if hasattr(v, "item") else v  # numpy -> Python
+
+# .xlsx mínimo escrito a mano, como al anexar filas (_celda_xml): cada hoja se escribe
+# en streaming dentro del zip. openpyxl write_only también es streaming, pero arma un
+# objeto por celda: ~2 s por cada 1000 filas de este reporte contra ~0.1 s así.
+_XLSX_TIPOS = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+               '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+               '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+               '<Default Extension="xml" ContentType="application/xml"/>'
+               '<Override PartName="/xl/workbook.xml" '
+               'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+               '{hojas}</Types>')
+_XLSX_TIPO_HOJA = ('<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                   'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>')
+_XLSX_RELS = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+              '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+              '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+              'relationships/officeDocument" Target="xl/workbook.xml"/></Relationships>')
+_XLSX_LIBRO = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+               '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+               'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+               '<sheets>{hojas}</sheets></workbook>')
+_XLSX_RELS_LIBRO = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                    '{hojas}</Relationships>')
+_XLSX_REL_HOJA = ('<Relationship Id="rId{i}" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+                  'relationships/worksheet" Target="worksheets/sheet{i}.xml"/>')
+
+def _escribir_hoja(f, df: pd.DataFrame) -> int:
+    letras = [_col_letra(i) for i in range(len(df.columns))]
+    f.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+    n = 1
+    f.write(f'<row r="1">{"".join(_celda_xml(f"{l}1", c) for l, c in zip(letras, df.columns))}</row>'.encode("utf-8"))
+    for fila in df.itertuples(index=False, name=None):
+        n += 1
+        celdas = "".join(_celda_xml(f"{l}{n}", _celda(v)) for l, v in zip(letras, fila))
+        f.write(f'<row r="{n}">{celdas}</row>'.encode("utf-8"))
+    f.write(b"</sheetData></worksheet>")
+    return n - 1
+
+def _exportar_xlsx(hojas: dict, path: str) -> int:
+    filas = 0
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as z:
+        for i, df in enumerate(hojas.values(), start=1):
+            with z.open(f"xl/worksheets/sheet{i}.xml", "w", force_zip64=True) as f:
+                filas += _escribir_hoja(f, df)
+        rango = range(1, len(hojas) + 1)
+        z.writestr("[Content_Types].xml", _XLSX_TIPOS.format(hojas="".join(_XLSX_TIPO_HOJA.format(i=i) for i in rango)))
+        z.writestr("_rels/.rels", _XLSX_RELS)
+        z.writestr("xl/workbook.xml", _XLSX_LIBRO.format(hojas="".join(
+            f'<sheet name="{_xml_escape(nombre[:31], {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+            for i, nombre in zip(rango, hojas))))
+        z.writestr("xl/_rels/workbook.xml.rels", _XLSX_RELS_LIBRO.format(hojas="".join(
+            _XLSX_REL_HOJA.format(i=i) for i in rango)))
+    return filas
+
+def exportar(hojas: dict, path: str) -> int:
+    """
+    Escribe {nombre de hoja: DataFrame} fila a fila en `path`: .xlsx (una hoja por reporte)
+    o .csv (una sola hoja). Primero a un temporal y luego se reemplaza: un reporte
+    abierto no queda a medias. Devuelve las filas escritas.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv" and len(hojas) != 1:
+        raise ValueError("Un .csv lleva un solo reporte: usa .xlsx para varios.")
+    tmp = _ruta_tmp(path)
+    filas = 0
+    try:
+        if ext == ".csv":
+            (df,) = hojas.values()
+            with open(tmp, "w", newline="", encoding="utf-8-sig") as f:  # BOM: Excel abre bien los acentos
+                w = csv.writer(f)
+                w.writerow(df.columns)
+                for fila in df.itertuples(index=False, name=None):
+                    w.writerow(["" if v is None else v for v in map(_celda, fila)])
+                    filas += 1
+        else:
+            filas = _exportar_xlsx(hojas, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        _borrar(tmp)
+        raise
+    return filas
+
+def generar(tipos, path: str, falta=(), incluir_archivo: bool = True, almacen=None) -> int:
+    """Una pasada sobre los mantenimientos, los reportes `tipos` y la exportación a `path`."""
+    with osi_perf.medir("reporte") as med:
+        agregados = agregar_mantenimientos(almacen, incluir_archivo)
+        hojas = {TIPOS[t]: reporte(t, agregados, almacen, falta) for t in tipos}
+        med.filas = agregados["filas"]
+        escritas = exportar(hojas, path)
+        med.bytes = osi_perf.tamano(path)
+    return escritas